@@ -0,0 +1,53 @@
+"""
+Cost of a cache hit on a table read, in copy and in view read modes
+
+    python benchmarks/cache_hit.py --rows 1000000
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from dsdbmanager.dbobject import DbMiddleware
+
+
+def main(rows: int, repeat: int):
+    engine = sa.create_engine('sqlite://')
+    pd.DataFrame({
+        'id': np.arange(rows),
+        'amount': np.random.random(rows),
+        'label': np.random.choice(['a', 'b', 'c'], rows),
+        'created': pd.Timestamp('2020-01-01') + pd.to_timedelta(np.arange(rows), unit='s')
+    }).to_sql('facts', engine, index=False, chunksize=100000)
+
+    for read_mode in ('copy', 'view'):
+        db = DbMiddleware(engine, False, None, read_mode=read_mode)
+
+        start = time.perf_counter()
+        df = db.facts()
+        miss = time.perf_counter() - start
+        megabytes = df.memory_usage(index=True, deep=True).sum() / 2 ** 20
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            _ = db.facts()
+        hit = (time.perf_counter() - start) / repeat
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            f"{read_mode:>4}: {megabytes:.0f}MB result, miss {miss:.3f}s, "
+            f"hit {hit * 1000:.3f}ms, peak allocation during hits {peak / 2 ** 20:.1f}MB"
+        )
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,51 @@
+"""
+Time taken by importing dsdbmanager and the command line in a fresh interpreter, and heavy modules they load
+
+    python benchmarks/import_time.py --repeat 10
+"""
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ('pandas', 'numpy', 'sqlalchemy', 'toolz', 'cryptography', 'pyarrow')
+
+STATEMENTS = {
+    'import dsdbmanager': 'import dsdbmanager',
+    'command line': 'import dsdbmanager.cli',
+    'table functions': 'import dsdbmanager.dbobject',
+}
+
+
+def timed(command) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, check=True)
+    return time.perf_counter() - start
+
+
+def loaded_modules(statement: str):
+    code = f"import sys; {statement}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout.strip()
+
+
+def main(repeat: int):
+    baseline = statistics.median(
+        timed([sys.executable, '-c', 'pass']) for _ in range(repeat)
+    )
+
+    for name, statement in STATEMENTS.items():
+        median = statistics.median(
+            timed([sys.executable, '-c', statement]) for _ in range(repeat)
+        )
+        print(
+            f"{name:>16}: {(median - baseline) * 1000:7.1f}ms over a bare interpreter, "
+            f"loads: {loaded_modules(statement) or 'none of ' + ', '.join(HEAVY_MODULES)}"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    main(args.repeat)
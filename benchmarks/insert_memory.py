@@ -0,0 +1,49 @@
+"""
+Peak memory allocated while converting a dataframe to insert parameters: the whole frame as records at once,
+as inserts used to, against one chunk at a time
+
+    python benchmarks/insert_memory.py --rows 2000000
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from dsdbmanager.constants import CHUNK_SIZE
+from dsdbmanager.utils import record_chunks
+
+
+def whole_frame(df: pd.DataFrame):
+    records = df.where(pd.notnull(df), None).to_dict(orient='records')
+    for start in range(0, len(records), CHUNK_SIZE):
+        yield records[start:start + CHUNK_SIZE]
+
+
+def measure(name: str, chunks):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = sum(len(chunk) for chunk in chunks)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>11}: {rows} rows in {elapsed:.2f}s, peak allocation {peak / 2 ** 20:.1f}MB")
+
+
+def main(rows: int):
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'amount': np.where(np.arange(rows) % 10 == 0, np.nan, np.random.random(rows)),
+        'label': np.random.choice(['a', 'b', 'c'], rows),
+        'created': pd.Timestamp('2020-01-01') + pd.to_timedelta(np.arange(rows), unit='s')
+    })
+    print(f"dataframe of {df.memory_usage(index=True, deep=True).sum() / 2 ** 20:.1f}MB")
+
+    measure('whole frame', whole_frame(df))
+    measure('chunks', record_chunks(df, CHUNK_SIZE))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+    main(args.rows)
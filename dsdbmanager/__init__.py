@@ -1,60 +1,83 @@
-import json
-from .configuring import ConfigFilesManager
-from .dbobject import DsDbManager, DbMiddleware
+"""
+Importing dsdbmanager is cheap: the modules using pandas, sqlalchemy or cryptography are imported the first time
+one of their names is used and the configuration files are only created when the configuration is used
+"""
+import importlib
 
 __version__ = '1.0.6'
-__configurer__ = ConfigFilesManager()
-
-# first initialize empty files
-# if there are no host files, create an empty json file #
-if not __configurer__.host_location.exists():
-    try:
-        __configurer__.host_location.touch(exist_ok=True)
-        with __configurer__.host_location.open('w') as f:
-            json.dump({}, f)
-    except OSError as e:
-        raise Exception("Could not write at host file location", e)
-
-# if there are credential files create an empty json file #
-if not __configurer__.credential_location.exists():
-    __configurer__.credential_location.touch(exist_ok=True)
-    try:
-        with __configurer__.credential_location.open('w') as f:
-            json.dump({}, f)
-    except OSError as e:
-        raise Exception("Could not write at credential file location", e)
-
-# if there are no keys, create one and store it at key location #
-if not __configurer__.key_location.exists():
-    __configurer__.key_location.touch(exist_ok=True)
-    __configurer__.key_location.write_bytes(__configurer__.generate_key())
-
-# functions for users to use
-add_database = __configurer__.add_new_database_info
-remove_database = __configurer__.remove_database
-reset_credentials = __configurer__.reset_credentials
-create_subset = __configurer__.create_subset
+
+# names of the package and the module they come from, imported on first access
+_lazy_names = {
+    'ConfigFilesManager': '.configuring',
+    'DsDbManager': '.dbobject',
+    'DbMiddleware': '.dbobject',
+}
+
+# functions for users to use, methods of the default configurer
+_configurer_functions = {
+    'add_database': 'add_new_database_info',
+    'remove_database': 'remove_database',
+    'reset_credentials': 'reset_credentials',
+    'create_subset': 'create_subset',
+}
+
+
+def _configurer():
+    """
+    The default configuration manager, with its folder, host and credential files and key created if missing
+    :return:
+    """
+    if '__configurer__' not in globals():
+        from .configuring import ConfigFilesManager
+        configurer = ConfigFilesManager()
+        configurer.bootstrap()
+        globals()['__configurer__'] = configurer
+
+    return globals()['__configurer__']
+
+
+def __getattr__(name):
+    if name in _lazy_names:
+        value = getattr(importlib.import_module(_lazy_names[name], __name__), name)
+    elif name == '__configurer__':
+        value = _configurer()
+    elif name in _configurer_functions:
+        value = getattr(_configurer(), _configurer_functions[name])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()).union(_lazy_names, _configurer_functions, ('__configurer__',)))
 
 
 # easy access for databases
 def oracle():
-    return DsDbManager('oracle')
+    return _database_manager('oracle')
 
 
 def teradata():
-    return DsDbManager('teradata')
+    return _database_manager('teradata')
 
 
 def mysql():
-    return DsDbManager('mysql')
+    return _database_manager('mysql')
 
 
 def mssql():
-    return DsDbManager('mssql')
+    return _database_manager('mssql')
 
 
 def snowflake():
-    return DsDbManager('snowflake')
+    return _database_manager('snowflake')
+
+
+def _database_manager(flavor: str):
+    from .dbobject import DsDbManager
+    return DsDbManager(flavor, _configurer())
 
 
 def from_engine(engine, schema: str = None):
@@ -85,4 +108,5 @@ def from_engine(engine, schema: str = None):
     >>> engine.dispose()
 
     """
+    from .dbobject import DbMiddleware
     return DbMiddleware(engine, False, schema)
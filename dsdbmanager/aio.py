@@ -0,0 +1,152 @@
+import typing
+import asyncio
+import inspect
+import functools
+import threading
+import concurrent.futures
+from .constants import MAX_WORKERS
+
+
+class AsyncTables(object):
+    """
+    Awaitable counterparts of the functions of an object: the table functions of a DbMiddleware,
+    or the functions of its _insert, _update and _metadata attributes.
+
+    The functions run on a bounded thread pool, the event loop is free while the query runs.
+    Functions attached to a table function, like aggregate and parallel, are awaitable as well and
+    iter_chunks is an async iterator
+
+    >>> df = await dbobject.aio.table1.aggregate(group_by='day', metrics={'amount': 'sum'})
+    >>> async for chunk in dbobject.aio.table1.iter_chunks(chunksize=10000):
+    ...     process(chunk)
+    """
+
+    def __init__(self, target: typing.Any, executor: concurrent.futures.Executor):
+        """
+
+        :param target: the object holding the functions
+        :param executor: the executor the functions run on
+        """
+        self._target = target
+        self._executor = executor
+
+    def _awaitable(self, function: typing.Callable) -> typing.Callable[..., typing.Awaitable]:
+        """
+
+        :param function: a function of the target
+        :return: a coroutine function running function on the executor, with the functions attached to function
+                 made awaitable too
+        """
+
+        # updated=() so that the synchronous functions attached to a table function are not copied over
+        @functools.wraps(function, updated=())
+        async def run(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+        for name, attribute in getattr(function, '__dict__', {}).items():
+            if name.startswith('__') or not callable(attribute):
+                continue
+            if inspect.isgeneratorfunction(attribute):
+                setattr(run, name, self._async_iterator(attribute))
+            else:
+                setattr(run, name, self._awaitable(attribute))
+
+        return run
+
+    def _async_iterator(self, function: typing.Callable[..., typing.Iterator]
+                        ) -> typing.Callable[..., typing.AsyncIterator]:
+        """
+        The generator runs from start to end on a single thread of the executor, drivers do not all allow a
+        connection to be used from several threads. Items are handed over one at a time, the generator waits
+        until the previous one was taken
+
+        :param function: a generator function of the target, e.g. iter_chunks
+        :return: an async generator function giving the items of the generator
+        """
+
+        @functools.wraps(function, updated=())
+        async def run(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue(maxsize=1)
+            stop = threading.Event()
+            done = object()
+
+            def produce():
+                try:
+                    for el in function(*args, **kwargs):
+                        asyncio.run_coroutine_threadsafe(queue.put(el), loop).result()
+                        if stop.is_set():
+                            break
+                finally:
+                    asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+            producer = loop.run_in_executor(self._executor, produce)
+            item = None
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    yield item
+            finally:
+                # the consumer stopped early: let the generator finish its current item and close
+                stop.set()
+                while item is not done:
+                    item = await queue.get()
+                await producer
+
+        return run
+
+    def __getattr__(self, item: str) -> typing.Callable[..., typing.Awaitable]:
+        if item.startswith('__'):
+            raise AttributeError(item)
+
+        function = getattr(self._target, item)
+        if not callable(function):
+            raise AttributeError(f"{item} is not a function")
+        return self._awaitable(function)
+
+    def __getitem__(self, item: str) -> typing.Callable[..., typing.Awaitable]:
+        return self.__getattr__(item)
+
+
+class AsyncMiddleware(AsyncTables):
+    """
+    asyncio interface of a DbMiddleware. No async driver exists for most flavors, reads and writes go through the
+    same table functions as the synchronous interface, so they share its reflection and result caches, on a pool of
+    max_workers threads. Up to max_workers queries are in flight at a time, others wait for a thread
+
+    >>> df = await dbobject.aio.table1(rows=10, column_3='some_value')
+    >>> await dbobject.aio.insert.table1(df)
+    >>> await dbobject.aio.update.table1(df, keys=('id',), values=('column_3',))
+    >>> await dbobject.aio.metadata.table1()
+    >>> dfs = await asyncio.gather(dbobject.aio.table1(), dbobject.aio['table 2']())
+    """
+
+    def __init__(self, db: typing.Any, max_workers: int = MAX_WORKERS):
+        """
+
+        :param db: a DbMiddleware
+        :param max_workers: number of queries run at the same time
+        """
+        super().__init__(db, concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='dsdbmanager-aio'))
+
+    @property
+    def insert(self) -> AsyncTables:
+        return AsyncTables(self._target._insert, self._executor)
+
+    @property
+    def update(self) -> AsyncTables:
+        return AsyncTables(self._target._update, self._executor)
+
+    @property
+    def metadata(self) -> AsyncTables:
+        return AsyncTables(self._target._metadata, self._executor)
+
+    def close(self) -> None:
+        """
+        wait for running queries and release the threads
+        :return:
+        """
+        self._executor.shutdown(wait=True)
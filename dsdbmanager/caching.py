@@ -0,0 +1,607 @@
+"""
+Caches shared by the table functions of a DbMiddleware
+"""
+import os
+import json
+import time
+import pickle
+import typing
+import hashlib
+import pathlib
+import warnings
+import threading
+import collections
+from .exceptions_ import MissingPackage
+from .constants import (
+    REFLECTION_TTL, RESULT_CACHE_BYTES, RESULT_CACHE_TTL, DISK_CACHE_PATH, DISK_CACHE_TTL, DISK_CACHE_BYTES,
+    SNAPSHOT_PATH, SNAPSHOT_TTL
+)
+
+# pandas and sqlalchemy are only imported where used, so that the command line can list and clear the disk cache
+# without them
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import sqlalchemy as sa
+
+ReflectionCacheInfo = collections.namedtuple('ReflectionCacheInfo', ['hits', 'misses', 'currsize', 'ttl'])
+ResultCacheInfo = collections.namedtuple(
+    'ResultCacheInfo', ['hits', 'misses', 'evictions', 'entries', 'currbytes', 'maxbytes', 'ttl', 'disk_hits']
+)
+result_key_type = typing.Tuple[typing.Hashable, ...]
+
+
+class ReflectionCache(object):
+    """
+    Keeps the reflected sqlalchemy Tables of one engine and schema so that tables are not autoloaded on every call
+
+    >>> cache = ReflectionCache(functools.partial(util_function, engine=engine, schema=None))
+    >>> cache.get('table_1')  # reflected from the database
+    >>> cache.get('table_1')  # served from the cache until ttl seconds have passed
+    >>> cache.info()
+    ReflectionCacheInfo(hits=1, misses=1, currsize=1, ttl=3600)
+
+    With a SchemaSnapshot, tables missing in memory are looked for on disk before being reflected,
+    and reflected tables are written to disk
+    """
+
+    def __init__(self, loader: typing.Callable[[str], 'sa.Table'], ttl: typing.Optional[float] = REFLECTION_TTL,
+                 snapshot: 'SchemaSnapshot' = None, bind: 'sa.engine.base.Engine' = None):
+        """
+
+        :param loader: a function that reflects a table given its name
+        :param ttl: number of seconds a reflected table is kept. None to keep tables until invalidated
+        :param snapshot: optional persistent copy of the reflected tables
+        :param bind: the engine tables read from the snapshot are bound to, as reflected tables are
+        """
+        self._loader = loader
+        self._ttl = ttl
+        self._snapshot = snapshot
+        self._bind = bind
+        self._tables: typing.Dict[str, typing.Tuple[float, 'sa.Table']] = {}
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def _is_fresh(self, loaded_at: float) -> bool:
+        return self._ttl is None or time.monotonic() - loaded_at < self._ttl
+
+    def get(self, table_name: str) -> 'sa.Table':
+        """
+
+        :param table_name: a table name in the schema of the cache
+        :return: the reflected sqlalchemy Table
+        """
+        with self._lock:
+            entry = self._tables.get(table_name)
+            if entry is not None and self._is_fresh(entry[0]):
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+
+        # reflection happens outside of the lock so that a slow catalog does not block other tables
+        tbl = None if self._snapshot is None else self._snapshot.table(table_name, self._bind)
+        if tbl is None:
+            tbl = self._loader(table_name)
+            if self._snapshot is not None:
+                self._snapshot.save_table(tbl)
+
+        with self._lock:
+            self._tables[table_name] = (time.monotonic(), tbl)
+
+        return tbl
+
+    def invalidate(self, table_name: str) -> None:
+        """
+        Forget a table so that it is reflected again on next use
+        :param table_name: a table name in the schema of the cache
+        :return:
+        """
+        with self._lock:
+            self._tables.pop(table_name, None)
+        if self._snapshot is not None:
+            self._snapshot.discard(table_name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+        if self._snapshot is not None:
+            self._snapshot.clear_tables()
+
+    def names(self) -> typing.List[str]:
+        """
+
+        :return: names of the tables in memory
+        """
+        with self._lock:
+            return list(self._tables)
+
+    def info(self) -> ReflectionCacheInfo:
+        with self._lock:
+            return ReflectionCacheInfo(self._hits, self._misses, len(self._tables), self._ttl)
+
+
+def frame_nbytes(df: 'pd.DataFrame') -> int:
+    """
+
+    :param df: a dataframe
+    :return: memory used by the dataframe, including the content of object and string columns
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ResultCache(object):
+    """
+    Dataframes read from the tables of a DbMiddleware, kept within a memory budget.
+    Keys are tuples starting with the table name so that all results of a table can be dropped at once.
+    The least recently used results are evicted first when the budget is exceeded and results older than ttl
+    seconds are never served
+
+    >>> cache = ResultCache(max_bytes=2 ** 30, ttl=600)
+    >>> cache.put(('table_1', None, None), df)
+    >>> cache.get(('table_1', None, None))  # df until evicted, expired or invalidated
+    >>> cache.invalidate('table_1')
+
+    A result can be stored with a signal of the state of its table, it is then only served for the same signal
+
+    >>> cache.put(('table_1', None, None), df, signal=(10,))
+    >>> cache.get(('table_1', None, None), signal=(11,))  # None, the table changed
+
+    With a DiskCache, results are also written to disk and results missing in memory are looked for on disk
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES, ttl: typing.Optional[float] = RESULT_CACHE_TTL,
+                 disk_cache: 'DiskCache' = None):
+        """
+
+        :param max_bytes: memory budget for all results
+        :param ttl: number of seconds a result is served. None to serve results until evicted or invalidated
+        :param disk_cache: optional persistent cache behind the memory
+        """
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._disk_cache = disk_cache
+        self._entries: typing.MutableMapping[
+            result_key_type,
+            typing.Tuple[float, int, 'pd.DataFrame', typing.Optional[typing.Hashable]]
+        ] = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self._currbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_hits = 0
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return self._ttl is None or time.monotonic() - stored_at < self._ttl
+
+    def _drop(self, key: result_key_type) -> None:
+        _, nbytes, _, _ = self._entries.pop(key)
+        self._currbytes -= nbytes
+
+    def get(self, key: result_key_type, signal: typing.Hashable = None) -> typing.Optional['pd.DataFrame']:
+        """
+
+        :param key: a tuple starting with the table name
+        :param signal: current state of the table. Results stored with another signal are not served
+        :return: the cached dataframe or None if there is no fresh result for the key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not self._is_fresh(entry[0]) or (signal is not None and signal != entry[3])):
+                self._drop(key)
+                entry = None
+
+            if entry is not None:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                return entry[2]
+
+            self._misses += 1
+
+        if self._disk_cache is None:
+            return None
+
+        df = self._disk_cache.get(key, signal)
+        if df is not None:
+            with self._lock:
+                self._disk_hits += 1
+            self._keep(key, df, signal)
+
+        return df
+
+    def put(self, key: result_key_type, df: 'pd.DataFrame', signal: typing.Hashable = None) -> None:
+        """
+        Keep a result. Results bigger than the whole budget are not kept
+
+        :param key: a tuple starting with the table name
+        :param df: the result
+        :param signal: state of the table when the result was read
+        :return:
+        """
+        if self._disk_cache is not None:
+            self._disk_cache.put(key, df, signal)
+
+        self._keep(key, df, signal)
+
+    def _keep(self, key: result_key_type, df: 'pd.DataFrame', signal: typing.Hashable) -> None:
+        nbytes = frame_nbytes(df)
+        if nbytes > self._max_bytes:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            while self._entries and self._currbytes + nbytes > self._max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+            self._entries[key] = (time.monotonic(), nbytes, df, signal)
+            self._currbytes += nbytes
+
+    def invalidate(self, table_name: str) -> None:
+        """
+        Drop all results of a table
+        :param table_name: a table name
+        :return:
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == table_name]:
+                self._drop(key)
+
+        if self._disk_cache is not None:
+            self._disk_cache.clear(table=table_name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._currbytes = 0
+
+        if self._disk_cache is not None:
+            self._disk_cache.clear()
+
+    def info(self) -> ResultCacheInfo:
+        with self._lock:
+            return ResultCacheInfo(
+                self._hits, self._misses, self._evictions, len(self._entries), self._currbytes, self._max_bytes,
+                self._ttl, self._disk_hits
+            )
+
+
+def write_atomically(path: pathlib.Path, write: typing.Callable[[pathlib.Path], typing.Any]) -> None:
+    """
+    Write a file so that other processes never see it half written
+
+    :param path: the file
+    :param write: a function writing the content to the path it is given
+    :return:
+    """
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        if temporary.exists():
+            temporary.unlink()
+        raise
+
+
+def canonical_key(key: result_key_type) -> str:
+    """
+
+    :param key: a result cache key
+    :return: a representation of the key that is the same in every process, i.e. with sets sorted
+    """
+    return repr(tuple(tuple(sorted(el, key=repr)) if isinstance(el, frozenset) else el for el in key))
+
+
+class DiskCache(object):
+    """
+    Results of table reads written as Arrow IPC (feather) files so that they survive the python process.
+    Each file has a json sidecar with its flavor, database, schema, table and arguments. Entries are served for ttl
+    seconds and the least recently used are removed when the folder holds more than max_bytes.
+    Writing is best effort: results arrow cannot store, e.g. columns mixing strings and numbers, are only warned about.
+    The pyarrow package is required to read or write entries
+
+    >>> disk = DiskCache('oracle', 'mydatabase', 'schemo')
+    >>> db = DbMiddleware(engine, False, 'schemo', disk_cache=disk)
+    >>> DiskCache().entries()  # entries of every flavor and database
+    """
+
+    def __init__(self, flavor: str = None, database: str = None, schema: str = None,
+                 folder: pathlib.Path = DISK_CACHE_PATH, ttl: typing.Optional[float] = DISK_CACHE_TTL,
+                 max_bytes: int = DISK_CACHE_BYTES):
+        """
+
+        :param flavor: the sql flavor/dialect of the database
+        :param database: database name provided when adding database
+        :param schema: the schema of the tables
+        :param folder: where the files are written
+        :param ttl: number of seconds an entry is served. None to serve entries until evicted or cleared
+        :param max_bytes: size budget for all files in the folder
+        """
+        self._flavor = flavor
+        self._database = database
+        self._schema = schema
+        self._folder = pathlib.Path(folder)
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        # bytes in the folder, counted on the first write and kept up to date by this object
+        self._bytes: typing.Optional[int] = None
+
+    @staticmethod
+    def _require_pyarrow():
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise MissingPackage("You need the pyarrow package to cache results on disk", e)
+
+    def _entry_id(self, key: result_key_type) -> str:
+        namespace = repr((self._flavor, self._database, self._schema))
+        return hashlib.sha1(f"{namespace}{canonical_key(key)}".encode()).hexdigest()
+
+    def _paths(self, entry_id: str) -> typing.Tuple[pathlib.Path, pathlib.Path]:
+        return self._folder / f"{entry_id}.arrow", self._folder / f"{entry_id}.json"
+
+    def _is_fresh(self, created: float) -> bool:
+        return self._ttl is None or time.time() - created < self._ttl
+
+    def _remove(self, entry_id: str) -> None:
+        for path in self._paths(entry_id):
+            try:
+                path.unlink()
+            except OSError as _:
+                pass
+
+    def get(self, key: result_key_type, signal: typing.Hashable = None) -> typing.Optional['pd.DataFrame']:
+        """
+
+        :param key: a result cache key, i.e. a tuple starting with the table name
+        :param signal: current state of the table. Entries written with another signal are not served
+        :return: the cached dataframe or None
+        """
+        entry_id = self._entry_id(key)
+        data_path, meta_path = self._paths(entry_id)
+
+        try:
+            with meta_path.open('r') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if not self._is_fresh(meta['created']):
+            self._remove(entry_id)
+            return None
+
+        if signal is not None and meta.get('signal') != repr(signal):
+            return None
+
+        self._require_pyarrow()
+        import pandas as pd
+        try:
+            df = pd.read_feather(data_path)
+            os.utime(data_path)  # last access, for eviction
+        except OSError as _:
+            return None
+
+        return df
+
+    def put(self, key: result_key_type, df: 'pd.DataFrame', signal: typing.Hashable = None) -> None:
+        """
+
+        :param key: a result cache key, i.e. a tuple starting with the table name
+        :param df: the result
+        :param signal: state of the table when the result was read
+        :return:
+        """
+        self._require_pyarrow()
+        import pyarrow
+        self._folder.mkdir(parents=True, exist_ok=True)
+
+        entry_id = self._entry_id(key)
+        data_path, meta_path = self._paths(entry_id)
+        replaced = data_path.stat().st_size if data_path.exists() else 0
+
+        try:
+            write_atomically(data_path, lambda path: df.reset_index(drop=True).to_feather(path))
+        except (pyarrow.ArrowException, OSError, TypeError, ValueError) as e:
+            warnings.warn(f"result of {key[0]} not cached on disk: {e}")
+            return None
+
+        meta = dict(
+            flavor=self._flavor,
+            database=self._database,
+            schema=self._schema,
+            table=key[0],
+            arguments=canonical_key(key[1:]),
+            signal=None if signal is None else repr(signal),
+            created=time.time(),
+            bytes=data_path.stat().st_size
+        )
+
+        def write_meta(path: pathlib.Path):
+            with path.open('w') as f:
+                json.dump(meta, f)
+
+        try:
+            write_atomically(meta_path, write_meta)
+        except OSError as e:
+            warnings.warn(f"result of {key[0]} not cached on disk: {e}")
+            self._remove(entry_id)
+            return None
+
+        if self._bytes is None:
+            self._evict()
+        else:
+            self._bytes += meta['bytes'] - replaced
+            if self._bytes > self._max_bytes:
+                self._evict()
+
+    def entries(self, **match) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Entries of the flavor, database and schema of this cache. Attributes that are None match every entry
+
+        :param match: optional flavor, database, schema or table the entries must have
+        :return: one dictionary per entry with the content of its sidecar, its id and its last access time
+        """
+        match = dict(dict(flavor=self._flavor, database=self._database, schema=self._schema), **match)
+        match = {k: v for k, v in match.items() if v is not None}
+
+        entries = []
+        for meta_path in self._folder.glob('*.json'):
+            try:
+                with meta_path.open('r') as f:
+                    meta = json.load(f)
+                accessed = meta_path.with_suffix('.arrow').stat().st_mtime
+            except (OSError, json.JSONDecodeError):
+                continue
+
+            if all(meta.get(k) == v for k, v in match.items()):
+                entries.append(dict(meta, id=meta_path.stem, accessed=accessed))
+
+        return entries
+
+    def clear(self, **match) -> int:
+        """
+
+        :param match: optional flavor, database, schema or table of the entries to remove, as in entries
+        :return: the number of entries removed
+        """
+        entries = self.entries(**match)
+        for entry in entries:
+            self._remove(entry['id'])
+        self._bytes = None
+        return len(entries)
+
+    def _evict(self) -> None:
+        """
+        remove expired entries, then the least recently used until the folder is within max_bytes.
+        Lists the whole folder, so it runs on the first write and when the running total crosses the budget
+        :return:
+        """
+        entries = DiskCache(folder=self._folder, ttl=self._ttl).entries()
+        for entry in [entry for entry in entries if not self._is_fresh(entry['created'])]:
+            self._remove(entry['id'])
+            entries.remove(entry)
+
+        total = sum(entry['bytes'] for entry in entries)
+        for entry in sorted(entries, key=lambda x: x['accessed']):
+            if total <= self._max_bytes:
+                break
+            self._remove(entry['id'])
+            total -= entry['bytes']
+
+        self._bytes = total
+
+
+class SchemaSnapshot(object):
+    """
+    Table names and reflected tables of one schema pickled under the config folder, so that a new DbMiddleware
+    lists its tables and serves its first reads without querying the catalog. Entries older than ttl seconds are
+    not used. Tables are written as they are reflected and dropped when found out of date
+
+    >>> snapshot = SchemaSnapshot('oracle', 'mydatabase', 'schemo')
+    >>> db = DbMiddleware(engine, False, 'schemo', snapshot=snapshot)
+    >>> db.refresh_schema(background=True)  # list and reflect the tables again
+    """
+
+    def __init__(self, flavor: str = None, database: str = None, schema: str = None,
+                 folder: pathlib.Path = SNAPSHOT_PATH, ttl: typing.Optional[float] = SNAPSHOT_TTL):
+        """
+
+        :param flavor: the sql flavor/dialect of the database
+        :param database: database name provided when adding database
+        :param schema: the schema of the tables
+        :param folder: where the snapshots of all schemas are written
+        :param ttl: number of seconds an entry is used. None to use entries until refreshed
+        """
+        namespace = hashlib.sha1(repr((flavor, database, schema)).encode()).hexdigest()
+        self._folder = pathlib.Path(folder) / namespace
+        self._ttl = ttl
+
+    @property
+    def _names_path(self) -> pathlib.Path:
+        return self._folder / "names.pickle"
+
+    def _table_path(self, table_name: str) -> pathlib.Path:
+        return self._folder / "tables" / f"{hashlib.sha1(table_name.encode()).hexdigest()}.pickle"
+
+    def _read(self, path: pathlib.Path) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        try:
+            with path.open('rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError) as _:
+            return None
+
+        if self._ttl is not None and time.time() - entry['created'] >= self._ttl:
+            return None
+        return entry
+
+    @staticmethod
+    def _write(path: pathlib.Path, **entry) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        def write(temporary: pathlib.Path):
+            with temporary.open('wb') as f:
+                pickle.dump(dict(entry, created=time.time()), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        write_atomically(path, write)
+
+    def names(self) -> typing.Optional[typing.Tuple[typing.List[str], typing.List[str]]]:
+        """
+
+        :return: the tables and views of the schema, None when there is no snapshot or it is too old
+        """
+        entry = self._read(self._names_path)
+        return None if entry is None else (entry['tables'], entry['views'])
+
+    def save_names(self, tables: typing.Sequence[str], views: typing.Sequence[str]) -> None:
+        self._write(self._names_path, tables=list(tables), views=list(views))
+
+    def table(self, table_name: str, bind: 'sa.engine.base.Engine' = None) -> typing.Optional['sa.Table']:
+        """
+
+        :param table_name: a table name in the schema
+        :param bind: the engine the table is bound to
+        :return: the reflected table as it was saved, None when it was not saved or is too old
+        """
+        entry = self._read(self._table_path(table_name))
+        if entry is None or entry['name'] != table_name:
+            return None
+
+        tbl = entry['table']
+        if bind is not None:
+            tbl.metadata.bind = bind
+        return tbl
+
+    def save_table(self, tbl: 'sa.Table') -> None:
+        """
+
+        :param tbl: a reflected table. The engine it is bound to is not saved
+        :return:
+        """
+        self._write(self._table_path(tbl.name), name=tbl.name, table=tbl)
+
+    def discard(self, table_name: str) -> None:
+        try:
+            self._table_path(table_name).unlink()
+        except OSError as _:
+            pass
+
+    def clear_tables(self) -> None:
+        for path in (self._folder / "tables").glob('*.pickle'):
+            try:
+                path.unlink()
+            except OSError as _:
+                pass
+
+    def clear(self) -> None:
+        """
+        forget the names and tables of the schema
+        :return:
+        """
+        self.clear_tables()
+        try:
+            self._names_path.unlink()
+        except OSError as _:
+            pass
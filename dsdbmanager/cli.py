@@ -1,3 +1,7 @@
+"""
+dsdbmanager command line. Commands import what they use when they run, so that the command line starts
+without pandas or sqlalchemy
+"""
 import click
 
 
@@ -14,6 +18,7 @@ def main():
 def add_database():
     from dsdbmanager.configuring import ConfigFilesManager
     manager = ConfigFilesManager()
+    manager.bootstrap()
     manager.add_new_database_info()
 
 
@@ -21,6 +26,7 @@ def add_database():
 def remove_database():
     from dsdbmanager.configuring import ConfigFilesManager
     manager = ConfigFilesManager()
+    manager.bootstrap()
     manager.remove_database()
 
 
@@ -28,4 +34,45 @@ def remove_database():
 def reset_credentials():
     from dsdbmanager.configuring import ConfigFilesManager
     manager = ConfigFilesManager()
+    manager.bootstrap()
     manager.reset_credentials()
+
+
+@main.group()
+def cache():
+    """
+    results of table reads cached on disk
+    """
+    pass
+
+
+@cache.command(name='list')
+@click.option('--flavor', default=None, help='only entries of this flavor')
+@click.option('--database', default=None, help='only entries of this database')
+@click.option('--table', default=None, help='only entries of this table')
+def list_cache(flavor, database, table):
+    import datetime
+    from dsdbmanager.caching import DiskCache
+    entries = DiskCache().entries(flavor=flavor, database=database, table=table)
+
+    def when(timestamp):
+        return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    click.echo("flavor\tdatabase\tschema\ttable\targuments\tmegabytes\tcreated\tlast access")
+    for entry in sorted(entries, key=lambda x: x['accessed'], reverse=True):
+        click.echo(
+            f"{entry['flavor']}\t{entry['database']}\t{entry['schema']}\t{entry['table']}\t{entry['arguments']}\t"
+            f"{entry['bytes'] / 2 ** 20:.1f}\t{when(entry['created'])}\t{when(entry['accessed'])}"
+        )
+
+    click.echo(f"{len(entries)} entries, {sum(entry['bytes'] for entry in entries) / 2 ** 20:.1f} megabytes")
+
+
+@cache.command(name='clear')
+@click.option('--flavor', default=None, help='only entries of this flavor')
+@click.option('--database', default=None, help='only entries of this database')
+@click.option('--table', default=None, help='only entries of this table')
+def clear_cache(flavor, database, table):
+    from dsdbmanager.caching import DiskCache
+    removed = DiskCache().clear(flavor=flavor, database=database, table=table)
+    click.echo(f"{removed} entries removed")
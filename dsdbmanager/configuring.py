@@ -1,13 +1,109 @@
+import copy
 import json
 import click
 import typing
 import pathlib
 import warnings
-from toolz import keyfilter
-from cryptography.fernet import Fernet
+import threading
+import collections
 from .exceptions_ import MissingFlavor, MissingDatabase, InvalidSubset
 from .constants import HOST_PATH, CREDENTIAL_PATH, KEY_PATH, FLAVORS_FOR_CONFIG
 
+ConfigStoreInfo = collections.namedtuple('ConfigStoreInfo', ['hits', 'loads', 'files'])
+
+
+class ConfigStore(object):
+    """
+    Host and credential files and ciphers of the keys, loaded once per process and shared by every ConfigFilesManager.
+    A file is loaded again when its modification time, size or inode changed, so edits made by other processes
+    are seen. Writes of ConfigFilesManager discard what they replace
+
+    >>> store = ConfigStore()
+    >>> store.json(HOST_PATH)  # parsed from the file
+    >>> store.json(HOST_PATH)  # from memory until the file changes
+    >>> store.fernet(KEY_PATH).decrypt(token)
+    """
+
+    def __init__(self):
+        # (kind, file) -> (modification time, size and inode of the file, what was loaded)
+        self._entries: typing.Dict[
+            typing.Tuple[str, pathlib.Path], typing.Tuple[typing.Tuple[int, ...], typing.Any]
+        ] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+
+    def _get(self, kind: str, location: pathlib.Path, load: typing.Callable[[pathlib.Path], typing.Any]):
+        """
+
+        :param kind: what is kept, a file can be read as json or used as a key
+        :param location: the file
+        :param load: makes what is kept out of the file
+        :return:
+        """
+        location = pathlib.Path(location)
+        status = location.stat()
+        signature = (status.st_mtime_ns, status.st_size, status.st_ino)
+
+        with self._lock:
+            entry = self._entries.get((kind, location))
+            if entry is not None and entry[0] == signature:
+                self._hits += 1
+                return entry[1]
+
+        value = load(location)
+        with self._lock:
+            self._loads += 1
+            self._entries[(kind, location)] = (signature, value)
+
+        return value
+
+    def json(self, location: pathlib.Path) -> typing.Any:
+        """
+
+        :param location: a json file
+        :return: the parsed content, a copy that can be modified
+        """
+        def load(path: pathlib.Path):
+            with path.open('r') as f:
+                return json.load(f)
+
+        return copy.deepcopy(self._get('json', location, load))
+
+    def fernet(self, location: pathlib.Path):
+        """
+
+        :param location: a key file
+        :return: a cipher of the key
+        """
+        def load(path: pathlib.Path):
+            from cryptography.fernet import Fernet
+            return Fernet(path.read_bytes())
+
+        return self._get('fernet', location, load)
+
+    def discard(self, location: pathlib.Path) -> None:
+        """
+
+        :param location: a file that was written
+        :return:
+        """
+        location = pathlib.Path(location)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == location]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> ConfigStoreInfo:
+        with self._lock:
+            return ConfigStoreInfo(self._hits, self._loads, len(self._entries))
+
+
+config_store = ConfigStore()
+
 
 class ConfigFilesManager(object):
     def __init__(
@@ -56,14 +152,39 @@ class ConfigFilesManager(object):
     def key_location(self):
         raise AttributeError("key_location should not be deleted")
 
+    def bootstrap(self) -> None:
+        """
+        Create the configuration folder, empty host and credential files and a key when they do not exist yet.
+        Nothing is written when importing dsdbmanager, this runs the first time the configuration is used
+        :return:
+        """
+        for location in (self.host_location, self.credential_location):
+            if location.exists():
+                continue
+
+            try:
+                location.parent.mkdir(parents=True, exist_ok=True)
+                with location.open('w') as f:
+                    json.dump({}, f)
+                config_store.discard(location)
+            except OSError as e:
+                raise Exception(f"Could not write at {location}", e)
+
+        if not self.key_location.exists():
+            self.key_location.parent.mkdir(parents=True, exist_ok=True)
+            self.key_location.write_bytes(self.generate_key())
+            config_store.discard(self.key_location)
+
+        return None
+
     @classmethod
     def generate_key(cls):
+        from cryptography.fernet import Fernet
         return Fernet.generate_key()
 
     def get_hosts(self):
         try:
-            with self.host_location.open('r') as f:
-                hosts = json.load(f)
+            hosts = config_store.json(self.host_location)
 
         except (OSError, json.JSONDecodeError):
             hosts = {}
@@ -81,9 +202,8 @@ class ConfigFilesManager(object):
         :param encrypt: False to decrypt an encrypted credential, True to encrypt user provided credential
         :return: encrypted or decrypted byte string
         """
-        # get the key and create cipher
-        key = self.key_location.read_bytes()
-        fernet = Fernet(key)
+        # cipher of the key, made once until the key file changes
+        fernet = config_store.fernet(self.key_location)
 
         # strings should be encoded
         if isinstance(string, str):
@@ -120,8 +240,7 @@ class ConfigFilesManager(object):
             return None, None
 
         try:
-            with self.credential_location.open('r') as f:
-                credential_file = json.load(f)
+            credential_file = config_store.json(self.credential_location)
         except (OSError, json.JSONDecodeError):
             return None, None
 
@@ -171,6 +290,7 @@ class ConfigFilesManager(object):
         try:
             with self.credential_location.open('w') as f:
                 json.dump(credential_dict, f)
+            config_store.discard(self.credential_location)
         except (OSError, TypeError) as e:
             raise e
 
@@ -297,6 +417,7 @@ class ConfigFilesManager(object):
         try:
             with self.host_location.open('w') as f:
                 json.dump(host_file, f)
+            config_store.discard(self.host_location)
         except (OSError, TypeError) as er:
             raise er
 
@@ -344,6 +465,7 @@ class ConfigFilesManager(object):
         try:
             with self.host_location.open('w') as f:
                 json.dump(host_file, f)
+            config_store.discard(self.host_location)
         except (OSError, TypeError) as e:
             raise e
 
@@ -376,6 +498,7 @@ class ConfigFilesManager(object):
         try:
             with self.credential_location.open('w') as f:
                 json.dump(credential_file, f)
+            config_store.discard(self.credential_location)
         except (OSError, TypeError) as e:
             raise e
 
@@ -459,6 +582,9 @@ class ConfigFilesManager(object):
             {'oracle': ('db1', 'db2'), 'mysql: 'db1'}, 'projectx'
         )
         """
+        from toolz import keyfilter
+        from cryptography.fernet import Fernet
+
         with self.host_location.open() as f:
             available_dbs = json.load(f)
 
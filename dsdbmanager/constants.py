@@ -7,24 +7,72 @@ try:
 except KeyError:
     config_folder = pathlib.Path.home() / ".dsdbmanager"
 
-# create folder
-try:
-    config_folder.mkdir(parents=True)
-except OSError:
-    # TODO what makes sense here?
-    pass
-
+# the folder and the files are created the first time they are used, see ConfigFilesManager.bootstrap
 HOST_PATH = config_folder / ".hosts.json"
 CREDENTIAL_PATH = config_folder / ".config.json"
 
 # the cryptography key can be in the same folder or at a separate location
 try:
-    KEY_PATH = os.environ["DSDBMANAGER_KEY"]
+    KEY_PATH = pathlib.Path(os.environ["DSDBMANAGER_KEY"])
 except KeyError:
     KEY_PATH = config_folder / ".configkey"
 
 # database flavors
 FLAVORS_FOR_CONFIG = ('oracle', 'mysql', 'mssql', 'teradata', 'snowflake')
 
-CACHE_SIZE = 64
 CHUNK_SIZE = 30000
+
+# ways of inserting dataframes, see loaders.py
+INSERT_METHODS = ('executemany', 'dbapi', 'fast_executemany', 'load_data', 'stage')
+
+# number of rows per parquet file staged by snowflake stage inserts
+STAGE_CHUNK_SIZE = 500000
+
+# cached results are either copied for each caller or shared as read-only views
+READ_MODES = ('copy', 'view')
+
+# number of seconds a reflected table is reused before being reflected again
+REFLECTION_TTL = 3600
+
+# memory budget in bytes and number of seconds results of table reads are kept
+RESULT_CACHE_BYTES = 2 ** 30
+RESULT_CACHE_TTL = 600
+
+# results of table reads can also be written to disk, they are then kept for DISK_CACHE_TTL seconds
+# until the folder holds more than DISK_CACHE_BYTES
+DISK_CACHE_PATH = config_folder / "cache"
+DISK_CACHE_TTL = 24 * 3600
+DISK_CACHE_BYTES = 2 ** 34
+
+# table names and reflected tables of a schema are pickled here and used for SNAPSHOT_TTL seconds
+SNAPSHOT_PATH = config_folder / "snapshots"
+SNAPSHOT_TTL = 7 * 24 * 3600
+
+# membership filters with more values than this are split in chunks or loaded in a temporary table.
+# oracle does not take more than 1000 values in a IN list and mssql no more than 2100 parameters in a query
+IN_LIST_LIMIT = 1000
+# dialects limiting the number of parameters of a query, by dialect. Large membership filters that cannot be
+# split in several queries are loaded in temporary tables past this number of values. Other dialects take an OR
+# of IN lists of IN_LIST_LIMIT values
+BIND_PARAMETER_LIMITS = {
+    'mssql': 2000,
+}
+IN_STRATEGIES = ('chunks', 'temp_table')
+
+# number of queries run at the same time on the connection pool of an engine
+MAX_WORKERS = 4
+
+# engines made by DsDbManager are shared in the process and kept open. Connections are replaced after an hour
+# and checked before use so that connections dropped by the database or a firewall are not handed out.
+# pool_size and max_overflow can be given when connecting, like any sqlalchemy create_engine argument
+ENGINE_POOL_OPTIONS = dict(pool_recycle=3600, pool_pre_ping=True)
+
+# credentials are checked by a connection before a middleware is returned, or only when they were just typed in,
+# the stored ones being checked by the pool pre ping of the first query
+VALIDATION_MODES = ('always', 'lazy')
+
+# parallel reads split a table in ranges of a column or on the column modulo the number of partitions
+PARTITION_MODES = ('range', 'modulo')
+
+# number of rows reported by table metadata: a COUNT(*), the statistics of the catalog or nothing
+ROW_COUNT_MODES = ('exact', 'estimate', 'skip')
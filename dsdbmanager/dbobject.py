@@ -1,10 +1,11 @@
+import abc
 import time
 import typing
+import warnings
 import toolz
-import inspect
 import functools
-import warnings
-import numpy as np
+import threading
+import concurrent.futures
 import pandas as pd
 import sqlalchemy as sa
 import sqlalchemy.exc as exc
@@ -16,17 +17,28 @@ from .oracle_ import Oracle
 from .teradata_ import Teradata
 from .snowflake_ import Snowflake
 from sqlalchemy.engine import reflection
+from .aio import AsyncMiddleware
+from .caching import ReflectionCache, ResultCache, DiskCache, SchemaSnapshot
+from .engines import engine_registry, engine_key, pool_options, warm_up
+from .loaders import pick_loader
 from .configuring import ConfigFilesManager
-from .utils import d_frame, inspect_table, filter_maker
-from .constants import FLAVORS_FOR_CONFIG, CACHE_SIZE, CHUNK_SIZE
+from .utils import (
+    columnar_type, d_frame, frame_view, inspect_table, select_maker, limit_maker, columnar_result, table_change_signal,
+    large_in_lists, membership_filters, concurrent_connections, partition_filters, aggregate_maker,
+    catalog_columns, estimate_row_counts, record_chunks, CHANGE_SIGNAL_QUERIES, SCHEMA_CHANGE_ERRORS
+)
+from .constants import (
+    FLAVORS_FOR_CONFIG, READ_MODES, IN_STRATEGIES, VALIDATION_MODES, PARTITION_MODES, ROW_COUNT_MODES, IN_LIST_LIMIT,
+    MAX_WORKERS, CHUNK_SIZE, REFLECTION_TTL, RESULT_CACHE_BYTES, RESULT_CACHE_TTL
+)
 from .exceptions_ import (
-    BadArgumentType, OperationalError, NoSuchColumn, MissingFlavor, NotImplementedFlavor,
+    BadArgumentType, NoSuchColumn, OperationalError, MissingFlavor, NotImplementedFlavor,
     EmptyHostFile
 )
 
 host_type = typing.Dict[str, typing.Dict[str, typing.Dict[str, str]]]
 update_key_type = typing.Union[typing.Tuple[str, ...], typing.Dict[str, str]]
-table_middleware_type = typing.Callable[..., typing.Tuple[np.ndarray, typing.Tuple[str, ...]]]
+table_middleware_type = typing.Callable[..., typing.Tuple[columnar_type, typing.Tuple[str, ...]]]
 connection_object_type = typing.Union[
     Oracle,
     Teradata,
@@ -36,60 +48,117 @@ connection_object_type = typing.Union[
 ]
 
 
-def util_function(table_name: str, engine: sa.engine.base.Engine, schema: str) -> sa.Table:
+def util_function(table_name: str, engine: sa.engine.base.Engine, schema: str,
+                  reflection_cache: ReflectionCache = None) -> sa.Table:
     """
 
     :param table_name: a table name. It must be a table in the schema of the engine
     :param engine: the sqlalchemy engine for the database
     :param schema: a schema of interest - None if default schema of database is ok
+    :param reflection_cache: optional cache of reflected tables for the engine and schema
     :return: the sqlalchemy Table type for the table name provided
     """
+    if reflection_cache is not None:
+        return reflection_cache.get(table_name)
+
     try:
         return sa.Table(table_name, sa.MetaData(engine, schema=schema), autoload=True)
     except exc.NoSuchTableError as e:
         raise e
 
 
-def insert_into_table(df: pd.DataFrame, table_name: str, engine: sa.engine.Engine, schema: str) -> int:
+def list_tables(engine: sa.engine.base.Engine, schema: str) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    """
+
+    :param engine: the sqlalchemy engine for the database
+    :param schema: a schema of interest - None if default schema of database is ok
+    :return: the tables and the views of the schema
+    """
+    inspection = reflection.Inspector.from_engine(engine)
+    # without schema, the inspector throws AttributeError
+    # any other error should be raised
+    try:
+        views = inspection.get_view_names(schema=schema)
+        tables = inspection.get_table_names(schema=schema)
+
+    except AttributeError as _:
+        views, tables = [], []
+
+    return tables, views
+
+
+def table_layout(tbl: sa.Table) -> typing.List[typing.Tuple[str, str]]:
+    """
+
+    :param tbl: a sqlalchemy Table object
+    :return: names and kinds of types of the columns, to tell whether a table changed since it was reflected
+    """
+    return [(col.name, type(col.type).__name__) for col in tbl.columns]
+
+
+def schema_change_error(dialect: str, e: Exception) -> bool:
+    """
+
+    :param dialect: name of the dialect of the engine the read ran on
+    :param e: an error raised by a read
+    :return: True if a column or table the read used may have been dropped or renamed since it was reflected,
+             as told by utils.SCHEMA_CHANGE_ERRORS. Any programming error for dialects not in there
+    """
+    if isinstance(e, NoSuchColumn):
+        return True
+    if not isinstance(e, exc.DBAPIError):
+        return False
+    if dialect not in SCHEMA_CHANGE_ERRORS:
+        return isinstance(e, exc.ProgrammingError)
+
+    # pymysql and pymssql give the code as first argument, cx_Oracle an error object with a code, teradata a code
+    args = getattr(e.orig, 'args', ())
+    first = args[0] if args else None
+    codes = (getattr(e.orig, 'code', None), first, getattr(first, 'code', None))
+    message = str(e.orig)
+    return any(
+        error in codes if isinstance(error, int) else error in message for error in SCHEMA_CHANGE_ERRORS[dialect]
+    )
+
+
+def insert_into_table(df: pd.DataFrame, table_name: str, engine: sa.engine.Engine, schema: str,
+                      reflection_cache: ReflectionCache = None, result_cache: ResultCache = None,
+                      method: str = None) -> int:
     """
 
     :param df: a dataframe with same column names as those in the database table
     :param table_name: a table name as in util_function
     :param engine: the sqlalchemy engine for the database
     :param schema: a schema of interest - None if default schema of database is ok
+    :param reflection_cache: optional cache of reflected tables as in util_function
+    :param result_cache: optional cache of read results. Results of the table are dropped once the insert is done
+    :param method: one of constants.INSERT_METHODS, see loaders.py. None for the fastest one known to work with the
+                   dialect and driver of the engine
     :return: the number of records inserted
     """
 
-    # get the table
-    tbl = util_function(table_name, engine, schema)
+    try:
+        return _insert_into_table(df, table_name, engine, schema, reflection_cache, method)
+    finally:
+        if result_cache is not None:
+            result_cache.invalidate(table_name)
 
-    # change all nan to None
-    groups = toolz.partition_all(CHUNK_SIZE, df.where(pd.notnull(df), None).to_dict(orient='records'))
 
-    # insert
-    count, last_successful_insert = 0, None
-    with engine.connect() as connection:
-        for group in groups:
-            try:
-                result = connection.execute(tbl.insert(), group)
-                last_successful_insert = group[-1]
-                count += result.rowcount
-            except exc.OperationalError as _:
-                "Try Again"
-                time.sleep(2)
+def _insert_into_table(df: pd.DataFrame, table_name: str, engine: sa.engine.Engine, schema: str,
+                       reflection_cache: ReflectionCache, method: str = None) -> int:
+    loader = pick_loader(engine.dialect, method)
 
-                try:
-                    result = connection.execute(tbl.insert(), group)
-                    last_successful_insert = group[-1]
-                    count += result.rowcount
-                except exc.OperationalError as e:
-                    raise OperationalError(f"Failed to insert records. Last successful{last_successful_insert}", e)
+    # get the table
+    tbl = util_function(table_name, engine, schema, reflection_cache)
 
-    return count
+    # insert, rows are converted one chunk at a time
+    with engine.connect() as connection:
+        return loader(connection, tbl, df)
 
 
 def update_on_table(df: pd.DataFrame, keys: update_key_type, values: update_key_type, table_name: str,
-                    engine: sa.engine.base.Engine, schema: str) -> int:
+                    engine: sa.engine.base.Engine, schema: str, reflection_cache: ReflectionCache = None,
+                    result_cache: ResultCache = None) -> int:
     """
 
     :param df: a dataframe with data tha needs to be updated. Must have columns to be used as key and some for values
@@ -98,16 +167,25 @@ def update_on_table(df: pd.DataFrame, keys: update_key_type, values: update_key_
     :param table_name: a table name as in util_function
     :param engine: the sqlalchemy engine for the database
     :param schema: a schema of interest - None if default schema of database is ok
+    :param reflection_cache: optional cache of reflected tables as in util_function
+    :param result_cache: optional cache of read results. Results of the table are dropped once the update is done
     :return: the number of records updated
     """
 
+    try:
+        return _update_on_table(df, keys, values, table_name, engine, schema, reflection_cache)
+    finally:
+        if result_cache is not None:
+            result_cache.invalidate(table_name)
+
+
+def _update_on_table(df: pd.DataFrame, keys: update_key_type, values: update_key_type, table_name: str,
+                     engine: sa.engine.base.Engine, schema: str, reflection_cache: ReflectionCache) -> int:
     # get table
-    tbl = util_function(table_name, engine, schema)
+    tbl = util_function(table_name, engine, schema, reflection_cache)
 
-    # change nan to None, make sure columns are modified so that we can easily bindparam
-    df_ = df.copy()
-    df_.columns = [f"{el.lower()}_updt" for el in df_.columns]
-    groups = toolz.partition_all(CHUNK_SIZE, df_.where(pd.notnull(df_), None).to_dict(orient='records'))
+    # rows are converted one chunk at a time, nan become None. Parameters are renamed so that we can easily bindparam
+    groups = record_chunks(df, CHUNK_SIZE, [f"{el.lower()}_updt" for el in df.columns])
 
     if not isinstance(keys, tuple) and not isinstance(keys, dict):
         raise BadArgumentType("keys and values must either be both tuples or both dicts", None)
@@ -155,7 +233,79 @@ def update_on_table(df: pd.DataFrame, keys: update_key_type, values: update_key_
     return count
 
 
-def table_middleware(engine: sa.engine.base.Engine, table: str, schema: str = None):
+def fetch_all(connection: sa.engine.Connection, query: sa.sql.Select) -> typing.List[typing.Sequence]:
+    """
+
+    :param connection: a connection to the database
+    :param query: a select statement
+    :return: all rows. The cursor is released as soon as the rows are in
+    """
+    results = connection.execute(query)
+    try:
+        return results.fetchall()
+    finally:
+        results.close()
+
+
+def select_rows(engine: sa.engine.base.Engine, tbl: sa.Table, columns: typing.Tuple[str, ...] = None,
+                rows: int = None, offset: int = None, kwargs: typing.Dict[str, typing.Any] = None,
+                in_strategy: str = 'chunks', max_workers: int = MAX_WORKERS,
+                where: sa.sql.ClauseElement = None) -> typing.Tuple[typing.List, typing.Tuple[str, ...]]:
+    """
+    Run the select of a table function. A membership filter with more than IN_LIST_LIMIT values is either split in
+    chunks queried concurrently or loaded in a temporary table the query is joined with, the rows are the same as
+    those of a single IN query. Several such filters go in a single query as in membership_filters, splitting one
+    would send the others whole with every chunk
+
+    :param engine: the sqlalchemy engine for the database
+    :param tbl: a sqlalchemy Table object
+    :param columns: set of columns to pull
+    :param rows: number of rows of data to pull
+    :param offset: number of rows to skip, in primary key order
+    :param kwargs: column to filter
+    :param in_strategy: 'chunks' or 'temp_table'
+    :param max_workers: number of chunks queried at the same time
+    :param where: an additional predicate, e.g. the partition of a parallel read
+    :return: the rows and the names of their columns
+    """
+    kwargs = {} if kwargs is None else kwargs
+    dialect = engine.dialect.name
+
+    large = large_in_lists(tbl, kwargs)
+    query, tbl_cols = select_maker(tbl, columns, **{k: v for k, v in kwargs.items() if k not in large})
+    if where is not None:
+        query = query.where(where)
+
+    if not large or in_strategy == 'temp_table' or len(large) > 1:
+        with engine.connect() as connection, membership_filters(connection, tbl, large, in_strategy) as filters:
+            if filters:
+                query = query.where(sa.and_(*filters))
+            return fetch_all(connection, limit_maker(query, tbl, tbl_cols, dialect, rows, offset)), tbl_cols
+
+    if offset:
+        raise BadArgumentType("offset cannot be used with large IN lists split in chunks, use temp_table", None)
+
+    # one query per chunk of the list
+    (largest,) = large
+
+    def read_chunk(chunk: typing.Tuple[typing.Any, ...]) -> typing.List[typing.Sequence]:
+        chunk_query = limit_maker(query.where(tbl.c[largest].in_(chunk)), tbl, tbl_cols, dialect, rows)
+        with engine.connect() as connection:
+            return fetch_all(connection, chunk_query)
+
+    chunks = toolz.partition_all(IN_LIST_LIMIT, large[largest])
+    if concurrent_connections(engine):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            array = list(toolz.concat(pool.map(read_chunk, chunks)))
+    else:
+        array = list(toolz.concat(map(read_chunk, chunks)))
+
+    return (array if rows is None else array[:rows]), tbl_cols
+
+
+def table_middleware(engine: sa.engine.base.Engine, table: str, schema: str = None,
+                     reflection_cache: ReflectionCache = None, result_cache: ResultCache = None,
+                     revalidate: bool = False, read_mode: str = 'copy', in_strategy: str = 'chunks'):
     """
     This does not directly look for the tables; it simply gives a function that can be used to specify
     number of rows and columns etc. When this function is evaluated, it returns a function that holds the context.
@@ -164,62 +314,299 @@ def table_middleware(engine: sa.engine.base.Engine, table: str, schema: str = No
     :param engine: the sqlalchemy engine for the database
     :param table: a table name as in util_function
     :param schema: a schema of interest - None if default schema of database is ok
+    :param reflection_cache: optional cache of reflected tables as in util_function
+    :param result_cache: optional cache of results shared with other tables. The table gets its own when None
+    :param revalidate: True to check that the table did not change, with a cheap catalog query, before serving
+                       a cached result. Only mysql, mssql and snowflake keep such a signal, see
+                       utils.CHANGE_SIGNAL_QUERIES for what it can miss. Other dialects read the table every time
+    :param read_mode: 'copy' to give each caller its own copy of a cached result. 'view' to give a dataframe over
+                      the cached buffers: nothing is copied but the data cannot be modified in place, see frame_view
+    :param in_strategy: how membership filters with more than IN_LIST_LIMIT values are run, see select_rows.
+                        'chunks' for concurrent queries on chunks of values, 'temp_table' for a join with
+                        a temporary table
     :return: a function that when called, pulls data from the database table specified with 'table' arg
     """
+    if read_mode not in READ_MODES:
+        raise BadArgumentType(f"read_mode must be one of {', '.join(READ_MODES)}, got {read_mode}", None)
+
+    if in_strategy not in IN_STRATEGIES:
+        raise BadArgumentType(f"in_strategy must be one of {', '.join(IN_STRATEGIES)}, got {in_strategy}", None)
+
+    result_cache = ResultCache() if result_cache is None else result_cache
 
     @d_frame
-    @functools.lru_cache(CACHE_SIZE)
+    def read(
+            rows: int = None,
+            columns: typing.Tuple[str, ...] = None,
+            offset: int = None,
+            **kwargs
+    ) -> typing.Tuple[columnar_type, typing.Tuple[str, ...]]:
+        """
+
+        :param rows: number of rows of data to pull
+        :param columns: set of columns to pull
+        :param offset: number of rows to skip, in primary key order
+        :param kwargs: column to filter
+        :return:
+        """
+
+        tbl = util_function(table, engine, schema, reflection_cache)
+
+        # query - the number of rows is restricted by the database itself
+        array, tbl_cols = select_rows(engine, tbl, columns, rows, offset, kwargs, in_strategy)
+
+        # one typed array per column so that the dataframe does not go through a 2d object array
+        return columnar_result(array, tbl_cols, [tbl.c[col].type for col in tbl_cols]), tbl_cols
+
     def wrapped(
             rows: int = None,
             columns: typing.Tuple[str, ...] = None,
+            offset: int = None,
             **kwargs
-    ) -> typing.Tuple[np.ndarray, typing.Tuple[str, ...]]:
+    ) -> pd.DataFrame:
         """
 
         :param rows: number of rows of data to pull
         :param columns: set of columns to pull
+        :param offset: number of rows to skip, in primary key order
+        :param kwargs: column to filter
+        :return: a dataframe, served from the result cache when the same arguments were used recently
+        """
+
+        # arguments that cannot be hashed, like lists, are simply not cached
+        try:
+            key = (table, rows, columns, offset, frozenset(kwargs.items()))
+        except TypeError as _:
+            key = None
+        return cached(key, functools.partial(read, rows, columns, offset, **kwargs), columns)
+
+    def reflect_again() -> bool:
+        """
+
+        :return: True if the table changed since it was reflected
+        """
+        before = util_function(table, engine, schema, reflection_cache)
+        reflection_cache.invalidate(table)
+        return table_layout(util_function(table, engine, schema, reflection_cache)) != table_layout(before)
+
+    def up_to_date(compute: typing.Callable[[], pd.DataFrame], columns: typing.Tuple[str, ...] = None) -> pd.DataFrame:
+        """
+        A table reflected a while ago, or read from a snapshot, may have lost or gained columns since.
+        When a read asks for columns the table does not have, the table is reflected again once and NoSuchColumn
+        raised if they are still missing. When a read fails with an error a schema change gives, the table is
+        reflected again and the read retried once if the table changed. Other errors are raised as they are
+
+        :param compute: function that reads the dataframe from the database
+        :param columns: the columns the read asks for
+        :return: the dataframe
+        """
+        if reflection_cache is None:
+            return compute()
+
+        if columns is not None:
+            known = util_function(table, engine, schema, reflection_cache).c.keys()
+            if not set(columns) <= set(known):
+                reflect_again()
+                missing = set(columns) - set(util_function(table, engine, schema, reflection_cache).c.keys())
+                if missing:
+                    raise NoSuchColumn(f"{', '.join(map(str, sorted(missing)))} not in {table}", None)
+
+        try:
+            return compute()
+        except (exc.DBAPIError, NoSuchColumn) as e:
+            if not schema_change_error(engine.dialect.name, e) or not reflect_again():
+                raise
+        return compute()
+
+    def cached(key: typing.Optional[tuple], compute: typing.Callable[[], pd.DataFrame],
+               columns: typing.Tuple[str, ...] = None) -> pd.DataFrame:
+        """
+
+        :param key: the result cache key of the dataframe, starting with the table name. None to skip the cache
+        :param compute: function that reads the dataframe from the database
+        :param columns: the columns the read asks for, see up_to_date
+        :return: a dataframe, served from the result cache when the same arguments were used recently
+        """
+        try:
+            hash(key)
+        except TypeError as _:
+            key = None
+        if key is None:
+            return up_to_date(compute, columns)
+
+        signal = None
+        if revalidate:
+            signal = table_change_signal(engine, util_function(table, engine, schema, reflection_cache))
+            # without a reliable signal a cached result cannot be known to be fresh
+            if signal is None:
+                return up_to_date(compute, columns)
+
+        df = result_cache.get(key, signal)
+        if df is None:
+            df = up_to_date(compute, columns)
+            result_cache.put(key, df, signal)
+
+        # the cached dataframe is never handed out so that callers cannot modify it
+        if read_mode == 'view':
+            return frame_view(df)
+        return df.copy()
+
+    def iter_chunks(
+            chunksize: int = CHUNK_SIZE,
+            columns: typing.Tuple[str, ...] = None,
+            **kwargs
+    ) -> typing.Iterator[pd.DataFrame]:
+        """
+        Same as calling the table function but the data is streamed from a server side cursor
+        and only chunksize rows are held in memory at a time
+
+        :param chunksize: number of rows in each dataframe
+        :param columns: set of columns to pull
+        :param kwargs: column to filter
+        :return: a generator of dataframes
+        """
+        if chunksize < 1:
+            raise BadArgumentType("chunksize must be a positive integer", None)
+
+        tbl = util_function(table, engine, schema, reflection_cache)
+        large = large_in_lists(tbl, kwargs)
+        query, tbl_cols = select_maker(tbl, columns, **{k: v for k, v in kwargs.items() if k not in large})
+        types = [tbl.c[col].type for col in tbl_cols]
+
+        # a single streamed query: large IN lists are split within it or joined from temporary tables
+        with engine.connect() as connection, membership_filters(connection, tbl, large, in_strategy) as filters:
+            if filters:
+                query = query.where(sa.and_(*filters))
+            results = connection.execution_options(stream_results=True).execute(query)
+            try:
+                while True:
+                    array = results.fetchmany(chunksize)
+                    if not array:
+                        break
+                    yield pd.DataFrame(data=columnar_result(array, tbl_cols, types), columns=tbl_cols)
+            finally:
+                results.close()
+
+    @d_frame
+    def parallel(
+            partitions: int = MAX_WORKERS,
+            partition_column: str = None,
+            workers: int = None,
+            mode: str = 'range',
+            columns: typing.Tuple[str, ...] = None,
+            **kwargs
+    ) -> typing.Tuple[columnar_type, typing.Tuple[str, ...]]:
+        """
+        Same as calling the table function but the table is split in partitions read concurrently, each on its
+        own pooled connection. Partitions are put back together in order. The result is not cached
+
+        :param partitions: number of queries the read is split in
+        :param partition_column: column the table is split on, the first primary key column by default
+        :param workers: number of partitions read at the same time, as many as partitions by default
+        :param mode: 'range' for equal width ranges between the min and max of partition_column,
+                     'modulo' for an integer partition_column modulo partitions
+        :param columns: set of columns to pull
         :param kwargs: column to filter
         :return:
         """
+        if not isinstance(partitions, int) or partitions < 1:
+            raise BadArgumentType("partitions must be a positive integer", None)
 
-        tbl = util_function(table, engine, schema)
+        if mode not in PARTITION_MODES:
+            raise BadArgumentType(f"mode must be one of {', '.join(PARTITION_MODES)}, got {mode}", None)
 
-        # query
-        tbl_cols = [el.name for el in tbl.columns]
-        if columns is None:
-            query = sa.select([tbl])
-        else:
-            # check if all columns are in table
-            not_in_table = set(columns) - set(tbl_cols)
-            if not_in_table == set(columns):
-                raise NoSuchColumn(f"None of the columns [{', '.join(sorted(columns))}] are in table {table}", None)
+        tbl = util_function(table, engine, schema, reflection_cache)
 
-            if len(not_in_table) > 0:
-                warnings.warn(f"Columns [{', '.join(sorted(not_in_table))}] are not in table {table}")
+        if partition_column is None:
+            keys = [col.name for col in tbl.columns if col.primary_key]
+            if not keys:
+                raise BadArgumentType(f"table {table} has no primary key, a partition_column is needed", None)
+            partition_column = keys[0]
 
-            tbl_cols = [el for el in columns if el in tbl_cols]
-            query = sa.select([tbl.c[col] for col in tbl_cols])
+        if partition_column not in tbl.c:
+            raise NoSuchColumn(f"Column {partition_column} is not in table {table}", None)
+        column = tbl.c[partition_column]
 
-        if kwargs:
-            filters = [filter_maker(tbl, el, val) for el, val in kwargs.items()]
-            query = query.where(sa.and_(*filters))
+        low, high = None, None
+        if mode == 'range':
+            with engine.connect() as connection:
+                low, high = connection.execute(sa.select([sa.func.min(column), sa.func.max(column)])).first()
 
-        # execute
-        with engine.connect() as connection:
-            results = connection.execute(query)
+        if mode == 'range' and low is None:
+            filters = [None]  # no value to split on, a single query
+        else:
+            filters = partition_filters(column, partitions, mode, low, high)
 
-        # fetch
-        if rows is not None:
-            array = results.fetchmany(rows)
+        def read_partition(where: sa.sql.ClauseElement) -> typing.Tuple[typing.List, typing.Tuple[str, ...]]:
+            return select_rows(engine, tbl, columns, kwargs=kwargs, in_strategy=in_strategy, where=where)
+
+        if concurrent_connections(engine):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers or partitions) as pool:
+                results = list(pool.map(read_partition, filters))
         else:
-            array = results.fetchall()
+            results = list(map(read_partition, filters))
 
-        results.close()
+        tbl_cols = results[0][1]
+        array = list(toolz.concat(rows for rows, _ in results))
+        return columnar_result(array, tbl_cols, [tbl.c[col].type for col in tbl_cols]), tbl_cols
+
+    @d_frame
+    def aggregate_read(
+            group_by: typing.Tuple[str, ...],
+            metrics: typing.Dict[str, typing.Union[str, typing.Tuple[str, ...]]],
+            **kwargs
+    ) -> typing.Tuple[columnar_type, typing.Tuple[str, ...]]:
+        """
+
+        :param group_by: columns to group on
+        :param metrics: column to aggregate function(s)
+        :param kwargs: column to filter
+        :return:
+        """
+        tbl = util_function(table, engine, schema, reflection_cache)
+        large = large_in_lists(tbl, kwargs)
+        query, names, types = aggregate_maker(
+            tbl, group_by, metrics, **{k: v for k, v in kwargs.items() if k not in large}
+        )
+
+        # groups cannot be read in chunks and concatenated: large IN lists stay within the single query
+        with engine.connect() as connection, membership_filters(connection, tbl, large, in_strategy) as filters:
+            if filters:
+                query = query.where(sa.and_(*filters))
+            array = fetch_all(connection, query)
+
+        return columnar_result(array, names, types), names
 
-        # return dataframe
-        arr, cols = np.array(array), tuple(tbl_cols)
-        arr.flags.writeable = False
-        return arr, cols
+    def aggregate(
+            group_by: typing.Union[str, typing.Tuple[str, ...]] = (),
+            metrics: typing.Dict[str, typing.Union[str, typing.Tuple[str, ...]]] = None,
+            **kwargs
+    ) -> pd.DataFrame:
+        """
+        GROUP BY run in the database, only the aggregated rows are fetched. Results are cached like table reads
+
+        >>> dbobject.table1.aggregate(group_by='day', metrics={'amount': ('sum', 'mean'), 'id': 'count'}, amount__gt=0)
+
+        gives the columns day, amount_sum, amount_mean and id_count, one row per day in day order
+
+        :param group_by: columns to group on, none to aggregate the whole table
+        :param metrics: column to one or several of sum, count, count_distinct, min, max and mean
+        :param kwargs: column to filter
+        :return: a dataframe with the group_by columns then one column per metric, named column_function
+        """
+        group_by = (group_by,) if isinstance(group_by, str) else tuple(group_by)
+        metrics = {} if metrics is None else metrics
+        try:
+            key = (table, 'aggregate', group_by, frozenset(metrics.items()), frozenset(kwargs.items()))
+        except TypeError as _:
+            key = None
+        return cached(key, functools.partial(aggregate_read, group_by, metrics, **kwargs))
+
+    wrapped.iter_chunks = iter_chunks
+    wrapped.aggregate = aggregate
+    wrapped.parallel = parallel
+    wrapped.cache_info = result_cache.info
+    wrapped.cache_clear = functools.partial(result_cache.invalidate, table)
 
     return wrapped
 
@@ -257,44 +644,254 @@ class DbMiddleware(object):
 
     tuples are used all around simply because we cache the result of these methods i.e. the dataframes
 
+    Other filters are written as the column name, a double underscore and one of bw, lt, le, gt, ge, like, not_like
+    or not_in. They all run in the database
+
+    >>> dbobject.table1(column_1__gt=100, column_2__bw=('2020-01-01', '2020-12-31'), column_3__not_in=('a', 'b'))
+
     Say I had a column name that had spaces and I couldn't just do what I did above, I could do this
 
     >>> dbobject.table1(**{'column with space': 'some_value'})  # simply unpacking the dictionary at execution time
 
+    Lists of more than IN_LIST_LIMIT values are split in chunks queried concurrently, or with
+    in_strategy='temp_table' loaded in a temporary table the query is joined with
+
+    >>> dbobject.table1(id=tuple(range(50000)))
+
     All those methods to pull data are **table_middleware** functions already evaluated at engine,
     table name and schema level.
 
+    Tables too big for memory can be read chunk by chunk from a server side cursor
+
+    >>> for df in dbobject.table1.iter_chunks(chunksize=100000, columns=('column',), column_3='some_value'):
+    ...     process(df)
+
+    Tables too big for a single cursor can be read in partitions of their primary key, concurrently
+
+    >>> dbobject.table1.parallel(partitions=8, workers=4, column_3='some_value')
+    >>> dbobject.table1.parallel(partitions=8, partition_column='id', mode='modulo')
+
+    Every table function, insert and update can be awaited from asyncio code. They run on a pool of aio_workers
+    threads and share the caches above
+
+    >>> df = await dbobject.aio.table1(rows=10, column_3='some_value')
+    >>> await dbobject.aio.insert.table1(df)
+
+    Aggregates are computed in the database, only the groups are fetched
+
+    >>> dbobject.table1.aggregate(group_by=('day',), metrics={'amount': 'sum', 'id': 'count'}, column_3='some_value')
+
+    For schemas with many tables, lazy=True only lists their names when connecting. The function of a table is made
+    the first time it is used and dir() still lists every table
+
+    >>> dbobject = DbMiddleware(engine, False, None, lazy=True)
+
+    With a SchemaSnapshot, table names and reflected tables are kept on disk and a new DbMiddleware starts from them
+    without querying the catalog. A read that fails on a table that changed since is retried once after reflecting
+    the table again
+
+    >>> dbobject = DbMiddleware(engine, False, 'schemo', snapshot=SchemaSnapshot('oracle', 'mydatabase', 'schemo'))
+    >>> dbobject.refresh_schema(background=True)  # list and reflect the tables again, new tables get their functions
+
     Bonus
 
     Get Metadata on your table
 
-    >>> dbobject._metadata.table1()
+    >>> dbobject._metadata.table1()  # the number of rows is estimated from the catalog statistics
+    >>> dbobject._metadata.table1(row_count='exact')  # or counted, or row_count='skip'
+    >>> dbobject._metadata.all()  # every table and column of the schema in one dataframe
+
+    Tables are reflected once and reused for reflection_ttl seconds. Results of reads are kept for result_cache_ttl
+    seconds, all tables sharing a budget of result_cache_bytes. Inserts and updates through _insert and _update drop
+    the results of their table. With revalidate=True, a cheap catalog query checks that the table did not change
+    before a result is served. Only mysql, mssql and snowflake have such a query, results of other dialects are not
+    served from the cache when revalidating (see utils.CHANGE_SIGNAL_QUERIES for the limits of each signal).
+    With a DiskCache, results are also written under the config folder and survive the python process.
+    Cached results are copied for each call, with read_mode='view' they are shared instead and cannot be modified
+    in place. If a table changed in the database some other way
+
+    >>> dbobject.invalidate('table1')  # reflect and read table1 again on next use
+    >>> dbobject.refresh()  # reflect and read every table again on next use
+    >>> dbobject.reflection_info()
+    ReflectionCacheInfo(hits=10, misses=2, currsize=2, ttl=3600)
+    >>> dbobject.cache_info()
+    ResultCacheInfo(hits=3, misses=4, evictions=0, entries=4, currbytes=52880, maxbytes=1073741824, ttl=600)
     """
 
-    def __init__(self, engine: sa.engine.Engine, connect_only: bool, schema: str = None):
+    def __init__(self, engine: sa.engine.Engine, connect_only: bool, schema: str = None,
+                 reflection_ttl: typing.Optional[float] = REFLECTION_TTL,
+                 result_cache_bytes: int = RESULT_CACHE_BYTES,
+                 result_cache_ttl: typing.Optional[float] = RESULT_CACHE_TTL,
+                 revalidate: bool = False, disk_cache: DiskCache = None, read_mode: str = 'copy',
+                 in_strategy: str = 'chunks', aio_workers: int = MAX_WORKERS, lazy: bool = False,
+                 snapshot: SchemaSnapshot = None):
+        if revalidate and engine.dialect.name not in CHANGE_SIGNAL_QUERIES:
+            warnings.warn(
+                f"{engine.dialect.name} has no reliable change signal, with revalidate=True its tables are read "
+                f"again on every call instead of being served from the cache"
+            )
+
         self._sqlalchemy_engine = engine
+        self._schema = schema
+        self._snapshot = snapshot
+        self._reflection_cache = ReflectionCache(
+            functools.partial(util_function, engine=engine, schema=schema),
+            reflection_ttl,
+            snapshot,
+            engine
+        )
+        self._result_cache = ResultCache(result_cache_bytes, result_cache_ttl, disk_cache)
+        self.aio = AsyncMiddleware(self, aio_workers)
 
         if not connect_only:
-            inspection = reflection.Inspector.from_engine(self._sqlalchemy_engine)
-            # without schema, the inspector throws AttributeError
-            # any other error should be raised
-            try:
-                views = inspection.get_view_names(schema=schema)
-                tables = inspection.get_table_names(schema=schema)
-
-            except AttributeError as _:
-                views, tables = [], []
+            names = None if snapshot is None else snapshot.names()
+            if names is None:
+                names = list_tables(self._sqlalchemy_engine, schema)
+                if snapshot is not None:
+                    snapshot.save_names(*names)
+            tables, views = names
 
             if not (tables + views):
                 pass
-            
-            self._metadata = TableMeta(self.sqlalchemy_engine, schema, tables + views)
-            self._insert = TableInsert(self.sqlalchemy_engine, schema, tables + views)
-            self._update = TableUpdate(self.sqlalchemy_engine, schema, tables + views)
-
-            for table in tables + views:
-                self.__setattr__(table, table_middleware(self._sqlalchemy_engine, table, schema=schema))
-                
+
+            self._table_names = frozenset()
+            self._lazy = lazy
+            self._table_function = functools.partial(
+                table_middleware, self._sqlalchemy_engine, schema=schema,
+                reflection_cache=self._reflection_cache, result_cache=self._result_cache,
+                revalidate=revalidate, read_mode=read_mode, in_strategy=in_strategy
+            )
+
+            self._metadata = TableMeta(self.sqlalchemy_engine, schema, (), self._reflection_cache, lazy=lazy)
+            self._insert = TableInsert(
+                self.sqlalchemy_engine, schema, (), self._reflection_cache, self._result_cache, lazy=lazy
+            )
+            self._update = TableUpdate(
+                self.sqlalchemy_engine, schema, (), self._reflection_cache, self._result_cache, lazy=lazy
+            )
+            self._add_tables(tables + views)
+
+    def _add_tables(self, tables: typing.Iterable[str]) -> None:
+        """
+        Make the functions of tables not known yet, or only record their names when lazy
+        :param tables: table names
+        :return:
+        """
+        new = [table for table in tables if table not in self._table_names]
+        self._table_names = self._table_names.union(new)
+        for functions in (self._metadata, self._insert, self._update):
+            functions._add_tables(new)
+
+        if not self._lazy:
+            for table in new:
+                self.__setattr__(table, self._table_function(table))
+
+    def refresh_schema(self, background: bool = False) -> typing.Optional[threading.Thread]:
+        """
+        List the tables of the schema again and reflect again the tables in use, the snapshot is rewritten.
+        New tables get their functions, reads keep being served meanwhile
+        :param background: True to refresh in a daemon thread
+        :return: the thread when in background
+        """
+
+        def refresh():
+            tables, views = list_tables(self._sqlalchemy_engine, self._schema)
+            if self._snapshot is not None:
+                self._snapshot.save_names(tables, views)
+                self._snapshot.clear_tables()
+
+            for table in self._reflection_cache.names():
+                self._reflection_cache.invalidate(table)
+                try:
+                    self._reflection_cache.get(table)
+                except exc.NoSuchTableError as _:
+                    pass
+
+            if '_table_names' in self.__dict__:
+                self._add_tables(tables + views)
+
+        if not background:
+            refresh()
+            return None
+
+        thread = threading.Thread(target=refresh, name='dsdbmanager-refresh-schema', daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self, table: str) -> None:
+        """
+        Forget what is known about a table so that it is reflected and read again on next use
+        :param table: a table name
+        :return:
+        """
+        self._reflection_cache.invalidate(table)
+        self._result_cache.invalidate(table)
+
+    def refresh(self) -> None:
+        """
+        Forget what is known about all tables
+        :return:
+        """
+        self._reflection_cache.clear()
+        self._result_cache.clear()
+
+    def fetch_many(self, spec: typing.Dict[str, typing.Optional[typing.Dict[str, typing.Any]]],
+                   max_workers: int = MAX_WORKERS) -> typing.Dict[str, typing.Union[pd.DataFrame, Exception]]:
+        """
+        Read several tables concurrently on the engine's connection pool, through the same cache as table functions
+
+        >>> dfs = dbobject.fetch_many({'table1': dict(columns=('column',)), 'table 2': dict(column_3='some_value')})
+
+        A table that fails does not stop the others, its entry is the exception and a warning lists the failures
+
+        :param spec: table name to the keyword arguments of its table function, None for no argument
+        :param max_workers: number of tables read at the same time
+        :return: table name to dataframe, or to the exception raised reading it
+        """
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise BadArgumentType("max_workers must be a positive integer", None)
+
+        def fetch(table: str) -> typing.Union[pd.DataFrame, Exception]:
+            try:
+                try:
+                    function = self[table]
+                except KeyError as e:
+                    raise BadArgumentType(f"{table} is not a table of this database", e)
+                if not callable(function):
+                    raise BadArgumentType(f"{table} is not a table of this database", None)
+                return function(**(spec[table] or {}))
+            except Exception as e:
+                return e
+
+        if concurrent_connections(self._sqlalchemy_engine):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = dict(zip(spec, pool.map(fetch, spec)))
+        else:
+            results = {table: fetch(table) for table in spec}
+
+        failed = {table: result for table, result in results.items() if isinstance(result, Exception)}
+        if failed:
+            warnings.warn(
+                f"Could not read {len(failed)} table(s): " +
+                "; ".join(f"{table}: {type(e).__name__}: {e}" for table, e in failed.items())
+            )
+
+        return results
+
+    def reflection_info(self):
+        """
+        hits, misses and size of the reflection cache
+        :return:
+        """
+        return self._reflection_cache.info()
+
+    def cache_info(self):
+        """
+        hits, misses, evictions and memory used by the result cache shared by all tables
+        :return:
+        """
+        return self._result_cache.info()
+
     @property
     def sqlalchemy_engine(self):
         return self._sqlalchemy_engine
@@ -307,27 +904,44 @@ class DbMiddleware(object):
     def sqlalchemy_engine(self):
         del self._sqlalchemy_engine
 
+    def __getattr__(self, item):
+        # only called for names that are not attributes yet: tables of a lazy middleware are made on first use
+        if self.__dict__.get('_lazy') and item in self.__dict__.get('_table_names', ()):
+            function = self._table_function(item)
+            self.__setattr__(item, function)
+            return function
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{item}'")
+
     def __getitem__(self, item):
+        if item not in self.__dict__ and self.__dict__.get('_lazy') and item in self.__dict__.get('_table_names', ()):
+            return self.__getattr__(item)
         return self.__dict__[item]
 
+    def __dir__(self):
+        return sorted(set(super().__dir__()).union(self.__dict__.get('_table_names', ())))
+
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._sqlalchemy_engine.dispose()
-        properties = map(toolz.first, inspect.getmembers(self))
-        methods_only = map(toolz.first, inspect.getmembers(self, inspect.ismethod))
-        attributes = filter(lambda x: not x.startswith('__'), set(properties) - set(methods_only))
-        for attribute in attributes:
-            if attribute == 'sqlalchemy_engine':
-                continue  # _sqlalchemy_engine is all we need to clear
+        self.aio.close()
+        # a shared engine stays open for the other middlewares of its database
+        if not engine_registry.release(self._sqlalchemy_engine):
+            self._sqlalchemy_engine.dispose()
+        # only what was made: listing members would make every table of a lazy middleware
+        for attribute in list(self.__dict__):
             delattr(self, attribute)
 
 
 @toolz.curry
 def db_middleware(config_manager: ConfigFilesManager, flavor: str, db_name: str,
                   connection_object: connection_object_type, config_schema: str, connect_only: bool,
-                  schema: str = None, **engine_kwargs) -> DbMiddleware:
+                  schema: str = None, disk_cache: bool = False, snapshot: bool = False, share_engine: bool = True,
+                  validate: str = 'always', warm_up_connections: int = 0,
+                  reflection_ttl: typing.Optional[float] = REFLECTION_TTL, result_cache_bytes: int = RESULT_CACHE_BYTES,
+                  result_cache_ttl: typing.Optional[float] = RESULT_CACHE_TTL, revalidate: bool = False,
+                  read_mode: str = 'copy', in_strategy: str = 'chunks', aio_workers: int = MAX_WORKERS,
+                  lazy: bool = False, **engine_kwargs) -> DbMiddleware:
     """
     Try connecting to the database. Write credentials on success. Using a function only so that the connection
     is only attempted when function is called.
@@ -338,10 +952,39 @@ def db_middleware(config_manager: ConfigFilesManager, flavor: str, db_name: str,
     :param config_schema: the schema provided when adding database
     :param connect_only: True if all we want is connect and not inspect for tables or views
     :param schema: if user wants to specify a different schema than the one supplied when adding database
-    :param engine_kwargs: engine arguments, like echo, or warehouse, schema and role for snowflake
+    :param disk_cache: True to also cache results of table reads on disk, under the config folder
+    :param snapshot: True to keep the table names and reflected tables on disk, under the config folder,
+                     and start from them next time
+    :param share_engine: True to use the engine, and so the connection pool, of other middlewares of the same
+                         database, user and engine arguments in the process. False for an engine of its own
+    :param validate: 'always' to open a connection before returning, 'lazy' to only do so for credentials that were
+                     just typed in. Stored credentials are then checked by the first query, connections being
+                     pinged before use
+    :param warm_up_connections: number of connections of the pool to open in a background thread
+    :param reflection_ttl: see DbMiddleware
+    :param result_cache_bytes: see DbMiddleware
+    :param result_cache_ttl: see DbMiddleware
+    :param revalidate: see DbMiddleware
+    :param read_mode: see DbMiddleware
+    :param in_strategy: see DbMiddleware
+    :param aio_workers: see DbMiddleware
+    :param lazy: see DbMiddleware
+    :param engine_kwargs: engine arguments, like echo, pool_size, max_overflow, or warehouse, schema and role for
+                          snowflake. Shared engines recycle connections after an hour and ping them before use
+                          unless pool_recycle or pool_pre_ping are given
     :return:
     """
 
+    if validate not in VALIDATION_MODES:
+        raise BadArgumentType(f"validate must be one of {', '.join(VALIDATION_MODES)}, got {validate}", None)
+
+    # checked before connecting, DbMiddleware would only do so once the engine is made
+    if read_mode not in READ_MODES:
+        raise BadArgumentType(f"read_mode must be one of {', '.join(READ_MODES)}, got {read_mode}", None)
+
+    if in_strategy not in IN_STRATEGIES:
+        raise BadArgumentType(f"in_strategy must be one of {', '.join(IN_STRATEGIES)}, got {in_strategy}", None)
+
     username, password = config_manager.read_credentials(flavor, db_name)
     write_credentials = True
 
@@ -350,16 +993,32 @@ def db_middleware(config_manager: ConfigFilesManager, flavor: str, db_name: str,
     else:
         write_credentials = False
 
-    engine: sa.engine.base.Engine = connection_object.create_engine(
-        config_manager.encrypt_decrypt(username, encrypt=False).decode("utf-8"),
-        config_manager.encrypt_decrypt(password, encrypt=False).decode("utf-8"),
-        **engine_kwargs
-    )
+    user = config_manager.encrypt_decrypt(username, encrypt=False).decode("utf-8")
+    pwd = config_manager.encrypt_decrypt(password, encrypt=False).decode("utf-8")
 
-    try:
-        engine.connect().close()
-    except exc.DatabaseError as e:
-        raise e
+    if share_engine:
+        engine_kwargs = pool_options(engine_kwargs)
+        engine: sa.engine.base.Engine = engine_registry.acquire(
+            engine_key(flavor, db_name, user, pwd, engine_kwargs),
+            lambda: connection_object.create_engine(user, pwd, **engine_kwargs)
+        )
+    else:
+        if validate == 'lazy':
+            engine_kwargs.setdefault('pool_pre_ping', True)
+        engine: sa.engine.base.Engine = connection_object.create_engine(user, pwd, **engine_kwargs)
+
+    # credentials read from the credential file were accepted before
+    if validate == 'always' or write_credentials:
+        try:
+            engine.connect().close()
+        except exc.DatabaseError as e:
+            # an engine refused by the database is not kept for the next middleware
+            if not engine_registry.release(engine, dispose=True):
+                engine.dispose()
+            raise e
+
+    if warm_up_connections:
+        warm_up(engine, warm_up_connections)
 
     if write_credentials:
         config_manager.write_credentials(flavor, db_name, username, password)
@@ -369,7 +1028,19 @@ def db_middleware(config_manager: ConfigFilesManager, flavor: str, db_name: str,
 
     # technically when connect_only is True, schema should not matter
 
-    middleware = DbMiddleware(engine, connect_only, schema)
+    middleware = DbMiddleware(
+        engine, connect_only, schema,
+        disk_cache=DiskCache(flavor, db_name, schema) if disk_cache else None,
+        snapshot=SchemaSnapshot(flavor, db_name, schema) if snapshot else None,
+        reflection_ttl=reflection_ttl,
+        result_cache_bytes=result_cache_bytes,
+        result_cache_ttl=result_cache_ttl,
+        revalidate=revalidate,
+        read_mode=read_mode,
+        in_strategy=in_strategy,
+        aio_workers=aio_workers,
+        lazy=lazy
+    )
     return middleware
 
 
@@ -389,7 +1060,11 @@ class DsDbManager(object):
             )
 
         self._flavor = flavor
-        self._config_file_manager = ConfigFilesManager() if config_file_manager is None else config_file_manager
+        if config_file_manager is None:
+            config_file_manager = ConfigFilesManager()
+            config_file_manager.bootstrap()
+
+        self._config_file_manager = config_file_manager
         self._host_dict = self._config_file_manager.get_hosts()
 
         if not self._host_dict:
@@ -438,59 +1113,179 @@ class DsDbManager(object):
         return self.__dict__[item]
 
 
-class TableMeta(object):
+class TableFunctions(abc.ABC):
+    """
+    One function per table, as attributes. When lazy, the function of a table is only made the first time
+    it is used, dir() still lists every table. Subclasses say how the function of a table is made
+    """
+
+    def __init__(self, tables: typing.Tuple[str, ...], lazy: bool = False):
+        self._table_names = frozenset()
+        self._lazy = lazy
+        self._add_tables(tables)
+
+    def _add_tables(self, tables: typing.Iterable[str]) -> None:
+        """
+
+        :param tables: table names, those not known yet get their function
+        :return:
+        """
+        new = [table for table in tables if table not in self._table_names]
+        self._table_names = self._table_names.union(new)
+        if not self._lazy:
+            for table in new:
+                self.__setattr__(table, self._table_function(table))
+
+    @abc.abstractmethod
+    def _table_function(self, table: str) -> typing.Callable:
+        """
+
+        :param table: a table name
+        :return: the function of the table
+        """
+
+    def __getattr__(self, item):
+        if self.__dict__.get('_lazy') and item in self.__dict__.get('_table_names', ()):
+            function = self._table_function(item)
+            self.__setattr__(item, function)
+            return function
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{item}'")
+
+    def __getitem__(self, item):
+        try:
+            return getattr(self, item)
+        except AttributeError as e:
+            raise KeyError(item) from e
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()).union(self.__dict__.get('_table_names', ())))
+
+
+class TableMeta(TableFunctions):
     """
     We have to create distinct functions for each table. Once the function is called, the metadata is provided
     """
 
-    def __init__(self, engine: sa.engine.base.Engine, schema: str, tables: typing.Tuple[str, ...]):
-        for table in tables:
-            def meta_function(t: str = table):
-                tbl = util_function(t, engine, schema)
-                return inspect_table(tbl)
+    def __init__(self, engine: sa.engine.base.Engine, schema: str, tables: typing.Tuple[str, ...],
+                 reflection_cache: ReflectionCache = None, row_count: str = 'estimate', lazy: bool = False):
+        self._engine = engine
+        self._schema = schema
+        self._reflection_cache = reflection_cache
+        self._row_count = row_count
+        super().__init__(tables, lazy)
+
+    def _table_function(self, table: str) -> typing.Callable:
+        engine, schema, reflection_cache = self._engine, self._schema, self._reflection_cache
 
-            self.__setattr__(table, meta_function)
+        def meta_function(t: str = table, row_count: str = self._row_count):
+            """
 
+            :param t:
+            :param row_count: 'estimate' for the statistics of the catalog, 'exact' or 'skip', see inspect_table
+            :return:
+            """
+            tbl = util_function(t, engine, schema, reflection_cache)
+            return inspect_table(tbl, row_count)
 
-class TableInsert(object):
+        return meta_function
+
+    def all(self, tables: typing.Iterable[str] = None, include_counts: str = 'estimate') -> pd.DataFrame:
+        """
+        Metadata of many tables at once, from a single catalog query rather than a reflection per table
+
+        >>> dbobject._metadata.all()
+        >>> dbobject._metadata.all(tables=('table1', 'table 2'), include_counts='skip')
+
+        :param tables: table names, every table of the schema when None
+        :param include_counts: 'estimate' for the statistics of the catalog, 'exact' for a COUNT(*) per table or
+                               'skip'. Estimates are missing for tables without statistics and for dialects
+                               without a catalog query, see utils.ROW_COUNT_QUERIES
+        :return: one row per column with table_name, column_name, column_type, nullable, primary_key, position
+                 and row_count unless skipped
+        """
+        if include_counts not in ROW_COUNT_MODES:
+            raise BadArgumentType(
+                f"include_counts must be one of {', '.join(ROW_COUNT_MODES)}, got {include_counts}", None
+            )
+
+        tables = sorted(self._table_names if tables is None else set(tables))
+        df = pd.DataFrame(
+            catalog_columns(self._engine, self._schema, tables),
+            columns=['table_name', 'column_name', 'column_type', 'nullable', 'primary_key', 'position']
+        )
+        if include_counts == 'skip':
+            return df
+
+        if include_counts == 'estimate':
+            # never a COUNT(*) per table, which is what the estimate is for on large schemas
+            counts = estimate_row_counts(self._engine, self._schema, tables) or {}
+        else:
+            with self._engine.connect() as connection:
+                counts = {
+                    table: connection.execute(
+                        sa.select([sa.func.count()]).select_from(sa.table(table, schema=self._schema))
+                    ).scalar()
+                    for table in tables
+                }
+
+        df['row_count'] = pd.array([counts.get(table) for table in df['table_name']], dtype='Int64')
+        return df
+
+
+class TableInsert(TableFunctions):
     """
     distinct functions for each table
     """
 
-    def __init__(self, engine: sa.engine.base.Engine, schema: str, tables: typing.Tuple[str, ...]):
-        for table in tables:
-            insert_function = functools.partial(insert_into_table, engine=engine, schema=schema)
+    def __init__(self, engine: sa.engine.base.Engine, schema: str, tables: typing.Tuple[str, ...],
+                 reflection_cache: ReflectionCache = None, result_cache: ResultCache = None, lazy: bool = False):
+        self._insert_function = functools.partial(
+            insert_into_table, engine=engine, schema=schema, reflection_cache=reflection_cache,
+            result_cache=result_cache
+        )
+        super().__init__(tables, lazy)
 
-            def insert_func(df: pd.DataFrame, t: str = table):
-                """
+    def _table_function(self, table: str) -> typing.Callable:
+        insert_function = self._insert_function
 
-                :param df:
-                :param t:
-                :return:
-                """
-                return insert_function(df, t)
+        def insert_func(df: pd.DataFrame, t: str = table, method: str = None):
+            """
 
-            self.__setattr__(table, insert_func)
+            :param df:
+            :param t:
+            :param method: one of constants.INSERT_METHODS, None for the default of the dialect and driver
+            :return:
+            """
+            return insert_function(df, t, method=method)
 
+        return insert_func
 
-class TableUpdate(object):
+
+class TableUpdate(TableFunctions):
     """
     distinct functions for each table
     """
 
-    def __init__(self, engine: sa.engine.base.Engine, schema: str, tables: typing.Tuple[str, ...]):
-        for table in tables:
-            update_function = functools.partial(update_on_table, engine=engine, schema=schema)
+    def __init__(self, engine: sa.engine.base.Engine, schema: str, tables: typing.Tuple[str, ...],
+                 reflection_cache: ReflectionCache = None, result_cache: ResultCache = None, lazy: bool = False):
+        self._update_function = functools.partial(
+            update_on_table, engine=engine, schema=schema, reflection_cache=reflection_cache,
+            result_cache=result_cache
+        )
+        super().__init__(tables, lazy)
+
+    def _table_function(self, table: str) -> typing.Callable:
+        update_function = self._update_function
 
-            def update_func(df: pd.DataFrame, keys: update_key_type, values: update_key_type, t: str = table):
-                """
+        def update_func(df: pd.DataFrame, keys: update_key_type, values: update_key_type, t: str = table):
+            """
 
-                :param df:
-                :param keys:
-                :param values:
-                :param t:
-                :return:
-                """
-                return update_function(df, keys, values, t)
+            :param df:
+            :param keys:
+            :param values:
+            :param t:
+            :return:
+            """
+            return update_function(df, keys, values, t)
 
-            self.__setattr__(table, update_func)
+        return update_func
@@ -0,0 +1,172 @@
+"""
+Engines shared by the DbMiddleware objects of a process
+"""
+import atexit
+import typing
+import hashlib
+import warnings
+import threading
+import collections
+import sqlalchemy as sa
+from .constants import ENGINE_POOL_OPTIONS
+
+EngineRegistryInfo = collections.namedtuple('EngineRegistryInfo', ['hits', 'misses', 'engines', 'references'])
+engine_key_type = typing.Tuple[str, ...]
+
+
+def engine_key(flavor: str, db_name: str, username: str, password: str, engine_kwargs: dict) -> engine_key_type:
+    """
+
+    :param flavor: the sql flavor/dialect where the database lies
+    :param db_name: database name provided when adding database
+    :param username: the username the engine connects with
+    :param password: the password, only a digest is kept so that new credentials get a new engine
+    :param engine_kwargs: engine arguments, engines made with different arguments are not shared
+    :return: the registry key of the engine
+    """
+    return (
+        flavor, db_name, username, hashlib.sha256(password.encode()).hexdigest(),
+        repr(sorted(engine_kwargs.items()))
+    )
+
+
+class EngineRegistry(object):
+    """
+    One engine, and so one connection pool, per flavor, database, user and engine arguments in the process.
+    Each DbMiddleware made by a DsDbManager acquires the engine of its database and releases it when its context
+    exits. Engines without references are kept so that the next middleware reuses their connections, they are
+    disposed by dispose_idle() or when the process exits
+
+    >>> engine = engine_registry.acquire(key, lambda: sa.create_engine(url))  # made once
+    >>> engine_registry.acquire(key, lambda: sa.create_engine(url)) is engine
+    True
+    >>> engine_registry.release(engine)
+    True
+    """
+
+    def __init__(self):
+        # key -> [engine, number of references]
+        self._engines: typing.Dict[engine_key_type, list] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def acquire(self, key: engine_key_type,
+                create: typing.Callable[[], sa.engine.base.Engine]) -> sa.engine.base.Engine:
+        """
+
+        :param key: see engine_key
+        :param create: makes the engine when there is none for the key yet
+        :return: the shared engine of the key
+        """
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is not None:
+                self._hits += 1
+                entry[1] += 1
+                return entry[0]
+
+            self._misses += 1
+            engine = create()
+            self._engines[key] = [engine, 1]
+            return engine
+
+    def _find(self, engine: sa.engine.base.Engine) -> typing.Optional[engine_key_type]:
+        return next((key for key, entry in self._engines.items() if entry[0] is engine), None)
+
+    def release(self, engine: sa.engine.base.Engine, dispose: bool = False) -> bool:
+        """
+
+        :param engine: an engine given by acquire
+        :param dispose: True to dispose the engine and forget it if nothing else references it,
+                        e.g. when its credentials were refused
+        :return: False if the engine is not in the registry, the caller owns it
+        """
+        with self._lock:
+            key = self._find(engine)
+            if key is None:
+                return False
+
+            entry = self._engines[key]
+            entry[1] = max(entry[1] - 1, 0)
+            if dispose and entry[1] == 0:
+                del self._engines[key]
+                engine.dispose()
+
+        return True
+
+    def dispose_idle(self) -> int:
+        """
+        dispose the engines that no middleware references
+        :return: the number of engines disposed
+        """
+        with self._lock:
+            idle = [key for key, entry in self._engines.items() if entry[1] == 0]
+            for key in idle:
+                self._engines.pop(key)[0].dispose()
+
+        return len(idle)
+
+    def dispose_all(self) -> None:
+        """
+        dispose every engine, connections checked out are closed when they are returned to their pool
+        :return:
+        """
+        with self._lock:
+            engines = [entry[0] for entry in self._engines.values()]
+            self._engines.clear()
+
+        for engine in engines:
+            engine.dispose()
+
+    def info(self) -> EngineRegistryInfo:
+        with self._lock:
+            return EngineRegistryInfo(
+                self._hits, self._misses, len(self._engines), sum(entry[1] for entry in self._engines.values())
+            )
+
+
+engine_registry = EngineRegistry()
+atexit.register(engine_registry.dispose_all)
+
+
+def pool_options(engine_kwargs: dict) -> dict:
+    """
+
+    :param engine_kwargs: engine arguments given by the user
+    :return: the arguments with the pool options of constants.ENGINE_POOL_OPTIONS the user did not give
+    """
+    return dict(ENGINE_POOL_OPTIONS, **engine_kwargs)
+
+
+def warm_up(engine: sa.engine.base.Engine, connections: int) -> typing.Optional[threading.Thread]:
+    """
+    Open connections of the pool of an engine in a background thread, so that the first queries do not wait
+    for connection handshakes. Failures are only warned about, the queries will raise them
+
+    :param engine: an engine with a queue pool
+    :param connections: number of connections to open, at most the size of the pool
+    :return: the thread opening the connections, None when there is nothing to open
+    """
+    if not isinstance(engine.pool, sa.pool.QueuePool):
+        return None
+
+    connections = min(connections, engine.pool.size()) - engine.pool.checkedin()
+    if connections <= 0:
+        return None
+
+    def open_connections():
+        opened = []
+        try:
+            # held until all are open, so that the pool makes new connections instead of handing back the same one
+            for _ in range(connections):
+                opened.append(engine.connect())
+        except sa.exc.DBAPIError as e:
+            warnings.warn(f"could not open connections of {engine.url!r}: {e}")
+        finally:
+            for connection in opened:
+                connection.close()
+
+    thread = threading.Thread(target=open_connections, name='dsdbmanager-warm-up', daemon=True)
+    thread.start()
+    return thread
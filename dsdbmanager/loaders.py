@@ -0,0 +1,341 @@
+"""
+Ways of inserting a dataframe in a table. insert_into_table picks one for the dialect and driver of the engine,
+or uses the one it is given
+"""
+import os
+import time
+import uuid
+import typing
+import pathlib
+import datetime
+import functools
+import tempfile
+import concurrent.futures
+import pandas as pd
+import sqlalchemy as sa
+import sqlalchemy.exc as exc
+from .constants import CHUNK_SIZE, INSERT_METHODS, STAGE_CHUNK_SIZE, MAX_WORKERS
+from .exceptions_ import BadArgumentType, NoSuchColumn, OperationalError, MissingPackage
+from .utils import record_chunks, python_values
+
+loader_type = typing.Callable[[sa.engine.Connection, sa.Table, pd.DataFrame], int]
+
+
+def insert_chunks(chunks: typing.Iterable[typing.Sequence],
+                  insert_chunk: typing.Callable[[typing.Sequence], int]) -> int:
+    """
+    Insert chunks one after the other. A chunk failing with an operational error is tried again once
+
+    :param chunks: rows in a form insert_chunk takes
+    :param insert_chunk: inserts the rows of a chunk, returns the number of rows inserted
+    :return: the number of rows inserted
+    """
+    count, last_successful_insert = 0, None
+    for chunk in chunks:
+        try:
+            count += insert_chunk(chunk)
+        except exc.OperationalError as _:
+            # try again
+            time.sleep(2)
+
+            try:
+                count += insert_chunk(chunk)
+            except exc.OperationalError as e:
+                raise OperationalError(f"Failed to insert records. Last successful insert: {last_successful_insert}", e)
+
+        last_successful_insert = chunk[-1]
+
+    return count
+
+
+def check_columns(tbl: sa.Table, df: pd.DataFrame, case_sensitive: bool = True) -> None:
+    """
+
+    :param tbl: the table to insert into
+    :param df: a dataframe
+    :param case_sensitive: False when the columns are matched by name regardless of case, as COPY INTO does
+    :return:
+    """
+    if case_sensitive:
+        missing = [column for column in df.columns if column not in tbl.c]
+    else:
+        names = {column.name.lower() for column in tbl.columns}
+        missing = [column for column in df.columns if str(column).lower() not in names]
+    if missing:
+        raise NoSuchColumn(f"{', '.join(map(str, missing))} not in {tbl.name}", None)
+
+
+def executemany_loader(connection: sa.engine.Connection, tbl: sa.Table, df: pd.DataFrame) -> int:
+    """
+    sqlalchemy executemany of an insert, one chunk of rows at a time. Works with every dialect
+
+    :param connection: a connection to the database
+    :param tbl: the table to insert into
+    :param df: a dataframe with columns of the table
+    :return: the number of rows inserted
+    """
+    statement = tbl.insert()
+    return insert_chunks(record_chunks(df, CHUNK_SIZE), lambda group: connection.execute(statement, group).rowcount)
+
+
+def input_sizes(dialect: sa.engine.Dialect, tbl: sa.Table, columns: typing.Sequence[str]) -> typing.List:
+    """
+    Driver types of the parameters of an insert, as sqlalchemy gives them to cursor.setinputsizes for drivers that
+    need them. cx_Oracle would otherwise bind datetimes as DATE, losing fractions of seconds, and long strings as
+    VARCHAR, which fails past 4000 characters for a CLOB
+
+    :param dialect: the dialect of the engine
+    :param tbl: the table inserted into
+    :param columns: columns of the table, in the order of the parameters
+    :return: one driver type or None per column. Only Nones when the dialect does not use setinputsizes
+    """
+    if not dialect.use_setinputsizes:
+        return [None] * len(columns)
+
+    # cx_oracle only sets the types listed by the dialect, the driver guesses the others better
+    include = getattr(dialect, '_include_setinputsizes', None)
+    sizes = []
+    for column in columns:
+        impl = tbl.c[column].type.dialect_impl(dialect)
+        dbapi_type = impl.get_dbapi_type(dialect.dbapi)
+        if include is not None and dbapi_type not in include and type(impl) not in include:
+            dbapi_type = None
+        sizes.append(dbapi_type)
+    return sizes
+
+
+def dbapi_loader(connection: sa.engine.Connection, tbl: sa.Table, df: pd.DataFrame,
+                 cursor_options: typing.Dict[str, typing.Any] = None) -> int:
+    """
+    executemany on a cursor of the driver, one chunk of rows at a time. Rows are bound as tuples, without
+    the per row work of sqlalchemy, values still go through the bind processors of the column types and the driver
+    types of input_sizes. cx_Oracle binds the chunk as arrays, pyodbc does so with the fast_executemany cursor option
+
+    :param connection: a connection to the database
+    :param tbl: the table to insert into
+    :param df: a dataframe with columns of the table
+    :param cursor_options: attributes set on the cursor, like fast_executemany
+    :return: the number of rows inserted
+    """
+    check_columns(tbl, df)
+    dialect = connection.dialect
+    names = [f"p{position}" for position in range(df.shape[1])]
+    compiled = tbl.insert().values({
+        column: sa.bindparam(name, type_=tbl.c[column].type) for column, name in zip(df.columns, names)
+    }).compile(dialect=dialect)
+    statement = str(compiled)
+
+    # parameters come in the order of the table columns, not of the dataframe
+    order = [names.index(name) for name in compiled.positiontup] if compiled.positional else None
+    processors = [tbl.c[column].type.dialect_impl(dialect).bind_processor(dialect) for column in df.columns]
+    sizes = input_sizes(dialect, tbl, df.columns)
+
+    def chunks():
+        for start in range(0, len(df), CHUNK_SIZE):
+            chunk = df.iloc[start:start + CHUNK_SIZE]
+            columns = [
+                python_values(chunk.iloc[:, position]) if processor is None
+                else [None if value is None else processor(value) for value in python_values(chunk.iloc[:, position])]
+                for position, processor in enumerate(processors)
+            ]
+            if order is None:
+                yield [dict(zip(names, row)) for row in zip(*columns)]
+            else:
+                yield list(zip(*[columns[position] for position in order]))
+
+    def insert_chunk(rows: typing.List) -> int:
+        cursor = connection.connection.cursor()
+        for option, value in (cursor_options or {}).items():
+            setattr(cursor, option, value)
+        if any(size is not None for size in sizes):
+            if order is None:
+                cursor.setinputsizes(**{name: size for name, size in zip(names, sizes) if size is not None})
+            else:
+                cursor.setinputsizes(*[sizes[position] for position in order])
+
+        try:
+            with connection.begin():
+                cursor.executemany(statement, rows)
+            return cursor.rowcount if cursor.rowcount >= 0 else len(rows)
+        except dialect.dbapi.Error as e:
+            raise exc.DBAPIError.instance(statement, None, e, dialect.dbapi.Error) from e
+        finally:
+            cursor.close()
+
+    return insert_chunks(chunks(), insert_chunk)
+
+
+def mysql_field(value: typing.Any) -> str:
+    """
+
+    :param value: a python value
+    :return: the value as a field of a LOAD DATA file with the default escape character
+    """
+    if value is None:
+        return '\\N'
+
+    if isinstance(value, bool):
+        return str(int(value))
+
+    if isinstance(value, (int, float)):
+        return repr(value)
+
+    if isinstance(value, (datetime.date, datetime.time)):
+        return f'"{value}"'
+
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def load_data_loader(connection: sa.engine.Connection, tbl: sa.Table, df: pd.DataFrame) -> int:
+    """
+    LOAD DATA LOCAL INFILE of a temporary file per chunk of rows, on mysql. The server and the driver must allow
+    local files, e.g. with connect_args={'local_infile': True} when connecting
+
+    :param connection: a connection to the database
+    :param tbl: the table to insert into
+    :param df: a dataframe with columns of the table
+    :return: the number of rows inserted
+    """
+    check_columns(tbl, df)
+    preparer = connection.dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(column) for column in df.columns)
+
+    def chunks():
+        for start in range(0, len(df), CHUNK_SIZE):
+            chunk = df.iloc[start:start + CHUNK_SIZE]
+            yield list(zip(*[python_values(chunk.iloc[:, position]) for position in range(chunk.shape[1])]))
+
+    def insert_chunk(rows: typing.List[tuple]) -> int:
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='', delete=False) as f:
+            for row in rows:
+                f.write(','.join(map(mysql_field, row)) + '\n')
+
+        path = f.name.replace('\\', '\\\\').replace("'", "\\'")
+        try:
+            with connection.begin():
+                result = connection.exec_driver_sql(
+                    f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {preparer.format_table(tbl)} CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' ({columns})"
+                )
+            return result.rowcount
+        finally:
+            os.remove(f.name)
+
+    return insert_chunks(chunks(), insert_chunk)
+
+
+def write_parquet_chunks(df: pd.DataFrame, folder: pathlib.Path, prefix: str, chunksize: int = STAGE_CHUNK_SIZE,
+                         max_workers: int = MAX_WORKERS) -> typing.List[pathlib.Path]:
+    """
+    Write a dataframe as snappy compressed parquet files of chunksize rows, concurrently. Timestamps are written
+    in microseconds, the precision snowflake reads from parquet
+
+    :param df: a dataframe
+    :param folder: where files are written
+    :param prefix: start of the file names
+    :param chunksize: number of rows per file
+    :param max_workers: number of files written at the same time
+    :return: the files written
+    """
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise MissingPackage("You need the pyarrow package to load dataframes through a stage", e)
+
+    def write(start: int) -> pathlib.Path:
+        path = folder / f"{prefix}_{start // chunksize}.parquet"
+        df.iloc[start:start + chunksize].to_parquet(
+            path, engine='pyarrow', compression='snappy', index=False,
+            coerce_timestamps='us', allow_truncated_timestamps=True
+        )
+        return path
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='dsdbmanager-parquet') as pool:
+        return list(pool.map(write, range(0, len(df), chunksize)))
+
+
+def stage_loader(connection: sa.engine.Connection, tbl: sa.Table, df: pd.DataFrame) -> int:
+    """
+    PUT of parquet files of the dataframe to the stage of the table and COPY INTO the table, on snowflake.
+    Columns are matched by name regardless of case, files are removed from the stage once loaded.
+    The pyarrow package is required
+
+    :param connection: a connection to the database
+    :param tbl: the table to insert into
+    :param df: a dataframe with columns of the table
+    :return: the number of rows loaded
+    """
+    check_columns(tbl, df, case_sensitive=False)
+    if df.empty:
+        return 0
+
+    preparer = connection.dialect.identifier_preparer
+    schema = f"{preparer.quote_schema(tbl.schema)}." if tbl.schema else ''
+    stage = f"@{schema}%{preparer.quote(tbl.name)}"
+    prefix = f"dsdbmanager_{uuid.uuid4().hex}"
+
+    dbapi_connection = connection.connection
+    with tempfile.TemporaryDirectory() as folder:
+        files = write_parquet_chunks(df, pathlib.Path(folder), prefix, STAGE_CHUNK_SIZE)
+        statements = [
+            f"PUT 'file://{pathlib.Path(folder).as_posix()}/{prefix}_*.parquet' {stage} "
+            f"PARALLEL={min(len(files), 99)} AUTO_COMPRESS=FALSE OVERWRITE=TRUE",
+            f"COPY INTO {preparer.format_table(tbl)} FROM {stage} PATTERN='.*{prefix}_[0-9]+[.]parquet' "
+            f"FILE_FORMAT=(TYPE=PARQUET) MATCH_BY_COLUMN_NAME=CASE_INSENSITIVE PURGE=TRUE"
+        ]
+
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+            copied = cursor.fetchall()
+            columns = [column[0].lower() for column in cursor.description]
+        except connection.dialect.dbapi.Error as e:
+            raise exc.DBAPIError.instance(statement, None, e, connection.dialect.dbapi.Error) from e
+        finally:
+            cursor.close()
+
+    # one row per file loaded, or a single status row when there was nothing to load
+    if 'rows_loaded' not in columns:
+        return 0
+    return sum(row[columns.index('rows_loaded')] for row in copied)
+
+
+# INSERT_METHODS and their loaders
+LOADERS: typing.Dict[str, loader_type] = {
+    'executemany': executemany_loader,
+    'dbapi': dbapi_loader,
+    'fast_executemany': functools.partial(dbapi_loader, cursor_options={'fast_executemany': True}),
+    'load_data': load_data_loader,
+    'stage': stage_loader,
+}
+
+# method used when none is given, by dialect+driver or dialect. Others use executemany.
+# sqlite stands in for the drivers binding arrays so that the dbapi loader is what tests go through.
+# Mssql engines made by dsdbmanager use pymssql, which has no faster executemany: mssql+pyodbc is only picked for
+# engines made by the user, e.g. DbMiddleware(sa.create_engine('mssql+pyodbc://...'), ...)
+DEFAULT_LOADERS = {
+    'mssql+pyodbc': 'fast_executemany',
+    'oracle': 'dbapi',
+    'sqlite': 'dbapi',
+}
+
+
+def pick_loader(dialect: sa.engine.Dialect, method: str = None) -> loader_type:
+    """
+
+    :param dialect: the dialect of the engine
+    :param method: one of constants.INSERT_METHODS, None for the default method of the dialect and driver.
+                   The default of mssql with pymssql, the driver of dsdbmanager, is executemany
+    :return: the loader
+    """
+    if method is None:
+        method = DEFAULT_LOADERS.get(
+            f"{dialect.name}+{dialect.driver}", DEFAULT_LOADERS.get(dialect.name, 'executemany')
+        )
+
+    if method not in INSERT_METHODS:
+        raise BadArgumentType(f"method must be one of {', '.join(INSERT_METHODS)}, got {method}", None)
+
+    return LOADERS[method]
@@ -1,15 +1,169 @@
+import uuid
+import numbers
 import typing
+import decimal
+import datetime
+import warnings
 import functools
+import contextlib
 import toolz
 import pandas as pd
 import numpy as np
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
+import sqlalchemy.exc as exc
 import sqlalchemy.sql.elements as sqlelements
+from sqlalchemy.schema import CreateTable
+from .constants import IN_LIST_LIMIT, BIND_PARAMETER_LIMITS, CHUNK_SIZE, ROW_COUNT_MODES
 from .exceptions_ import BadArgumentType, NoSuchColumn
 
-function_type_for_dframe = typing.Callable[..., typing.Tuple[np.ndarray, typing.Tuple[str, ...]]]
+column_array_type = typing.Union[np.ndarray, pd.api.extensions.ExtensionArray]
+columnar_type = typing.Dict[str, column_array_type]
+function_type_for_dframe = typing.Callable[
+    ...,
+    typing.Tuple[typing.Union[np.ndarray, columnar_type], typing.Tuple[str, ...]]
+]
 regular_column_content = typing.Union[str, int, float, tuple, dict]
+# filters other than equality and membership, used as column__filter_type=value in table functions
+FILTER_TYPES = ('bw', 'lt', 'le', 'gt', 'ge', 'like', 'not_like', 'not_in')
+
+# aggregate functions of table_function.aggregate, the result has the type of the column unless given
+AGGREGATE_FUNCTIONS = {
+    'sum': lambda column: sa.func.sum(column),
+    'count': lambda column: sa.func.count(column),
+    'count_distinct': lambda column: sa.func.count(sa.distinct(column)),
+    'min': lambda column: sa.func.min(column),
+    'max': lambda column: sa.func.max(column),
+    'mean': lambda column: sa.func.avg(column, type_=sa.Float()),
+}
+
+# cheap catalog queries whose result changes when the content of a table changes
+# :schema and :table are bound to names as stored in the catalog, :schema is None for the default schema.
+# Only dialects keeping such a value up to date are here:
+# - mssql counts the last update of each index in memory, reset when the server restarts
+# - snowflake sets LAST_ALTERED on every DML
+# - mysql keeps UPDATE_TIME in memory with a one second resolution, mysql 8 caches it for
+#   information_schema_stats_expiry seconds (a day) unless the session sets it to 0, see CHANGE_SIGNAL_SETUP.
+#   Two changes within the same second as a read, or on MyISAM tables during a running statement, can be missed
+# oracle only flushes ALL_TAB_MODIFICATIONS periodically or with DBMS_STATS, and counting rows scans the table and
+# misses updates: oracle, teradata, sqlite and other dialects have no signal
+CHANGE_SIGNAL_QUERIES = {
+    'mysql': (
+        "SELECT UPDATE_TIME, TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND TABLE_NAME = :table"
+    ),
+    'mssql': (
+        "SELECT MAX(last_user_update) FROM sys.dm_db_index_usage_stats "
+        "WHERE database_id = DB_ID() "
+        "AND object_id = OBJECT_ID(QUOTENAME(COALESCE(:schema, SCHEMA_NAME())) + '.' + QUOTENAME(:table))"
+    ),
+    'snowflake': (
+        "SELECT LAST_ALTERED, ROW_COUNT FROM INFORMATION_SCHEMA.TABLES "
+        "WHERE TABLE_SCHEMA = COALESCE(:schema, CURRENT_SCHEMA()) AND TABLE_NAME = :table"
+    ),
+}
+
+# statements run before the signal query, failures are ignored (mysql 5.7 has no stats expiry and does not need it)
+CHANGE_SIGNAL_SETUP = {
+    'mysql': "SET SESSION information_schema_stats_expiry = 0",
+}
+
+# errors of a read using a column or table that was dropped or renamed, by dialect. Numbers are compared with the
+# error code of the driver, strings looked for in its message. Drivers do not agree on the exception class:
+# cx_Oracle and teradata raise DatabaseError, pymysql and sqlite OperationalError, pymssql ProgrammingError
+SCHEMA_CHANGE_ERRORS = {
+    'oracle': ('ORA-00904', 'ORA-00942'),
+    'mysql': (1054, 1146),
+    'mssql': (207, 208),
+    'teradata': (3807, 5628, '[Error 3807]', '[Error 5628]'),
+    'sqlite': ('no such column', 'no such table'),
+}
+
+# estimated number of rows of every table of a schema from the statistics each dialect keeps in its catalog,
+# as (table, rows). Tables are picked in python: a list of names would go past the IN list limit of oracle
+# and the parameter limit of mssql on large schemas
+ROW_COUNT_QUERIES = {
+    'oracle': (
+        "SELECT TABLE_NAME, NUM_ROWS FROM ALL_TABLES "
+        "WHERE OWNER = COALESCE(:schema, SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA'))"
+    ),
+    'mssql': (
+        "SELECT t.name, SUM(p.rows) FROM sys.tables t "
+        "JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1) "
+        "WHERE SCHEMA_NAME(t.schema_id) = COALESCE(:schema, SCHEMA_NAME()) "
+        "GROUP BY t.name"
+    ),
+    'mysql': (
+        "SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE())"
+    ),
+    'snowflake': (
+        "SELECT TABLE_NAME, ROW_COUNT FROM INFORMATION_SCHEMA.TABLES "
+        "WHERE TABLE_SCHEMA = COALESCE(:schema, CURRENT_SCHEMA())"
+    ),
+    'teradata': (
+        "SELECT TableName, MAX(RowCount) FROM DBC.StatsV "
+        "WHERE DatabaseName = COALESCE(:schema, DATABASE) "
+        "GROUP BY TableName"
+    ),
+}
+
+# columns of every table of a schema in one catalog query, as
+# (table, column, type, nullable, primary key, position), nullable is Y/YES or N/NO
+INFORMATION_SCHEMA_COLUMNS = (
+    "SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE, c.IS_NULLABLE, "
+    "CASE WHEN k.COLUMN_NAME IS NULL THEN 0 ELSE 1 END, c.ORDINAL_POSITION "
+    "FROM INFORMATION_SCHEMA.COLUMNS c "
+    "LEFT JOIN ("
+    "SELECT u.TABLE_SCHEMA, u.TABLE_NAME, u.COLUMN_NAME FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS t "
+    "JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE u ON u.CONSTRAINT_SCHEMA = t.CONSTRAINT_SCHEMA "
+    "AND u.CONSTRAINT_NAME = t.CONSTRAINT_NAME AND u.TABLE_NAME = t.TABLE_NAME "
+    "WHERE t.CONSTRAINT_TYPE = 'PRIMARY KEY'"
+    ") k ON k.TABLE_SCHEMA = c.TABLE_SCHEMA AND k.TABLE_NAME = c.TABLE_NAME AND k.COLUMN_NAME = c.COLUMN_NAME "
+    "WHERE c.TABLE_SCHEMA = COALESCE(:schema, {current_schema}) "
+    "ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION"
+)
+COLUMN_QUERIES = {
+    'oracle': (
+        "SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE, c.NULLABLE, "
+        "CASE WHEN k.COLUMN_NAME IS NULL THEN 0 ELSE 1 END, c.COLUMN_ID "
+        "FROM ALL_TAB_COLUMNS c "
+        "LEFT JOIN ("
+        "SELECT cc.OWNER, cc.TABLE_NAME, cc.COLUMN_NAME FROM ALL_CONSTRAINTS p "
+        "JOIN ALL_CONS_COLUMNS cc ON cc.OWNER = p.OWNER AND cc.CONSTRAINT_NAME = p.CONSTRAINT_NAME "
+        "WHERE p.CONSTRAINT_TYPE = 'P'"
+        ") k ON k.OWNER = c.OWNER AND k.TABLE_NAME = c.TABLE_NAME AND k.COLUMN_NAME = c.COLUMN_NAME "
+        "WHERE c.OWNER = COALESCE(:schema, SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA')) "
+        "ORDER BY c.TABLE_NAME, c.COLUMN_ID"
+    ),
+    'mssql': INFORMATION_SCHEMA_COLUMNS.format(current_schema='SCHEMA_NAME()'),
+    'mysql': INFORMATION_SCHEMA_COLUMNS.format(current_schema='DATABASE()'),
+    # snowflake does not list key columns in its information schema, primary keys are not reported
+    'snowflake': (
+        "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, 0, ORDINAL_POSITION "
+        "FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_SCHEMA = COALESCE(:schema, CURRENT_SCHEMA()) "
+        "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+    ),
+    'teradata': (
+        "SELECT c.TableName, c.ColumnName, c.ColumnType, c.Nullable, "
+        "CASE WHEN i.ColumnName IS NULL THEN 0 ELSE 1 END, c.ColumnId "
+        "FROM DBC.ColumnsV c "
+        "LEFT JOIN DBC.IndicesV i ON i.DatabaseName = c.DatabaseName AND i.TableName = c.TableName "
+        "AND i.ColumnName = c.ColumnName AND i.IndexType = 'K' "
+        "WHERE c.DatabaseName = COALESCE(:schema, DATABASE) "
+        "ORDER BY c.TableName, c.ColumnId"
+    ),
+}
+
+# how each dialect spells a temporary table: name prefix, CREATE prefixes and clause after the definition
+TEMP_TABLE_SYNTAX = {
+    'mssql': ('#', (), ''),
+    'oracle': ('', ('GLOBAL TEMPORARY',), ' ON COMMIT PRESERVE ROWS'),
+    'teradata': ('', ('VOLATILE',), ' ON COMMIT PRESERVE ROWS'),
+}
+DEFAULT_TEMP_TABLE_SYNTAX = ('', ('TEMPORARY',), '')
+
 inspect_type = typing.Dict[
     str,
     typing.Union[
@@ -24,6 +178,7 @@ def d_frame(f: function_type_for_dframe, records: bool = False) -> typing.Callab
     """
     Decorator that produces a pandas DataFrame from numpy array and columns
     :param f: a function that returns either a tuple of numpy arrau and column names or a tuple of records (dictionaries)
+            the numpy array can also be a dictionary of one array per column as made by columnar_result
     :param records: True if the function supplied returns tuples of records, False if ndarray and columns
     :return:
     """
@@ -32,6 +187,8 @@ def d_frame(f: function_type_for_dframe, records: bool = False) -> typing.Callab
     def wrap(*args, **kwargs) -> pd.DataFrame:
         if not records:
             arr, cols = f(*args, **kwargs)
+            if isinstance(arr, dict):
+                return pd.DataFrame(data=arr, columns=cols, copy=True)
             if arr.size == 0:
                 return pd.DataFrame(columns=cols, copy=True)
             return pd.DataFrame(data=arr, columns=cols, copy=True)
@@ -42,16 +199,222 @@ def d_frame(f: function_type_for_dframe, records: bool = False) -> typing.Callab
     return wrap
 
 
-def inspect_table(table: sa.Table) -> inspect_type:
+def copy_on_write() -> bool:
+    """
+
+    :return: True if pandas copies shared data before modifying it, i.e. copy on write mode is on
+    """
+    try:
+        return bool(pd.get_option('mode.copy_on_write'))
+    except (KeyError, pd.errors.OptionError) as _:
+        # copy on write is the only mode from pandas 3 onward
+        return int(pd.__version__.split('.')[0]) >= 3
+
+
+def frame_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A new dataframe over the same buffers as df, no data is copied. Unless pandas copy on write mode is on,
+    the buffers are made read-only so that modifying the view in place raises a ValueError instead of
+    modifying df. Adding or replacing columns of the view is fine and df.copy() gives a writable dataframe
+
+    :param df: a dataframe, typically a cached result
+    :return: a shallow copy of df
+    """
+    if not copy_on_write():
+        for block in getattr(df._mgr, 'blocks', ()):
+            values = block.values
+            for buffer in (values, *(getattr(values, attr, None) for attr in ('_ndarray', '_data', '_mask'))):
+                if isinstance(buffer, np.ndarray):
+                    buffer.flags.writeable = False
+
+    return df.copy(deep=False)
+
+
+def python_type(typ: sa.types.TypeEngine) -> typing.Union[type, None]:
+    """
+
+    :param typ: a sqlalchemy column type
+    :return: the python type of the values in the column, None if sqlalchemy does not know it
+    """
+
+    try:
+        return typ.python_type
+    except Exception as _:
+        return None
+
+
+def column_array(values: typing.Sequence, typ: sa.types.TypeEngine) -> column_array_type:
+    """
+    Typed array for the values of one column. Falls back to an object array when the values do not fit the type
+
+    :param values: the values of the column
+    :param typ: the sqlalchemy type of the column
+    :return: a numpy array or a pandas extension array for nullable integers, booleans and strings
+    """
+    kind = python_type(typ)
+    has_null = None in values
+
+    try:
+        if kind is bool:
+            return pd.array(values, dtype='boolean') if has_null else np.array(values, dtype=np.bool_)
+
+        if kind is int:
+            return pd.array(values, dtype='Int64') if has_null else np.array(values, dtype=np.int64)
+
+        if kind in (float, decimal.Decimal):
+            return np.array(values, dtype=np.float64)
+
+        if kind in (datetime.datetime, datetime.date):
+            return pd.to_datetime(list(values)).array
+
+        if kind is str:
+            return pd.array(values, dtype='string')
+
+    except (TypeError, ValueError, OverflowError) as _:
+        pass
+
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def columnar_result(rows: typing.Sequence[typing.Sequence], columns: typing.Tuple[str, ...],
+                    types: typing.Sequence[sa.types.TypeEngine]) -> columnar_type:
+    """
+    Turn rows fetched from a cursor into one typed array per column
+
+    :param rows: rows as returned by fetchall or fetchmany
+    :param columns: the names of the columns in the rows
+    :param types: the sqlalchemy types of the columns
+    :return: a dictionary of column name to array
+    """
+    columns_values = zip(*rows) if rows else (() for _ in columns)
+    return {
+        col: column_array(values, typ)
+        for col, typ, values in zip(columns, types, columns_values)
+    }
+
+
+def python_values(column: pd.Series) -> typing.List[typing.Any]:
+    """
+
+    :param column: a column of a dataframe
+    :return: its values as python objects the database drivers take, missing values (nan, NaT, NA) as None
+    """
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def record_chunks(df: pd.DataFrame, chunksize: int = CHUNK_SIZE,
+                  names: typing.Sequence[str] = None) -> typing.Iterator[typing.List[typing.Dict[str, typing.Any]]]:
+    """
+    Parameters of an executemany, one chunk of rows at a time. Only the rows of the chunk are converted to python
+    objects so that the memory needed does not grow with the dataframe
+
+    :param df: a dataframe
+    :param chunksize: number of rows per chunk
+    :param names: parameter names of the columns, the column names by default
+    :return: lists of one dictionary of parameter name to value per row
+    """
+    names = tuple(df.columns) if names is None else tuple(names)
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        columns = [python_values(chunk.iloc[:, position]) for position in range(chunk.shape[1])]
+        yield [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def estimate_row_counts(engine: sa.engine.base.Engine, schema: typing.Optional[str],
+                        tables: typing.Sequence[str]) -> typing.Optional[typing.Dict[str, typing.Optional[int]]]:
+    """
+    Number of rows of tables as estimated by the statistics of the catalog, in one query for the whole schema
+    whatever the number of tables. Cheap but as recent as the last statistics gathering
+
+    :param engine: the sqlalchemy engine for the database
+    :param schema: the schema of the tables - None for the default schema
+    :param tables: table names as sqlalchemy reports them
+    :return: table name to estimated number of rows, None for tables without statistics.
+             None when the dialect has no statistics or the catalog cannot be read
+    """
+    query = ROW_COUNT_QUERIES.get(engine.dialect.name)
+    if query is None:
+        return None
+
+    names = {catalog_name(engine.dialect, table): table for table in tables}
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(sa.text(query), dict(schema=catalog_name(engine.dialect, schema))).fetchall()
+    except exc.DBAPIError as _:
+        return None
+
+    counts = dict.fromkeys(tables)
+    for name, number_of_rows in rows:
+        if name in names and number_of_rows is not None:
+            counts[names[name]] = int(number_of_rows)
+    return counts
+
+
+def catalog_columns(engine: sa.engine.base.Engine, schema: typing.Optional[str],
+                    tables: typing.Collection[str]) -> typing.List[typing.Tuple[str, str, str, bool, bool, int]]:
+    """
+    Columns of many tables in a single catalog query where the dialect has one. Other dialects, or a catalog
+    we are not allowed to read, go through the sqlalchemy inspector one table at a time
+
+    :param engine: the sqlalchemy engine for the database
+    :param schema: the schema of the tables - None for the default schema
+    :param tables: table names as sqlalchemy reports them
+    :return: (table, column, type, nullable, primary key, position) for each column, in table and column order
+    """
+    dialect = engine.dialect
+    query = COLUMN_QUERIES.get(dialect.name)
+    tables = set(tables)
+
+    if query is not None:
+        try:
+            with engine.connect() as connection:
+                rows = connection.execute(sa.text(query), dict(schema=catalog_name(dialect, schema))).fetchall()
+        except exc.DBAPIError as _:
+            rows = None
+
+        if rows is not None:
+            normalize = dialect.normalize_name if getattr(dialect, 'requires_name_normalize', False) else str
+            columns = []
+            for table, column, typ, nullable, primary_key, position in rows:
+                table = normalize(str(table).strip())
+                if table in tables:
+                    columns.append((
+                        table, normalize(str(column).strip()), str(typ).strip(),
+                        str(nullable).strip().upper() in ('Y', 'YES'), bool(primary_key), int(position)
+                    ))
+            return columns
+
+    inspection = sa.inspect(engine)
+    columns = []
+    for table in sorted(tables):
+        # the sqlite dialect sorts its cached columns in get_pk_constraint, columns are read first
+        table_columns = list(inspection.get_columns(table, schema=schema))
+        keys = set(inspection.get_pk_constraint(table, schema=schema).get('constrained_columns') or ())
+        for position, column in enumerate(table_columns, start=1):
+            columns.append((
+                table, column['name'], str(column['type']), bool(column.get('nullable', True)),
+                column['name'] in keys, position
+            ))
+    return columns
+
+
+def inspect_table(table: sa.Table, row_count: str = 'exact') -> inspect_type:
     """
 
     :param table: a sqlalchemy Table object
+    :param row_count: 'exact' for a COUNT(*) of the table, 'estimate' for the statistics of the catalog as in
+                      estimate_row_counts, or the exact count for dialects without statistics. 'skip' for no count
     :return: a dictionary with some metdata on the table
     """
 
     if not isinstance(table, sa.Table):
         raise BadArgumentType("table argument is not a sqlAlchemy Table", None)
 
+    if row_count not in ROW_COUNT_MODES:
+        raise BadArgumentType(f"row_count must be one of {', '.join(ROW_COUNT_MODES)}, got {row_count}", None)
+
     def str_type(typ: sa.types.TypeEngine) -> typing.Union[str, sa.types.TypeEngine]:
         """
 
@@ -64,22 +427,19 @@ def inspect_table(table: sa.Table) -> inspect_type:
         except Exception as _:
             return typ
 
-    def python_type_(typ: sa.types.TypeEngine) -> typing.Union[type, None]:
-        """
-
-        :param typ:
-        :return:
-        """
-
-        try:
-            return typ.python_type
-        except Exception as _:
-            return None
-
     # number of rows
-    if isinstance(table.bind, sa.engine.base.Engine):
+    estimates = None
+    if row_count == 'estimate' and isinstance(table.bind, sa.engine.base.Engine):
+        estimates = estimate_row_counts(table.bind, table.schema, [table.name])
+
+    if row_count == 'skip':
+        number_of_rows = "N/A"
+    elif estimates is not None:
+        number_of_rows = "N/A" if estimates[table.name] is None else estimates[table.name]
+    elif isinstance(table.bind, sa.engine.base.Engine):
         try:
-            number_of_rows = orm.Session(table.bind).query(table).count()
+            with orm.Session(table.bind) as session:
+                number_of_rows = session.query(table).count()
         except Exception as _:
             number_of_rows = "N/A"
     else:
@@ -89,7 +449,7 @@ def inspect_table(table: sa.Table) -> inspect_type:
         dict(
             column_name=str(el.name),
             column_type=str_type(el.type),
-            python_type=python_type_(el.type),
+            python_type=python_type(el.type),
             primary_key=el.primary_key,
             nullable=el.nullable,
         )
@@ -126,13 +486,368 @@ def filter_maker(tbl: sa.Table, k: str, val: regular_column_content) -> sqleleme
         raise NoSuchColumn(f"{k} is not a column in the {tbl.name} table", e)
 
 
+def select_maker(tbl: sa.Table, columns: typing.Tuple[str, ...] = None,
+                 **kwargs) -> typing.Tuple[sa.sql.Select, typing.Tuple[str, ...]]:
+    """
+
+    :param tbl: a sqlalchemy Table object
+    :param columns: set of columns to select. All columns when None
+    :param kwargs: column to filter as in kwarg_filter_maker
+    :return: the select statement and the names of the columns it returns
+    """
+    tbl_cols = [el.name for el in tbl.columns]
+    if columns is None:
+        query = sa.select([tbl])
+    else:
+        # check if all columns are in table
+        not_in_table = set(columns) - set(tbl_cols)
+        if not_in_table == set(columns):
+            raise NoSuchColumn(f"None of the columns [{', '.join(sorted(columns))}] are in table {tbl.name}", None)
+
+        if len(not_in_table) > 0:
+            warnings.warn(f"Columns [{', '.join(sorted(not_in_table))}] are not in table {tbl.name}")
+
+        tbl_cols = [el for el in columns if el in tbl_cols]
+        query = sa.select([tbl.c[col] for col in tbl_cols])
+
+    if kwargs:
+        filters = [kwarg_filter_maker(tbl, el, val) for el, val in kwargs.items()]
+        query = query.where(sa.and_(*filters))
+
+    return query, tuple(tbl_cols)
+
+
+def aggregate_maker(tbl: sa.Table, group_by: typing.Tuple[str, ...] = (),
+                    metrics: typing.Dict[str, typing.Union[str, typing.Tuple[str, ...]]] = None,
+                    **kwargs) -> typing.Tuple[sa.sql.Select, typing.Tuple[str, ...], typing.List[sa.types.TypeEngine]]:
+    """
+
+    :param tbl: a sqlalchemy Table object
+    :param group_by: columns to group on
+    :param metrics: column to one or several functions of AGGREGATE_FUNCTIONS
+    :param kwargs: column to filter as in kwarg_filter_maker
+    :return: the select statement, ordered by the group_by columns, the names of the columns it returns and their types
+    """
+    metrics = {} if metrics is None else metrics
+    if not (group_by or metrics):
+        raise BadArgumentType("aggregate needs group_by columns or metrics", None)
+
+    not_in_table = set(group_by).union(metrics) - set(tbl.c.keys())
+    if not_in_table:
+        raise NoSuchColumn(f"Columns [{', '.join(sorted(not_in_table))}] are not in table {tbl.name}", None)
+
+    selected = [tbl.c[col] for col in group_by]
+    for col, functions in metrics.items():
+        for function in ((functions,) if isinstance(functions, str) else functions):
+            if function not in AGGREGATE_FUNCTIONS:
+                raise BadArgumentType(
+                    f"metrics must be among {', '.join(AGGREGATE_FUNCTIONS)}, got {function} for {col}", None
+                )
+            selected.append(AGGREGATE_FUNCTIONS[function](tbl.c[col]).label(f"{col}_{function}"))
+
+    query = sa.select(selected)
+    if group_by:
+        query = query.group_by(*(tbl.c[col] for col in group_by)).order_by(*(tbl.c[col] for col in group_by))
+
+    if kwargs:
+        query = query.where(sa.and_(*(kwarg_filter_maker(tbl, el, val) for el, val in kwargs.items())))
+
+    return query, tuple(el.name for el in selected), [el.type for el in selected]
+
+
+def limit_maker(query: sa.sql.Select, tbl: sa.Table, columns: typing.Tuple[str, ...], dialect: str,
+                rows: int = None, offset: int = None) -> sa.sql.Select:
+    """
+    Restrict a select statement to a number of rows in the database rather than on the client.
+    sqlalchemy compiles limit and offset to LIMIT, TOP, FETCH FIRST or ROWNUM depending on the dialect
+
+    :param query: a select statement as made by select_maker
+    :param tbl: the sqlalchemy Table object queried
+    :param columns: the names of the columns selected
+    :param dialect: the name of the sqlalchemy dialect of the engine, i.e. engine.dialect.name
+    :param rows: number of rows to keep. None to keep all rows
+    :param offset: number of rows to skip
+    :return: the restricted select statement
+    """
+    for name, value in (('rows', rows), ('offset', offset)):
+        if value is not None and (not isinstance(value, numbers.Integral) or isinstance(value, bool) or value < 0):
+            raise BadArgumentType(f"{name} must be a non negative integer", None)
+
+    # numpy integers are fine, sqlalchemy gets python ones
+    rows = None if rows is None else int(rows)
+    offset = None if offset is None else int(offset)
+
+    if not offset:
+        return query if rows is None else query.limit(rows)
+
+    # skipping rows only makes sense with a deterministic order. Some dialects, like mssql, even require it
+    order_by = [el for el in tbl.primary_key.columns] or [tbl.c[col] for col in columns]
+
+    if dialect != 'teradata':
+        query = query.order_by(*order_by).offset(offset)
+        return query if rows is None else query.limit(rows)
+
+    # teradata has no OFFSET. Number the rows and keep the window as a QUALIFY clause would
+    row_number = sa.func.row_number().over(order_by=order_by).label('dsdbmanager_row_number')
+    numbered = query.add_columns(row_number).alias('dsdbmanager_numbered')
+    window = numbered.c['dsdbmanager_row_number'] > offset
+    if rows is not None:
+        window = sa.and_(window, numbered.c['dsdbmanager_row_number'] <= offset + rows)
+
+    return sa.select([numbered.c[col] for col in columns]).where(window).order_by(
+        numbered.c['dsdbmanager_row_number']
+    )
+
+
+def catalog_name(dialect: sa.engine.Dialect, name: typing.Optional[str]) -> typing.Optional[str]:
+    """
+
+    :param dialect: the dialect of an engine
+    :param name: a table or schema name as sqlalchemy reports it
+    :return: the name as stored in the catalog. oracle and snowflake store case insensitive names in upper case
+    """
+    if getattr(dialect, 'requires_name_normalize', False):
+        return dialect.denormalize_name(name)
+    return name
+
+
+def table_change_signal(engine: sa.engine.base.Engine, tbl: sa.Table) -> typing.Optional[typing.Tuple[typing.Any, ...]]:
+    """
+    A value that changes when the content of a table changes, read from the catalog of dialects in
+    CHANGE_SIGNAL_QUERIES. See there for what each signal can miss
+
+    :param engine: the sqlalchemy engine for the database
+    :param tbl: a sqlalchemy Table object
+    :return: a tuple to compare with a previous signal. None when the dialect has no reliable signal or the catalog
+             cannot be read, the table must then be read again
+    """
+    query = CHANGE_SIGNAL_QUERIES.get(engine.dialect.name)
+    if query is None:
+        return None
+
+    params = dict(
+        schema=catalog_name(engine.dialect, tbl.schema),
+        table=catalog_name(engine.dialect, tbl.name)
+    )
+    with engine.connect() as connection:
+        setup = CHANGE_SIGNAL_SETUP.get(engine.dialect.name)
+        if setup is not None:
+            try:
+                connection.execute(sa.text(setup))
+            except exc.DBAPIError as _:
+                pass
+
+        try:
+            return tuple(tuple(row) for row in connection.execute(sa.text(query), params).fetchall())
+        except exc.DBAPIError as _:
+            return None
+
+
 def complex_filter_maker(tbl: sa.Table, item: typing.Tuple[str, typing.Any],
-                         filter_type: str) -> sqlelements.BinaryExpression:
+                         filter_type: str) -> sqlelements.ColumnElement:
     """
 
-    :param tbl:
-    :param item:
+    :param tbl: a sqlalchemy Table object
+    :param item: a column name in that table object and the value to compare it to
     :param filter_type: one of ('bw', 'lt', 'le', 'gt', 'ge', 'like', 'not_like', 'not_in')
+                        'bw' takes a tuple (low, high) and keeps both ends, 'not_in' takes a tuple of values
+    :return:
+    """
+
+    if not isinstance(tbl, sa.Table):
+        raise BadArgumentType("table argument is not a sqlAlchemy Table", None)
+
+    if filter_type not in FILTER_TYPES:
+        raise BadArgumentType(f"filter_type must be one of {', '.join(FILTER_TYPES)}, got {filter_type}", None)
+
+    k, val = item
+    try:
+        column = tbl.c[k]
+    except KeyError as e:
+        raise NoSuchColumn(f"{k} is not a column in the {tbl.name} table", e)
+
+    if filter_type == 'bw':
+        if isinstance(val, str) or not isinstance(val, typing.Sequence) or len(val) != 2:
+            raise BadArgumentType(f"{k}__bw expects a (low, high) tuple", None)
+        return column.between(*val)
+
+    if filter_type == 'not_in':
+        if isinstance(val, str) or not isinstance(val, typing.Iterable):
+            val = (val,)
+        return column.notin_(val)
+
+    return {
+        'lt': column.__lt__,
+        'le': column.__le__,
+        'gt': column.__gt__,
+        'ge': column.__ge__,
+        'like': column.like,
+        'not_like': column.notlike,
+    }[filter_type](val)
+
+
+def kwarg_filter_maker(tbl: sa.Table, k: str, val: typing.Any) -> sqlelements.ColumnElement:
+    """
+    Filter from a keyword argument of a table function. A column name alone works as in filter_maker and
+    a column name followed by a double underscore and a filter type works as in complex_filter_maker
+
+    >>> kwarg_filter_maker(tbl, 'amount__gt', 100)  # amount > 100
+    >>> kwarg_filter_maker(tbl, 'date__bw', ('2020-01-01', '2020-12-31'))  # date BETWEEN '2020-01-01' AND '2020-12-31'
+
+    :param tbl: a sqlalchemy Table object
+    :param k: the keyword
+    :param val: the value of the keyword
+    :return:
+    """
+    if k not in tbl.c and '__' in k:
+        column, filter_type = k.rsplit('__', 1)
+        if filter_type in FILTER_TYPES:
+            return complex_filter_maker(tbl, (column, val), filter_type)
+
+    return filter_maker(tbl, k, val)
+
+
+def large_in_lists(tbl: sa.Table, kwargs: typing.Dict[str, typing.Any],
+                   limit: int = IN_LIST_LIMIT) -> typing.Dict[str, typing.Tuple[typing.Any, ...]]:
+    """
+
+    :param tbl: a sqlalchemy Table object
+    :param kwargs: the keyword arguments of a table function
+    :param limit: the number of values above which a membership filter is large
+    :return: the membership filters with more than limit distinct values, without duplicates
+    """
+    large = {}
+    for k, val in kwargs.items():
+        if k not in tbl.c or isinstance(val, str) or not isinstance(val, typing.Iterable):
+            continue
+
+        values = tuple(dict.fromkeys(val))
+        if len(values) > limit:
+            large[k] = values
+
+    return large
+
+
+def chunked_in(column: sa.Column, values: typing.Sequence, size: int = IN_LIST_LIMIT) -> sqlelements.ColumnElement:
+    """
+
+    :param column: a column of a sqlalchemy Table
+    :param values: the values the column must be in
+    :param size: the maximum number of values in each IN list
+    :return: column IN (...) OR column IN (...) with at most size values in each list
+    """
+    return sa.or_(*(column.in_(chunk) for chunk in toolz.partition_all(size, values)))
+
+
+def create_temp_keys(connection: sa.engine.Connection, column: sa.Column, values: typing.Sequence) -> sa.Table:
+    """
+    Load values in a temporary table, visible to this connection only, with one column named key.
+    Use drop_temp_keys once done with it
+
+    :param connection: a connection, all queries using the table must use it
+    :param column: the column whose type the key column takes
+    :param values: the values to load
+    :return: the temporary table
+    """
+    name_prefix, prefixes, suffix = TEMP_TABLE_SYNTAX.get(connection.dialect.name, DEFAULT_TEMP_TABLE_SYNTAX)
+    temp = sa.Table(
+        f"{name_prefix}dsdbmanager_keys_{uuid.uuid4().hex[:12]}",
+        sa.MetaData(),
+        sa.Column('key', column.type),
+        prefixes=list(prefixes)
+    )
+
+    connection.execute(sa.DDL(f"{CreateTable(temp).compile(dialect=connection.dialect)}{suffix}"))
+    for group in toolz.partition_all(CHUNK_SIZE, values):
+        connection.execute(temp.insert(), [{'key': el} for el in group])
+
+    return temp
+
+
+def drop_temp_keys(connection: sa.engine.Connection, temp: sa.Table) -> None:
+    """
+
+    :param connection: the connection the temporary table was created with
+    :param temp: a table made by create_temp_keys
     :return:
     """
-    raise NotImplementedError("Yet to be implemented")
+    if connection.dialect.name == 'oracle':
+        # oracle does not drop a global temporary table that still holds rows for the session
+        connection.execute(sa.DDL(f"TRUNCATE TABLE {connection.dialect.identifier_preparer.format_table(temp)}"))
+    temp.drop(connection)
+
+
+@contextlib.contextmanager
+def membership_filters(connection: sa.engine.Connection, tbl: sa.Table,
+                       large: typing.Dict[str, typing.Sequence],
+                       in_strategy: str) -> typing.Iterator[typing.List[sqlelements.ColumnElement]]:
+    """
+    Filters for large membership filters that every dialect accepts in a single query
+
+    :param connection: the connection the query will run on
+    :param tbl: a sqlalchemy Table object
+    :param large: large membership filters as found by large_in_lists
+    :param in_strategy: 'temp_table' to load the values in temporary tables for the time of the context,
+                        anything else to split the values in several IN lists. Temporary tables are used either way
+                        on dialects of BIND_PARAMETER_LIMITS when the lists hold more values than the limit
+    :return: one filter per column
+    """
+    limit = BIND_PARAMETER_LIMITS.get(connection.dialect.name)
+    if in_strategy != 'temp_table' and (limit is None or sum(map(len, large.values())) <= limit):
+        yield [chunked_in(tbl.c[k], values) for k, values in large.items()]
+        return
+
+    temps = []
+    try:
+        for k, values in large.items():
+            temps.append((k, create_temp_keys(connection, tbl.c[k], values)))
+        yield [tbl.c[k].in_(sa.select([temp.c.key])) for k, temp in temps]
+    finally:
+        for _, temp in temps:
+            drop_temp_keys(connection, temp)
+
+
+def concurrent_connections(engine: sa.engine.base.Engine) -> bool:
+    """
+
+    :param engine: the sqlalchemy engine for the database
+    :return: False if connections of different threads do not see the same database, i.e. in memory sqlite
+    """
+    return not (engine.dialect.name == 'sqlite' and engine.url.database in (None, '', ':memory:'))
+
+
+def partition_filters(column: sa.Column, partitions: int, mode: str = 'range', low: typing.Any = None,
+                      high: typing.Any = None) -> typing.List[sqlelements.ColumnElement]:
+    """
+    Disjoint predicates that together select every row of a table, nulls go to the first partition
+
+    :param column: the column of a sqlalchemy Table the table is split on
+    :param partitions: number of partitions
+    :param mode: 'range' for equal width ranges between low and high, 'modulo' for an integer column modulo partitions
+    :param low: smallest value of the column, for ranges
+    :param high: largest value of the column, for ranges
+    :return: one predicate per partition
+    """
+    if mode == 'modulo':
+        if python_type(column.type) is not int:
+            raise BadArgumentType(f"modulo partitions need an integer column, {column.name} is {column.type}", None)
+        # the sign of a modulo follows the dividend in sql
+        filters = [sa.func.abs(column) % partitions == i for i in range(partitions)]
+    else:
+        try:
+            if isinstance(low, int) and isinstance(high, int):
+                bounds = [low + (high - low) * i // partitions for i in range(1, partitions)]
+            else:
+                bounds = [low + (high - low) * i / partitions for i in range(1, partitions)]
+        except TypeError as e:
+            raise BadArgumentType(f"range partitions need a numeric or datetime column, {column.name} is not", e)
+
+        # the first and last ranges are open so that values out of [low, high] are not lost
+        filters = [sa.true()] if not bounds else (
+            [column < bounds[0]] +
+            [sa.and_(column >= lower, column < upper) for lower, upper in zip(bounds, bounds[1:])] +
+            [column >= bounds[-1]]
+        )
+
+    filters[0] = sa.or_(filters[0], column.is_(None))
+    return filters
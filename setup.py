@@ -72,10 +72,10 @@ setup(
     #
     # Similar to `install_requires` above, these must be valid existing
     # projects.
-    # extras_require={  # Optional
-    #     'dev': ['check-manifest'],
-    #     'test': ['coverage'],
-    # },
+    extras_require={  # Optional
+        'cache': ['pyarrow'],
+        'stage': ['pyarrow'],
+    },
 
     entry_points={
         'console_scripts': [
@@ -0,0 +1,105 @@
+import asyncio
+import pathlib
+import unittest
+import tempfile
+import pandas as pd
+import sqlalchemy as sa
+from dsdbmanager.dbobject import DbMiddleware
+
+
+class TestAio(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        metadata = sa.MetaData()
+
+        cls.country_table = sa.Table(
+            'country',
+
+            metadata,
+
+            sa.Column(
+                'country',
+                sa.String(20),
+                primary_key=True
+            ),
+
+            sa.Column(
+                'continent',
+                sa.String(20)
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        # executor threads need a database every connection sees, not an in memory one
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine: sa.engine.Engine = sa.create_engine(f"sqlite:///{pathlib.Path(self.folder.name) / 'aio.db'}")
+        self.country_table.create(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def test_async_middleware(self):
+        """
+        1) reads, inserts and updates can be awaited and give the same results as the synchronous functions
+        2) concurrent reads share the result cache
+        3) writes drop the cached results
+        4) aggregate, parallel and cache_clear of a table can be awaited, iter_chunks is an async iterator
+        :return:
+        """
+        dbm = DbMiddleware(self.engine, connect_only=False, schema=None, aio_workers=2)
+        countries = pd.DataFrame({'country': ['Benin', 'France', 'Peru'], 'continent': ['Africa', 'Europe', 'Asia']})
+
+        async def scenario():
+            await dbm.aio.insert.country(countries)
+            first, second, africa = await asyncio.gather(
+                dbm.aio.country(), dbm.aio['country'](), dbm.aio.country(continent='Africa')
+            )
+            self.assertEqual(first.shape, (3, 2))
+            self.assertTrue(first.equals(second))
+            self.assertEqual(africa.loc[0, 'country'], 'Benin')
+
+            await dbm.aio.update.country(
+                pd.DataFrame({'country': ['Peru'], 'continent': ['America']}), keys=('country',), values=('continent',)
+            )
+            return await dbm.aio.country(country='Peru')
+
+        peru = asyncio.run(scenario())
+        self.assertEqual(peru.loc[0, 'continent'], 'America')
+        self.assertTrue(dbm.country(country='Peru').equals(peru))
+        self.assertGreaterEqual(dbm.cache_info().hits, 1)
+
+        async def table_methods():
+            total = await dbm.aio.country.aggregate(group_by='continent', metrics={'country': 'count'})
+            parts = await dbm.aio.country.parallel(partitions=1, partition_column='country')
+            chunks = [chunk async for chunk in dbm.aio.country.iter_chunks(chunksize=2)]
+            stopped_early = dbm.aio.country.iter_chunks(chunksize=1)
+            self.assertEqual(len(await stopped_early.__anext__()), 1)
+            await stopped_early.aclose()
+            await dbm.aio.country.cache_clear()
+            return total, parts, chunks
+
+        total, parts, chunks = asyncio.run(table_methods())
+        self.assertEqual(total['country_count'].sum(), 3)
+        self.assertEqual(parts.shape, (3, 2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+
+        metadata = asyncio.run(dbm.aio.metadata.country())
+        self.assertEqual((metadata['table_name'], metadata['row_count']), ('country', 3))
+
+        with self.assertRaises(AttributeError):
+            _ = dbm.aio.not_a_table
+
+        executor = dbm.aio._executor
+        with dbm:
+            pass
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+
+
+if __name__ == '__main__':
+    unittest.main()
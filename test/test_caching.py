@@ -0,0 +1,247 @@
+import time
+import pathlib
+import unittest
+import tempfile
+import functools
+import importlib.util
+import pandas as pd
+import sqlalchemy as sa
+from dsdbmanager.dbobject import util_function
+from dsdbmanager.caching import ReflectionCache, ResultCache, DiskCache, SchemaSnapshot, frame_nbytes
+
+has_pyarrow = importlib.util.find_spec('pyarrow') is not None
+
+
+class TestCaching(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        metadata = sa.MetaData()
+
+        cls.country_table = sa.Table(
+            'country',
+
+            metadata,
+
+            sa.Column(
+                'country',
+                sa.String(20),
+                primary_key=True
+            ),
+
+            sa.Column(
+                'continent',
+                sa.String(20)
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.engine: sa.engine.Engine = sa.create_engine("sqlite:///")
+        self.country_table.create(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_reflection_cache(self):
+        """
+        1) a table is reflected once and then served from the cache
+        2) invalidating a table forces a new reflection
+        3) entries older than the ttl are reflected again
+        :return:
+        """
+        cache = ReflectionCache(functools.partial(util_function, engine=self.engine, schema=None))
+
+        first = cache.get(self.country_table.name)
+        second = cache.get(self.country_table.name)
+        self.assertIsInstance(first, sa.Table)
+        self.assertIs(first, second)
+        self.assertEqual(cache.info()[:3], (1, 1, 1))
+
+        cache.invalidate(self.country_table.name)
+        self.assertIsNot(cache.get(self.country_table.name), first)
+        self.assertEqual(cache.info()[:3], (1, 2, 1))
+
+        cache.clear()
+        self.assertEqual(cache.info().currsize, 0)
+
+        expiring = ReflectionCache(functools.partial(util_function, engine=self.engine, schema=None), ttl=0.01)
+        first = expiring.get(self.country_table.name)
+        time.sleep(0.02)
+        self.assertIsNot(expiring.get(self.country_table.name), first)
+        self.assertEqual(expiring.info().misses, 2)
+
+    def test_result_cache(self):
+        """
+        1) results are kept within the memory budget, least recently used first out
+        2) results bigger than the budget are not kept
+        3) results are dropped per table or after the ttl
+        :return:
+        """
+        df = pd.DataFrame({'a': range(100)})
+        nbytes = frame_nbytes(df)
+        cache = ResultCache(max_bytes=2 * nbytes, ttl=None)
+
+        cache.put(('t1', 1), df)
+        cache.put(('t1', 2), df)
+        self.assertIs(cache.get(('t1', 1)), df)
+        cache.put(('t2', 1), df)
+
+        # ('t1', 2) was the least recently used
+        self.assertIsNone(cache.get(('t1', 2)))
+        self.assertIs(cache.get(('t2', 1)), df)
+        self.assertEqual(cache.info()[:5], (2, 1, 1, 2, 2 * nbytes))
+
+        cache.put(('t3', 1), pd.DataFrame({'a': range(1000)}))
+        self.assertIsNone(cache.get(('t3', 1)))
+        self.assertEqual(cache.info().entries, 2)
+
+        cache.invalidate('t1')
+        self.assertIsNone(cache.get(('t1', 1)))
+        self.assertIs(cache.get(('t2', 1)), df)
+        self.assertEqual(cache.info().currbytes, nbytes)
+
+        cache.clear()
+        self.assertEqual(cache.info()[3:5], (0, 0))
+
+        expiring = ResultCache(ttl=0.01)
+        expiring.put(('t1', 1), df)
+        time.sleep(0.02)
+        self.assertIsNone(expiring.get(('t1', 1)))
+        self.assertEqual(expiring.info().currbytes, 0)
+
+    @unittest.skipUnless(has_pyarrow, "pyarrow is needed to cache on disk")
+    def test_disk_cache(self):
+        """
+        1) results are read back with the same dtypes, for the same key and signal only
+        2) entries can be listed and cleared per table, other namespaces are left alone
+        3) least recently used entries are removed past the size budget
+        4) results arrow cannot store are not written, with a warning
+        :return:
+        """
+        df = pd.DataFrame({
+            'a': pd.array([1, None], dtype='Int64'),
+            'b': pd.array(['x', None], dtype='string'),
+            'c': pd.to_datetime(['2020-01-01', None])
+        })
+        key = ('t1', None, ('a', 'b', 'c'), None, frozenset({('b', 'x'), ('a', (1, 2))}))
+        same_key = ('t1', None, ('a', 'b', 'c'), None, frozenset({('a', (1, 2)), ('b', 'x')}))
+
+        with tempfile.TemporaryDirectory() as folder:
+            disk = DiskCache('sqlite', 'test', None, folder=pathlib.Path(folder))
+            other = DiskCache('sqlite', 'other', None, folder=pathlib.Path(folder))
+            self.assertIsNone(disk.get(key))
+
+            disk.put(key, df, signal=(1,))
+            other.put(key, df)
+            self.assertTrue(disk.get(same_key).equals(df))
+            self.assertTrue(disk.get(key, signal=(1,)).equals(df))
+            self.assertIsNone(disk.get(key, signal=(2,)))
+
+            disk.put(('t2',), df)
+            self.assertEqual(len(disk.entries()), 2)
+            self.assertEqual(len(DiskCache(folder=pathlib.Path(folder)).entries()), 3)
+            self.assertEqual(disk.entries(table='t2')[0]['table'], 't2')
+
+            self.assertEqual(disk.clear(table='t1'), 1)
+            self.assertIsNone(disk.get(key))
+            self.assertIsNotNone(other.get(key))
+            self.assertEqual(DiskCache(folder=pathlib.Path(folder)).clear(), 2)
+
+            expiring = DiskCache('sqlite', 'test', None, folder=pathlib.Path(folder), ttl=0.01)
+            expiring.put(key, df)
+            time.sleep(0.02)
+            self.assertIsNone(expiring.get(key))
+            self.assertEqual(expiring.entries(), [])
+
+            disk.put(('t1',), df)
+            one_entry = disk.entries()[0]['bytes']
+            small = DiskCache('sqlite', 'test', None, folder=pathlib.Path(folder), max_bytes=2 * one_entry)
+            small.put(('t2',), df)
+            time.sleep(0.01)
+            self.assertIsNotNone(small.get(('t1',)))
+            small.put(('t3',), df)
+            self.assertEqual(sorted(entry['table'] for entry in small.entries()), ['t1', 't3'])
+
+            mixed = pd.DataFrame({'a': ['a', 1]})
+            with self.assertWarns(UserWarning):
+                disk.put(('t4',), mixed)
+            self.assertIsNone(disk.get(('t4',)))
+            self.assertEqual(list(pathlib.Path(folder).glob('*.tmp')), [])
+            cache = ResultCache(disk_cache=disk)
+            with self.assertWarns(UserWarning):
+                cache.put(('t4',), mixed)
+            self.assertTrue(cache.get(('t4',)).equals(mixed))
+
+    @unittest.skipUnless(has_pyarrow, "pyarrow is needed to cache on disk")
+    def test_result_cache_on_disk(self):
+        """
+        a new result cache, like a new process, finds results on disk
+        :return:
+        """
+        df = pd.DataFrame({'a': range(10)})
+        with tempfile.TemporaryDirectory() as folder:
+            disk = DiskCache('sqlite', 'test', None, folder=pathlib.Path(folder))
+            ResultCache(disk_cache=disk).put(('t1', 1), df)
+
+            cache = ResultCache(disk_cache=disk)
+            self.assertTrue(cache.get(('t1', 1)).equals(df))
+            self.assertTrue(cache.get(('t1', 1)).equals(df))
+            self.assertEqual(cache.info()[:2], (1, 1))
+            self.assertEqual(cache.info().disk_hits, 1)
+
+            cache.invalidate('t1')
+            self.assertEqual(disk.entries(), [])
+
+    def test_schema_snapshot(self):
+        """
+        1) names and reflected tables are read back, per flavor, database and schema
+        2) a reflection cache with a snapshot reflects a table once across instances
+        3) entries older than the ttl are not used
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            snapshot = SchemaSnapshot('sqlite', 'test', None, folder=pathlib.Path(folder))
+            self.assertIsNone(snapshot.names())
+            self.assertIsNone(snapshot.table('country'))
+
+            snapshot.save_names(['country'], ['a_view'])
+            self.assertEqual(snapshot.names(), (['country'], ['a_view']))
+            self.assertIsNone(SchemaSnapshot('sqlite', 'other', None, folder=pathlib.Path(folder)).names())
+
+            loads = []
+
+            def loader(name):
+                loads.append(name)
+                return util_function(name, self.engine, None)
+
+            first = ReflectionCache(loader, snapshot=snapshot, bind=self.engine)
+            self.assertEqual(first.get('country').c.keys(), ['country', 'continent'])
+
+            second = ReflectionCache(loader, snapshot=snapshot, bind=self.engine)
+            tbl = second.get('country')
+            self.assertEqual(tbl.c.keys(), ['country', 'continent'])
+            self.assertIs(tbl.bind, self.engine)
+            self.assertEqual(loads, ['country'])
+
+            second.invalidate('country')
+            self.assertIsNone(snapshot.table('country'))
+            second.get('country')
+            self.assertEqual(loads, ['country', 'country'])
+
+            second.clear()
+            self.assertIsNone(snapshot.table('country'))
+            self.assertIsNotNone(snapshot.names())
+            snapshot.clear()
+            self.assertIsNone(snapshot.names())
+
+            expiring = SchemaSnapshot('sqlite', 'test', None, folder=pathlib.Path(folder), ttl=0.01)
+            expiring.save_names(['country'], [])
+            time.sleep(0.02)
+            self.assertIsNone(expiring.names())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
+import os
+import sys
 import json
 import pathlib
+import subprocess
 import unittest
 import tempfile
 import contextlib
-from dsdbmanager.configuring import ConfigFilesManager
+from dsdbmanager.configuring import ConfigFilesManager, config_store
 
 
 class TestConfigurer(unittest.TestCase):
@@ -212,5 +215,94 @@ class TestConfigurer(unittest.TestCase):
             self.assertEqual(remaining, expected)
 
 
+    def test_config_store(self):
+        """
+        1) hosts, credentials and the cipher of the key are loaded once and served from memory after
+        2) files changed by another process or written by the manager are loaded again
+        3) what is served can be modified without changing what is kept
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            folder = pathlib.Path(folder)
+            c = ConfigFilesManager(folder / '.hosts.json', folder / '.config.json', folder / '.configkey')
+            c.bootstrap()
+            c.key_location.write_bytes(self.key)
+            with c.host_location.open('w') as f:
+                json.dump(self.host, f)
+
+            config_store.clear()
+            loads = config_store.info().loads
+            token = c.encrypt_decrypt(self.pwd, True)
+            for _ in range(5):
+                self.assertEqual(c.encrypt_decrypt(token, False), self.pwd)
+                other = ConfigFilesManager(c.host_location, c.credential_location, c.key_location)
+                self.assertEqual(other.get_hosts(), self.host)
+                self.assertEqual(c.read_credentials('oracle', 'mydatabase'), (None, None))
+            self.assertEqual(config_store.info().loads - loads, 3)
+
+            c.get_hosts()['oracle'].clear()
+            self.assertEqual(c.get_hosts(), self.host)
+
+            # another process adds a database, the file is longer
+            with c.host_location.open('w') as f:
+                json.dump({'mysql': {'db': {'name': 'db'}}, **self.host}, f)
+            self.assertIn('mysql', c.get_hosts())
+
+            c.write_credentials('oracle', 'mydatabase', token, token)
+            self.assertEqual(c.read_credentials('oracle', 'mydatabase'), (token, token))
+            self.assertEqual(config_store.info().loads - loads, 5)
+
+    def test_bootstrap(self):
+        """
+        1) missing folder, host and credential files and key are created
+        2) existing files are left as they are
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            folder = pathlib.Path(folder) / 'config'
+            c = ConfigFilesManager(folder / '.hosts.json', folder / '.config.json', folder / 'keys' / '.configkey')
+            c.bootstrap()
+
+            self.assertEqual(c.get_hosts(), {})
+            self.assertEqual(c.read_credentials('oracle', 'mydatabase'), (None, None))
+            key = c.key_location.read_bytes()
+            self.assertEqual(c.encrypt_decrypt(c.encrypt_decrypt(self.pwd, True), False), self.pwd)
+
+            with c.host_location.open('w') as f:
+                json.dump(self.host, f)
+            c.bootstrap()
+            self.assertEqual(c.get_hosts(), self.host)
+            self.assertEqual(c.key_location.read_bytes(), key)
+
+    def test_lazy_import(self):
+        """
+        importing dsdbmanager or its command line neither writes configuration files nor imports heavy packages
+        :return:
+        """
+        code = (
+            "import sys; import dsdbmanager; import dsdbmanager.cli; "
+            "print(','.join(m for m in ('pandas', 'numpy', 'sqlalchemy', 'cryptography') if m in sys.modules))"
+        )
+        with tempfile.TemporaryDirectory() as folder:
+            config = pathlib.Path(folder) / 'config'
+            environment = dict(os.environ, DSDBMANAGER_CONFIG=str(config))
+            environment.pop('DSDBMANAGER_KEY', None)
+            loaded = subprocess.run(
+                [sys.executable, '-c', code], env=environment, check=True, capture_output=True, text=True
+            ).stdout.strip()
+
+            self.assertEqual(loaded, '')
+            self.assertFalse(config.exists())
+
+            # the configuration is made the first time it is used
+            code = "import dsdbmanager; print(dsdbmanager.__configurer__.get_hosts())"
+            hosts = subprocess.run(
+                [sys.executable, '-c', code], env=environment, check=True, capture_output=True, text=True
+            ).stdout.strip()
+
+            self.assertEqual(hosts, '{}')
+            self.assertTrue((config / '.configkey').exists())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 import json
 import unittest
+import unittest.mock
 import pathlib
 import tempfile
 import contextlib
@@ -13,10 +14,14 @@ from dsdbmanager.dbobject import (
     table_middleware,
     DbMiddleware,
     DsDbManager,
+    db_middleware,
     TableMeta,
     TableInsert,
-    TableUpdate
+    TableUpdate,
+    schema_change_error
 )
+from dsdbmanager.caching import SchemaSnapshot
+from dsdbmanager.engines import engine_registry
 from dsdbmanager.exceptions_ import (
     BadArgumentType,
     NoSuchColumn,
@@ -25,6 +30,8 @@ from dsdbmanager.exceptions_ import (
     MissingFlavor
 )
 from dsdbmanager.configuring import ConfigFilesManager
+from dsdbmanager.utils import COLUMN_QUERIES, CHANGE_SIGNAL_QUERIES, ROW_COUNT_QUERIES
+from dsdbmanager.constants import BIND_PARAMETER_LIMITS
 
 
 class TestDbObject(unittest.TestCase):
@@ -292,9 +299,16 @@ class TestDbObject(unittest.TestCase):
         insert.close()
 
         self.assertEqual(read_from_currency_table().shape, (len(currencies), 3))
+        self.assertTrue((read_from_currency_table().dtypes == 'string').all())
         self.assertEqual(read_from_currency_table(rows=1).shape, (1, 3))
+        self.assertEqual(read_from_currency_table(rows=0).shape, (0, 3))
+        self.assertEqual(read_from_currency_table(rows=5, offset=1).shape, (1, 3))
+        self.assertEqual(read_from_currency_table(offset=1).loc[0, 'denomination'], 'US Dollar')
         self.assertEqual(read_from_currency_table(rows=1, columns=('abbreviation', 'countries')).shape, (1, 2))
         self.assertEqual(read_from_currency_table(abbreviation='USD').shape, (1, 3))
+        self.assertEqual(read_from_currency_table(abbreviation__not_in=('USD',)).shape, (1, 3))
+        self.assertEqual(read_from_currency_table(denomination__like='%Dollar', abbreviation__ge='A').shape, (1, 3))
+        self.assertEqual(read_from_currency_table(abbreviation__bw=('A', 'Z')).shape, (2, 3))
         self.assertTrue(read_from_currency_table(abbreviation='FCFA').empty)
 
         with self.assertWarnsRegex(UserWarning, r"Columns \[made_up, not there\] are not in table currency"):
@@ -305,6 +319,200 @@ class TestDbObject(unittest.TestCase):
         with self.assertRaises(NoSuchColumn):
             _ = read_from_currency_table(columns=('madeup', 'made up'))
 
+    def test_table_middleware_iter_chunks(self):
+        """
+        chunks put back together are the same as a full read
+        :return:
+        """
+        read_from_country_table = table_middleware(
+            engine=self.engine,
+            table=self.country_table.name
+        )
+        countries = [{'country': f'country {i}', 'continent': 'Africa' if i % 2 else 'Europe'} for i in range(25)]
+        insert = self.engine.execute(self.country_table.insert(), countries)
+        insert.close()
+
+        chunks = list(read_from_country_table.iter_chunks(chunksize=10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertTrue(pd.concat(chunks, ignore_index=True).equals(read_from_country_table()))
+
+        chunks = list(read_from_country_table.iter_chunks(chunksize=10, columns=('country',), continent='Africa'))
+        self.assertEqual([chunk.shape for chunk in chunks], [(10, 1), (2, 1)])
+
+        self.assertEqual(list(read_from_country_table.iter_chunks(continent='Asia')), [])
+
+        with self.assertRaises(BadArgumentType):
+            _ = list(read_from_country_table.iter_chunks(chunksize=0))
+
+    def test_table_middleware_large_in_lists(self):
+        """
+        lists longer than IN_LIST_LIMIT give the same rows with both strategies
+        :return:
+        """
+        countries = [{'country': f'country {i}', 'continent': 'Africa' if i % 2 else 'Europe'} for i in range(2500)]
+        insert = self.engine.execute(self.country_table.insert(), countries)
+        insert.close()
+
+        wanted = tuple(f'country {i}' for i in range(0, 5000, 2))
+        for in_strategy in ('chunks', 'temp_table'):
+            with self.subTest(in_strategy=in_strategy):
+                read_from_country_table = table_middleware(
+                    engine=self.engine,
+                    table=self.country_table.name,
+                    in_strategy=in_strategy
+                )
+                df = read_from_country_table(country=wanted)
+                self.assertEqual(df.shape, (1250, 2))
+                self.assertTrue((df['continent'] == 'Europe').all())
+                self.assertEqual(read_from_country_table(rows=10, country=wanted).shape, (10, 2))
+                self.assertTrue(read_from_country_table(country=wanted, continent='Africa').empty)
+
+                chunks = list(read_from_country_table.iter_chunks(chunksize=1000, country=wanted))
+                self.assertEqual([len(chunk) for chunk in chunks], [1000, 250])
+
+        self.assertEqual(
+            table_middleware(self.engine, self.country_table.name, in_strategy='temp_table')(
+                offset=1000, country=wanted
+            ).shape,
+            (250, 2)
+        )
+        with self.assertRaises(BadArgumentType):
+            _ = table_middleware(self.engine, self.country_table.name)(offset=1, country=wanted)
+
+        with self.assertRaises(BadArgumentType):
+            _ = table_middleware(self.engine, self.country_table.name, in_strategy='join')
+
+    def test_table_middleware_large_in_lists_parameters(self):
+        """
+        1) on a dialect limiting parameters, no query binds more than its limit whatever the number of large lists
+        2) other dialects get an OR of IN lists, no temporary table is made unless asked for
+        :return:
+        """
+        countries = [{'country': f'country {i}', 'continent': 'Africa' if i % 2 else 'Europe'} for i in range(2500)]
+        insert = self.engine.execute(self.country_table.insert(), countries)
+        insert.close()
+
+        parameters, statements = [], []
+
+        def record(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+            if not executemany:
+                parameters.append(len(params))
+
+        read_from_country_table = table_middleware(engine=self.engine, table=self.country_table.name)
+        wanted = tuple(f'country {i}' for i in range(0, 5000, 2))
+        continents = ('Europe',) + tuple(f'continent {i}' for i in range(1500))
+
+        def read_all():
+            self.assertEqual(read_from_country_table(country=wanted).shape, (1250, 2))
+            self.assertEqual(read_from_country_table(country=wanted, continent=continents).shape, (1250, 2))
+            self.assertEqual(sum(map(len, read_from_country_table.iter_chunks(country=wanted))), 1250)
+            self.assertEqual(
+                read_from_country_table.aggregate(metrics={'country': 'count'}, country=wanted).loc[0, 'country_count'],
+                1250
+            )
+
+        sa.event.listen(self.engine, 'before_cursor_execute', record)
+        with unittest.mock.patch.dict(BIND_PARAMETER_LIMITS, {'sqlite': 2000}):
+            read_all()
+        self.assertLessEqual(max(parameters), 2000)
+        self.assertTrue(any('CREATE' in statement for statement in statements))
+
+        read_from_country_table.cache_clear()
+        statements.clear()
+        read_all()
+        sa.event.remove(self.engine, 'before_cursor_execute', record)
+        self.assertFalse(any('CREATE' in statement for statement in statements))
+
+    def test_table_middleware_aggregate(self):
+        """
+        groups are computed in the database, with typed metrics
+        :return:
+        """
+        read_from_country_table = table_middleware(
+            engine=self.engine,
+            table=self.country_table.name
+        )
+        countries = [{'country': f'country {i}', 'continent': 'Africa' if i % 3 else 'Europe'} for i in range(30)]
+        insert = self.engine.execute(self.country_table.insert(), countries)
+        insert.close()
+
+        df = read_from_country_table.aggregate(
+            group_by='continent', metrics={'country': ('count', 'min', 'count_distinct')}
+        )
+        expected = pd.DataFrame(countries).groupby('continent', as_index=False)['country'].agg(
+            ['count', 'min', 'nunique']
+        )
+        self.assertEqual(list(df.columns), ['continent', 'country_count', 'country_min', 'country_count_distinct'])
+        self.assertEqual(df['country_count'].dtype, 'int64')
+        self.assertEqual(df['continent'].tolist(), ['Africa', 'Europe'])
+        self.assertEqual(df['country_count'].tolist(), expected['count'].tolist())
+        self.assertEqual(df['country_min'].tolist(), expected['min'].tolist())
+        self.assertEqual(df['country_count_distinct'].tolist(), expected['nunique'].tolist())
+
+        total = read_from_country_table.aggregate(metrics={'country': 'count'}, country__like='country 1%')
+        self.assertEqual(total.shape, (1, 1))
+        self.assertEqual(total.loc[0, 'country_count'], 11)
+
+        self.assertTrue(read_from_country_table.aggregate(group_by=('continent',), continent='Asia').empty)
+        self.assertTrue(read_from_country_table.aggregate(group_by=('continent',), continent='Asia').empty)
+        self.assertEqual(read_from_country_table.cache_info().hits, 1)
+
+        with self.assertRaises(BadArgumentType):
+            _ = read_from_country_table.aggregate()
+        with self.assertRaises(BadArgumentType):
+            _ = read_from_country_table.aggregate(metrics={'country': 'median'})
+        with self.assertRaises(NoSuchColumn):
+            _ = read_from_country_table.aggregate(group_by=('made up',))
+
+    def test_table_middleware_parallel(self):
+        """
+        partitions read concurrently give the same rows as a serial read
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            engine = sa.create_engine(f"sqlite:///{pathlib.Path(folder) / 'parallel.db'}")
+            metadata = sa.MetaData()
+            numbers = sa.Table(
+                'numbers', metadata,
+                sa.Column('id', sa.Integer, primary_key=True),
+                sa.Column('parity', sa.String(4)),
+                sa.Column('value', sa.Float)
+            )
+            metadata.create_all(engine)
+            insert = engine.execute(
+                numbers.insert(),
+                [{'id': i, 'parity': 'odd' if i % 2 else 'even', 'value': i / 3} for i in range(-50, 1000)]
+            )
+            insert.close()
+
+            read_numbers = table_middleware(engine=engine, table='numbers')
+            serial = read_numbers().sort_values('id', ignore_index=True)
+
+            for kwargs in ({}, {'partitions': 1}, {'partitions': 7, 'workers': 3}, {'mode': 'modulo'},
+                           {'partitions': 5, 'partition_column': 'value'}):
+                with self.subTest(**kwargs):
+                    df = read_numbers.parallel(**kwargs)
+                    self.assertTrue(df.sort_values('id', ignore_index=True).equals(serial))
+
+            # partitions come back in order
+            self.assertTrue(read_numbers.parallel(partitions=4)['id'].is_monotonic_increasing)
+
+            odd = read_numbers.parallel(columns=('id',), parity='odd', id__ge=0)
+            self.assertEqual(sorted(odd['id']), list(range(1, 1000, 2)))
+            self.assertEqual(read_numbers.parallel(id__gt=1000).shape, (0, 3))
+
+            with self.assertRaises(BadArgumentType):
+                _ = read_numbers.parallel(partition_column='parity')
+            with self.assertRaises(BadArgumentType):
+                _ = read_numbers.parallel(partition_column='value', mode='modulo')
+            with self.assertRaises(BadArgumentType):
+                _ = read_numbers.parallel(partitions=0)
+            with self.assertRaises(NoSuchColumn):
+                _ = read_numbers.parallel(partition_column='made up')
+
+            engine.dispose()
+
     def test_dbmiddleware(self):
         """
 
@@ -327,6 +535,413 @@ class TestDbObject(unittest.TestCase):
             self.assertIsInstance(dbm._insert, TableInsert)
             self.assertIsInstance(dbm._update, TableUpdate)
 
+    def test_table_meta_all(self):
+        """
+        columns of every table in one dataframe, from the catalog or the inspector. Row counts are estimated
+        by a single catalog query, never counted unless asked for
+        :return:
+        """
+        self.engine.execute(self.country_table.insert(), [{'country': 'Benin', 'continent': 'Africa'}]).close()
+        meta = TableMeta(self.engine, None, (self.currency_table.name, self.country_table.name))
+
+        df = meta.all()
+        self.assertEqual(
+            list(df.columns),
+            ['table_name', 'column_name', 'column_type', 'nullable', 'primary_key', 'position', 'row_count']
+        )
+        self.assertEqual(df.shape[0], 5)
+        country = df[df['table_name'] == 'country'].reset_index(drop=True)
+        self.assertEqual(country['column_name'].tolist(), ['country', 'continent'])
+        self.assertEqual(country['primary_key'].tolist(), [True, False])
+        self.assertEqual(country['position'].tolist(), [1, 2])
+        # sqlite keeps no statistics, estimates are missing rather than counted
+        self.assertTrue(country['row_count'].isna().all())
+        exact = meta.all(include_counts='exact')
+        self.assertEqual(exact[exact['table_name'] == 'country']['row_count'].tolist(), [1, 1])
+
+        estimates = "SELECT name, 42 FROM sqlite_master WHERE :schema IS NULL"
+        with unittest.mock.patch.dict(ROW_COUNT_QUERIES, {'sqlite': estimates}):
+            self.assertEqual(meta.all()['row_count'].unique().tolist(), [42])
+
+        # sqlite has no catalog query, stand in for one
+        catalog = (
+            "SELECT m.name, p.name, p.type, CASE WHEN p.\"notnull\" THEN 'N' ELSE 'Y' END, p.pk > 0, p.cid + 1 "
+            "FROM sqlite_master m JOIN pragma_table_info(m.name) p "
+            "WHERE :schema IS NULL AND m.type = 'table' ORDER BY m.name, p.cid"
+        )
+        with unittest.mock.patch.dict(COLUMN_QUERIES, {'sqlite': catalog}):
+            from_catalog = meta.all(include_counts='exact')
+        self.assertTrue(from_catalog.drop(columns='column_type').equals(exact.drop(columns='column_type')))
+
+        skipped = meta.all(tables=('country', 'made_up'), include_counts='skip')
+        self.assertEqual(skipped.shape, (2, 6))
+
+        with self.assertRaises(BadArgumentType):
+            _ = meta.all(include_counts='guess')
+
+    def test_dbmiddleware_lazy(self):
+        """
+        table functions are only made when first used, dir still lists them
+        :return:
+        """
+        self.engine.execute(self.country_table.insert(), [{'country': 'Benin', 'continent': 'Africa'}]).close()
+
+        with DbMiddleware(self.engine, connect_only=False, schema=None, lazy=True) as dbm:
+            for functions in (dbm, dbm._metadata, dbm._insert, dbm._update):
+                with self.subTest(functions=type(functions).__name__):
+                    self.assertNotIn(self.country_table.name, functions.__dict__)
+                    self.assertIn(self.country_table.name, dir(functions))
+                    self.assertIn(self.currency_table.name, dir(functions))
+
+            self.assertEqual(dbm.country().shape, (1, 2))
+            self.assertIs(dbm['country'], dbm.country)
+            self.assertIn(self.country_table.name, dbm.__dict__)
+            self.assertNotIn(self.currency_table.name, dbm.__dict__)
+            self.assertEqual(dbm._metadata['currency']()['table_name'], 'currency')
+            self.assertEqual(dbm.fetch_many({'currency': None})['currency'].shape, (0, 3))
+
+            with self.assertRaises(AttributeError):
+                _ = dbm.made_up
+            with self.assertRaises(KeyError):
+                _ = dbm['made_up']
+            with self.assertRaises(AttributeError):
+                _ = dbm._insert.made_up
+
+        self.assertFalse(hasattr(dbm, 'country'))
+        self.assertFalse(hasattr(dbm, 'currency'))
+
+    def test_schema_change_error(self):
+        """
+        missing columns and tables are told apart from other errors with errors shaped like those of each driver
+        :return:
+        """
+
+        class OracleError(object):
+            # cx_Oracle gives an error object as argument of its exceptions
+            def __init__(self, code: int, message: str):
+                self.code, self.message = code, message
+
+            def __str__(self):
+                return self.message
+
+        class TeradataError(Exception):
+            def __init__(self, code: int, message: str):
+                super().__init__(message)
+                self.code = code
+
+        def error(kind, *args):
+            return kind("SELECT", None, Exception(*args))
+
+        def oracle(code, message):
+            return error(exc.DatabaseError, OracleError(code, message))
+
+        cases = [
+            ('oracle', oracle(904, 'ORA-00904: "B": invalid identifier'), True),
+            ('oracle', oracle(942, 'ORA-00942: table or view does not exist'), True),
+            ('oracle', oracle(3113, 'ORA-03113: end-of-file on communication channel'), False),
+            ('mysql', error(exc.OperationalError, 1054, "Unknown column 'b' in 'field list'"), True),
+            ('mysql', error(exc.ProgrammingError, 1146, "Table 'db.t' doesn't exist"), True),
+            ('mysql', error(exc.OperationalError, 2013, "Lost connection to MySQL server during query"), False),
+            ('mssql', error(exc.ProgrammingError, 207, b"Invalid column name 'b'."), True),
+            ('mssql', error(exc.ProgrammingError, 156, b"Incorrect syntax near the keyword 'FROM'."), False),
+            ('teradata', exc.DatabaseError("SELECT", None, TeradataError(5628, "Column b not found in t.")), True),
+            ('teradata', error(exc.DatabaseError, "[Session 1] [Error 3807] Object 't' does not exist."), True),
+            ('teradata', error(exc.DatabaseError, "[Session 1] [Error 2631] Transaction ABORTED."), False),
+            ('sqlite', error(exc.OperationalError, "no such column: b"), True),
+            ('sqlite', error(exc.OperationalError, "database is locked"), False),
+            ('postgresql', error(exc.ProgrammingError, 'column "b" does not exist'), True),
+            ('postgresql', error(exc.OperationalError, "server closed the connection"), False),
+            ('oracle', NoSuchColumn("b not in t", None), True),
+            ('oracle', ValueError("b"), False),
+        ]
+        for dialect, e, expected in cases:
+            with self.subTest(dialect=dialect, error=str(e)):
+                self.assertIs(schema_change_error(dialect, e), expected)
+
+    def test_dbmiddleware_snapshot(self):
+        """
+        1) a new middleware starts from the snapshot without listing or reflecting tables
+        2) a read on a table that changed since is retried after reflecting it again, other errors are not retried
+        3) refreshing the schema finds new tables
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            engine = sa.create_engine(f"sqlite:///{pathlib.Path(folder) / 'snapshot.db'}")
+            self.country_table.create(engine)
+            engine.execute(self.country_table.insert(), [{'country': 'Benin', 'continent': 'Africa'}]).close()
+            snapshot = SchemaSnapshot('sqlite', 'snapshot', None, folder=pathlib.Path(folder) / 'snapshots')
+
+            first = DbMiddleware(engine, connect_only=False, schema=None, snapshot=snapshot)
+            self.assertEqual(first.country().shape, (1, 2))
+
+            with unittest.mock.patch('dsdbmanager.dbobject.list_tables', side_effect=AssertionError):
+                second = DbMiddleware(engine, connect_only=False, schema=None, snapshot=snapshot)
+                self.assertEqual(second.country().shape, (1, 2))
+                self.assertEqual(second.reflection_info().misses, 1)
+
+            engine.execute("ALTER TABLE country ADD COLUMN population INTEGER").close()
+            df = second.country(columns=('country', 'population'))
+            self.assertEqual(list(df.columns), ['country', 'population'])
+
+            misses = second.reflection_info().misses
+            with self.assertRaises(NoSuchColumn):
+                _ = second.country(columns=('made_up',))
+            self.assertEqual(second.reflection_info().misses, misses + 1)
+
+            engine.execute("ALTER TABLE country DROP COLUMN population").close()
+            self.assertEqual(second.country(continent='Africa').shape, (1, 2))
+            self.assertEqual(second.reflection_info().misses, misses + 2)
+
+            misses = second.reflection_info().misses
+            broken = exc.OperationalError("SELECT", None, Exception("connection lost"))
+            with unittest.mock.patch('dsdbmanager.dbobject.fetch_all', side_effect=broken):
+                with self.assertRaises(exc.OperationalError):
+                    _ = second.country(continent='Asia')
+            self.assertEqual(second.reflection_info().misses, misses)
+
+            self.currency_table.create(engine)
+            self.assertFalse(hasattr(second, 'currency'))
+            second.refresh_schema(background=True).join()
+            self.assertEqual(second.currency().shape, (0, 3))
+            self.assertEqual(snapshot.names()[0], ['country', 'currency'])
+
+            engine.dispose()
+
+    def test_dbmiddleware_result_cache(self):
+        """
+        results are shared by all tables and callers get their own copy
+        :return:
+        """
+        self.engine.execute(self.country_table.insert(), [{'country': 'Benin', 'continent': 'Africa'}]).close()
+
+        with DbMiddleware(self.engine, connect_only=False, schema=None) as dbm:
+            df = dbm.country()
+            df.loc[0, 'continent'] = 'changed'
+            self.assertEqual(dbm.country().loc[0, 'continent'], 'Africa')
+            _ = dbm.currency()
+            _ = dbm.country(country=['Benin'])  # lists cannot be cached
+
+            info = dbm.cache_info()
+            self.assertEqual((info.hits, info.misses, info.entries), (1, 2, 2))
+            self.assertEqual(dbm.country.cache_info(), dbm.currency.cache_info())
+
+            dbm.country.cache_clear()
+            self.assertEqual(dbm.cache_info().entries, 1)
+
+            dbm.refresh()
+            self.assertEqual(dbm.cache_info().entries, 0)
+
+    def test_dbmiddleware_fetch_many(self):
+        """
+        tables are read concurrently, a failure is reported without stopping the other tables
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            engine = sa.create_engine(f"sqlite:///{pathlib.Path(folder) / 'fetch_many.db'}")
+            self.currency_table.create(engine)
+            self.country_table.create(engine)
+            engine.execute(
+                self.country_table.insert(),
+                [{'country': 'Benin', 'continent': 'Africa'}, {'country': 'France', 'continent': 'Europe'}]
+            ).close()
+
+            with DbMiddleware(engine, connect_only=False, schema=None) as dbm:
+                with self.assertWarnsRegex(UserWarning, r"Could not read 2 table\(s\)"):
+                    dfs = dbm.fetch_many(
+                        {
+                            'country': dict(continent='Africa'),
+                            'made_up': None,
+                            'currency': dict(columns=('not there',))
+                        },
+                        max_workers=2
+                    )
+
+                self.assertEqual(list(dfs), ['country', 'made_up', 'currency'])
+                self.assertTrue(dfs['country'].equals(dbm.country(continent='Africa')))
+                self.assertIsInstance(dfs['made_up'], BadArgumentType)
+                self.assertIsInstance(dfs['currency'], NoSuchColumn)
+                self.assertEqual(dbm.cache_info().hits, 1)
+
+                dfs = dbm.fetch_many({'country': None, 'currency': None})
+                self.assertEqual((dfs['country'].shape, dfs['currency'].shape), ((2, 2), (0, 3)))
+
+                with self.assertRaises(BadArgumentType):
+                    _ = dbm.fetch_many({'country': None}, max_workers=0)
+
+    def test_dbmiddleware_read_mode(self):
+        """
+        in view mode cache hits share the cached data
+        :return:
+        """
+        self.engine.execute(self.country_table.insert(), [{'country': 'Benin', 'continent': 'Africa'}]).close()
+
+        with self.assertRaises(BadArgumentType):
+            _ = table_middleware(self.engine, self.country_table.name, read_mode='madeup')
+
+        read_copies = table_middleware(self.engine, self.country_table.name)
+        self.assertIsNot(read_copies()._mgr.blocks[0].values, read_copies()._mgr.blocks[0].values)
+
+        read_views = table_middleware(self.engine, self.country_table.name, read_mode='view')
+        first, second = read_views(), read_views()
+        self.assertIs(first._mgr.blocks[0].values, second._mgr.blocks[0].values)
+
+        with self.assertRaises(ValueError):
+            first.loc[0, 'continent'] = 'changed'
+        self.assertEqual(read_views().loc[0, 'continent'], 'Africa')
+
+    def test_dbmiddleware_cache_invalidation(self):
+        """
+        1) inserts and updates drop the cached results of their table only
+        2) with revalidate, changes made outside of the middleware are seen
+        :return:
+        """
+        # exiting the context would dispose of the in memory database
+        dbm = DbMiddleware(self.engine, connect_only=False, schema=None)
+        self.assertTrue(dbm.country().empty)
+        _ = dbm.currency()
+
+        dbm._insert.country(pd.DataFrame({'country': ['Benin'], 'continent': ['Africa']}))
+        self.assertEqual(dbm.cache_info().entries, 1)
+        self.assertEqual(dbm.country().loc[0, 'continent'], 'Africa')
+
+        dbm._update.country(
+            pd.DataFrame({'country': ['Benin'], 'continent': ['West Africa']}), ('country',), ('continent',)
+        )
+        self.assertEqual(dbm.country().loc[0, 'continent'], 'West Africa')
+
+        # a change made directly on the engine is not seen without revalidation
+        self.engine.execute(self.country_table.insert(), [{'country': 'Japan', 'continent': 'Asia'}]).close()
+        self.assertEqual(len(dbm.country()), 1)
+
+        # a dialect with a change signal serves cached results until the signal changes
+        signal = "SELECT COUNT(*), :schema FROM country WHERE :table = 'country'"
+        with unittest.mock.patch.dict(CHANGE_SIGNAL_QUERIES, {'sqlite': signal}):
+            dbm = DbMiddleware(self.engine, connect_only=False, schema=None, revalidate=True)
+            self.assertEqual(len(dbm.country()), 2)
+            self.assertEqual(len(dbm.country()), 2)
+            self.assertEqual(dbm.cache_info().hits, 1)
+
+            self.engine.execute(self.country_table.insert(), [{'country': 'Peru', 'continent': 'America'}]).close()
+            self.assertEqual(len(dbm.country()), 3)
+            self.assertEqual(dbm.cache_info().hits, 1)
+
+        # without one, nothing is served from the cache
+        with self.assertWarns(UserWarning):
+            dbm = DbMiddleware(self.engine, connect_only=False, schema=None, revalidate=True)
+        self.assertEqual(len(dbm.country()), 3)
+        self.engine.execute(self.country_table.insert(), [{'country': 'Chile', 'continent': 'America'}]).close()
+        self.assertEqual(len(dbm.country()), 4)
+        self.assertEqual(dbm.cache_info()[:2], (0, 0))
+
+    def test_dbmiddleware_reflection_cache(self):
+        """
+        tables are reflected once for reads, inserts, updates and metadata
+        :return:
+        """
+        with DbMiddleware(self.engine, connect_only=False, schema=None) as dbm:
+            _ = dbm._insert.country(pd.DataFrame({'country': ['Benin'], 'continent': ['Africa']}))
+            _ = dbm._metadata.country()
+            _ = dbm.country()
+            self.assertEqual(dbm.reflection_info()[:3], (2, 1, 1))
+
+            dbm.invalidate('country')
+            self.assertEqual(dbm.reflection_info().currsize, 0)
+
+            _ = dbm._update.country(
+                pd.DataFrame({'country': ['Benin'], 'continent': ['West Africa']}), ('country',), ('continent',)
+            )
+            _ = dbm._metadata.currency()
+            self.assertEqual(dbm.reflection_info()[:3], (2, 3, 2))
+
+            dbm.refresh()
+            self.assertEqual(dbm.reflection_info().currsize, 0)
+
+    def test_db_middleware_shared_engine(self):
+        """
+        1) middlewares of the same database and user share one engine, made once
+        2) leaving the context of a middleware does not dispose a shared engine
+        3) an engine of its own is disposed with its middleware
+        4) middleware options go to DbMiddleware, not to the engine
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            folder = pathlib.Path(folder)
+            c = ConfigFilesManager(folder / '.hosts.json', folder / '.config.json', folder / '.configkey')
+            c.bootstrap()
+            c.write_credentials(
+                'oracle', 'mydatabase', c.encrypt_decrypt('user', True), c.encrypt_decrypt('pwd', True)
+            )
+            engine = sa.create_engine(f"sqlite:///{folder / 'shared.db'}")
+            self.country_table.create(engine)
+            engine.dispose()
+
+            made = []
+
+            class Connector(object):
+                @staticmethod
+                def create_engine(user, pwd, **kwargs):
+                    made.append(sa.create_engine(f"sqlite:///{folder / 'shared.db'}", **kwargs))
+                    return made[-1]
+
+            connect = db_middleware(c, 'oracle', 'mydatabase', Connector(), None)
+            with connect(False) as first:
+                with connect(False) as second:
+                    self.assertIs(first.sqlalchemy_engine, second.sqlalchemy_engine)
+                    self.assertTrue(made[0].pool._pre_ping)
+                self.assertEqual(first.country().shape, (0, 2))
+
+            with connect(True, pool_pre_ping=False) as third:
+                self.assertIs(third.sqlalchemy_engine, made[1])
+            self.assertEqual(len(made), 2)
+            self.assertEqual(engine_registry.dispose_idle(), 2)
+
+            with connect(True, share_engine=False) as own:
+                self.assertIs(own.sqlalchemy_engine, made[2])
+            self.assertEqual(engine_registry.info().engines, 0)
+
+            options = dict(lazy=True, read_mode='view', in_strategy='temp_table', aio_workers=1, result_cache_ttl=5)
+            with connect(False, **options) as configured:
+                self.assertIs(configured._lazy, True)
+                self.assertNotIn('country', configured.__dict__)
+                self.assertEqual(configured._table_function.keywords['read_mode'], 'view')
+                self.assertEqual(configured._table_function.keywords['in_strategy'], 'temp_table')
+                self.assertEqual(configured.aio._executor._max_workers, 1)
+                self.assertEqual(configured.country().shape, (0, 2))
+
+            with self.assertRaises(BadArgumentType):
+                _ = connect(False, read_mode='mutable')
+
+    def test_db_middleware_validation(self):
+        """
+        1) by default credentials are checked by a connection before the middleware is returned
+        2) lazily, stored credentials are only checked by the first query
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            folder = pathlib.Path(folder)
+            c = ConfigFilesManager(folder / '.hosts.json', folder / '.config.json', folder / '.configkey')
+            c.bootstrap()
+            c.write_credentials(
+                'oracle', 'mydatabase', c.encrypt_decrypt('user', True), c.encrypt_decrypt('pwd', True)
+            )
+
+            class Connector(object):
+                @staticmethod
+                def create_engine(user, pwd, **kwargs):
+                    # a database that cannot be opened
+                    return sa.create_engine(f"sqlite:///{folder / 'missing' / 'lazy.db'}", **kwargs)
+
+            connect = db_middleware(c, 'oracle', 'mydatabase', Connector(), None, share_engine=False)
+            with self.assertRaises(exc.OperationalError):
+                _ = connect(True)
+
+            with connect(True, validate='lazy') as dbm:
+                with self.assertRaises(exc.OperationalError):
+                    dbm.sqlalchemy_engine.connect()
+
+            with self.assertRaises(BadArgumentType):
+                _ = connect(True, validate='never')
+
     def test_dsdbmanager(self):
         with self.assertRaises(NotImplementedFlavor):
             _ = DsDbManager('somemadeupflavor')
@@ -0,0 +1,86 @@
+import pathlib
+import tempfile
+import unittest
+import sqlalchemy as sa
+from dsdbmanager.engines import EngineRegistry, engine_key, pool_options, warm_up
+
+
+class TestEngines(unittest.TestCase):
+    def test_engine_key(self):
+        key = engine_key('oracle', 'mydatabase', 'user', 'password', {'echo': False})
+        self.assertEqual(key, engine_key('oracle', 'mydatabase', 'user', 'password', {'echo': False}))
+        self.assertNotIn('password', repr(key))
+
+        for other in [
+            engine_key('mysql', 'mydatabase', 'user', 'password', {'echo': False}),
+            engine_key('oracle', 'mydatabase', 'other_user', 'password', {'echo': False}),
+            engine_key('oracle', 'mydatabase', 'user', 'new_password', {'echo': False}),
+            engine_key('oracle', 'mydatabase', 'user', 'password', {'echo': True}),
+        ]:
+            with self.subTest(other=other):
+                self.assertNotEqual(key, other)
+
+        self.assertEqual(pool_options({'pool_pre_ping': False})['pool_pre_ping'], False)
+        self.assertIn('pool_recycle', pool_options({}))
+
+    def test_engine_registry(self):
+        """
+        1) an engine is made once per key and counted once per acquire
+        2) releasing keeps engines until they are idle and disposed
+        3) engines that are not in the registry are left to the caller
+        :return:
+        """
+        registry = EngineRegistry()
+        made = []
+
+        def create():
+            made.append(sa.create_engine('sqlite://'))
+            return made[-1]
+
+        engine = registry.acquire(('a',), create)
+        self.assertIs(registry.acquire(('a',), create), engine)
+        other = registry.acquire(('b',), create)
+        self.assertEqual(len(made), 2)
+        self.assertEqual(registry.info(), (1, 2, 2, 3))
+
+        self.assertTrue(registry.release(engine))
+        self.assertTrue(registry.release(engine, dispose=True))  # the last reference, the engine is disposed
+        self.assertEqual(registry.info().engines, 1)
+        self.assertIsNot(registry.acquire(('a',), create), engine)
+
+        self.assertTrue(registry.release(other))
+        self.assertEqual(registry.dispose_idle(), 1)
+        self.assertEqual(registry.info().engines, 1)
+
+        self.assertFalse(registry.release(sa.create_engine('sqlite://')))
+        registry.dispose_all()
+        self.assertEqual(registry.info()[2:], (0, 0))
+
+    def test_warm_up(self):
+        """
+        1) connections are opened in the background and returned to the pool, up to its size
+        2) pools that do not keep connections are not warmed up
+        3) failures are warned about
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            engine = sa.create_engine(
+                f"sqlite:///{pathlib.Path(folder) / 'warm.db'}", poolclass=sa.pool.QueuePool, pool_size=3
+            )
+            warm_up(engine, 10).join()
+            self.assertEqual(engine.pool.checkedin(), 3)
+            self.assertIsNone(warm_up(engine, 2))
+            engine.dispose()
+
+            self.assertIsNone(warm_up(sa.create_engine('sqlite://'), 2))
+
+            missing = sa.create_engine(
+                f"sqlite:///{pathlib.Path(folder) / 'missing' / 'warm.db'}", poolclass=sa.pool.QueuePool
+            )
+            with self.assertWarns(UserWarning):
+                warm_up(missing, 2).join()
+            self.assertEqual(missing.pool.checkedin(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
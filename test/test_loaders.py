@@ -0,0 +1,203 @@
+import types
+import pathlib
+import datetime
+import unittest
+import unittest.mock
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import oracle, mssql, mysql, sqlite
+from dsdbmanager.exceptions_ import BadArgumentType, NoSuchColumn
+from dsdbmanager.loaders import (
+    pick_loader, executemany_loader, dbapi_loader, load_data_loader, stage_loader, mysql_field, input_sizes, LOADERS
+)
+
+
+class TestLoaders(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        metadata = sa.MetaData()
+
+        cls.facts_table = sa.Table(
+            'facts',
+
+            metadata,
+
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('amount', sa.Float),
+            sa.Column('label', sa.String(20)),
+            sa.Column('flag', sa.Boolean),
+            sa.Column('created', sa.DateTime)
+        )
+
+        # columns in another order than the table, with missing values of every kind
+        cls.df = pd.DataFrame({
+            'label': ['a', None, 'c "quoted"', 'd'],
+            'created': pd.to_datetime(['2020-01-01 10:00:00', None, '2020-01-03', '2020-01-04']),
+            'id': np.arange(4),
+            'amount': [1.5, np.nan, 2.5, 3.5],
+            'flag': pd.array([True, None, False, True], dtype='boolean'),
+        })
+
+    def setUp(self):
+        self.engine: sa.engine.Engine = sa.create_engine('sqlite://')
+        self.facts_table.create(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def read(self) -> pd.DataFrame:
+        with self.engine.connect() as connection:
+            rows = connection.execute(sa.select([self.facts_table]).order_by(self.facts_table.c.id)).fetchall()
+        return pd.DataFrame([tuple(row) for row in rows], columns=[c.name for c in self.facts_table.columns])
+
+    def test_pick_loader(self):
+        self.assertIs(pick_loader(sqlite.pysqlite.dialect()), dbapi_loader)
+        self.assertIs(pick_loader(oracle.cx_oracle.dialect()), dbapi_loader)
+        self.assertIs(pick_loader(mysql.pymysql.dialect()), executemany_loader)
+        self.assertIs(pick_loader(mssql.pyodbc.dialect()), LOADERS['fast_executemany'])
+        self.assertIs(pick_loader(mssql.pymssql.dialect()), executemany_loader)
+        self.assertIs(pick_loader(sqlite.pysqlite.dialect(), 'executemany'), executemany_loader)
+
+        with self.assertRaises(BadArgumentType):
+            _ = pick_loader(sqlite.pysqlite.dialect(), 'copy')
+
+    def test_loaders_agree(self):
+        """
+        the sqlalchemy executemany and the driver's executemany insert the same rows
+        :return:
+        """
+        results = []
+        for loader in (executemany_loader, dbapi_loader):
+            with self.subTest(loader=loader.__name__):
+                with self.engine.connect() as connection:
+                    connection.execute(self.facts_table.delete())
+                    self.assertEqual(loader(connection, self.facts_table, self.df), 4)
+                results.append(self.read())
+
+        self.assertTrue(results[0].equals(results[1]))
+        self.assertEqual(results[1].loc[0, 'created'], datetime.datetime(2020, 1, 1, 10))
+        self.assertEqual(results[1].loc[2, 'label'], 'c "quoted"')
+        self.assertTrue(results[1].loc[1, ['label', 'created', 'amount', 'flag']].isna().all())
+
+        with self.engine.connect() as connection:
+            with self.assertRaises(NoSuchColumn):
+                dbapi_loader(connection, self.facts_table, self.df.assign(other=1))
+
+            # failures are sqlalchemy errors, like with the sqlalchemy executemany
+            with self.assertRaises(sa.exc.IntegrityError):
+                dbapi_loader(connection, self.facts_table, self.df)
+
+    def test_input_sizes(self):
+        """
+        on cx_oracle the driver types sqlalchemy would set are given to setinputsizes, by parameter name
+        :return:
+        """
+        names = ['DATETIME', 'TIMESTAMP', 'CLOB', 'NCLOB', 'LOB', 'BLOB', 'NCHAR', 'FIXED_NCHAR', 'FIXED_CHAR',
+                  'STRING', 'NUMBER', 'NATIVE_FLOAT', 'LONG_STRING', 'INTERVAL']
+        cx_oracle = types.SimpleNamespace(
+            version='8.3.0', paramstyle='named', __future__=types.SimpleNamespace(),
+            **{name: type(name, (), {}) for name in names}
+        )
+        dialect = oracle.cx_oracle.dialect(dbapi=cx_oracle)
+        notes = sa.Table(
+            'notes', sa.MetaData(),
+            sa.Column('id', sa.Integer), sa.Column('body', sa.Text), sa.Column('created', sa.DateTime),
+            sa.Column('label', sa.String(20))
+        )
+
+        self.assertEqual(
+            input_sizes(dialect, notes, ['body', 'created', 'label', 'id']),
+            [cx_oracle.CLOB, cx_oracle.DATETIME, None, int]
+        )
+        self.assertEqual(input_sizes(sqlite.pysqlite.dialect(), notes, ['body', 'created']), [None, None])
+
+        cursor = unittest.mock.Mock(rowcount=2)
+        connection = unittest.mock.MagicMock()
+        connection.dialect = dialect
+        connection.connection.cursor.return_value = cursor
+        df = pd.DataFrame({'body': ['x' * 5000, 'y'], 'created': pd.to_datetime(['2020-01-01 10:00:00.123456', None])})
+        self.assertEqual(dbapi_loader(connection, notes, df), 2)
+        cursor.setinputsizes.assert_called_once_with(p0=cx_oracle.CLOB, p1=cx_oracle.DATETIME)
+
+    def test_load_data_loader(self):
+        """
+        each chunk is written to a file loaded with LOAD DATA LOCAL INFILE
+        :return:
+        """
+        files = []
+
+        def exec_driver_sql(statement):
+            path = statement.split("'")[1]
+            files.append(pathlib.Path(path).read_text(encoding='utf-8'))
+            self.assertTrue(statement.startswith('LOAD DATA LOCAL INFILE'))
+            self.assertTrue(statement.endswith('(id, amount, label, flag, created)'))
+            return unittest.mock.Mock(rowcount=2)
+
+        connection = unittest.mock.MagicMock()
+        connection.dialect = mysql.pymysql.dialect()
+        connection.exec_driver_sql.side_effect = exec_driver_sql
+
+        df = self.df[['id', 'amount', 'label', 'flag', 'created']]
+        with unittest.mock.patch('dsdbmanager.loaders.CHUNK_SIZE', 2):
+            self.assertEqual(load_data_loader(connection, self.facts_table, df), 4)
+
+        self.assertEqual(files[0], '0,1.5,"a",1,"2020-01-01 10:00:00"\n1,\\N,\\N,\\N,\\N\n')
+        self.assertEqual(files[1].split('\n')[0], '2,2.5,"c \\"quoted\\"",0,"2020-01-03 00:00:00"')
+        self.assertEqual(mysql_field('back\\slash'), '"back\\\\slash"')
+
+    def test_stage_loader(self):
+        """
+        1) the dataframe is written to parquet files put to the stage of the table and copied into it
+        2) the number of rows loaded is the sum of the rows loaded from each file
+        3) columns are matched regardless of case
+        :return:
+        """
+        staged = []
+
+        class Cursor(object):
+            description = None
+
+            def execute(self, statement):
+                if statement.startswith('PUT'):
+                    folder, pattern = statement.split("'")[1][len('file://'):].rsplit('/', 1)
+                    staged.extend(pd.read_parquet(path) for path in sorted(pathlib.Path(folder).glob(pattern)))
+                self.description = [('file',), ('status',), ('rows_parsed',), ('rows_loaded',)]
+                self.statement = statement
+
+            def fetchall(self):
+                return [(f"file_{i}", 'LOADED', len(part), len(part)) for i, part in enumerate(staged)]
+
+            def close(self):
+                pass
+
+        cursor = Cursor()
+        connection = unittest.mock.MagicMock()
+        connection.dialect = sa.engine.default.DefaultDialect()
+        connection.connection.cursor.return_value = cursor
+
+        tbl = sa.Table(
+            'facts', sa.MetaData(), *(sa.Column(column.name, column.type) for column in self.facts_table.columns),
+            schema='sales'
+        )
+        with unittest.mock.patch('dsdbmanager.loaders.STAGE_CHUNK_SIZE', 3):
+            self.assertEqual(stage_loader(connection, tbl, self.df), 4)
+
+        self.assertEqual([len(part) for part in staged], [3, 1])
+        self.assertEqual(pd.concat(staged, ignore_index=True)['created'].tolist(), self.df['created'].tolist())
+        self.assertTrue(cursor.statement.startswith('COPY INTO sales.facts FROM @sales.%facts PATTERN='))
+        self.assertIn('MATCH_BY_COLUMN_NAME=CASE_INSENSITIVE', cursor.statement)
+
+        self.assertEqual(stage_loader(connection, tbl, self.df.iloc[:0]), 0)
+
+        # snowflake names are reported lower case, COPY INTO matches them regardless of case
+        staged.clear()
+        self.assertEqual(stage_loader(connection, tbl, self.df.rename(columns=str.upper)), 4)
+        self.assertEqual(list(staged[0].columns), [column.upper() for column in self.df.columns])
+        with self.assertRaises(NoSuchColumn):
+            stage_loader(connection, tbl, self.df.assign(OTHER=1))
+        self.assertIs(pick_loader(sqlite.pysqlite.dialect(), 'stage'), stage_loader)
+
+
+if __name__ == '__main__':
+    unittest.main()
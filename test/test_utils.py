@@ -1,12 +1,27 @@
 import typing
+import decimal
+import datetime
 import unittest
+import unittest.mock
 import numpy as np
 import pandas as pd
 import sqlalchemy as sa
 import sqlalchemy.sql.elements as sqlelements
+from sqlalchemy.dialects import oracle, mssql, mysql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from dsdbmanager.exceptions_ import NoSuchColumn
-from dsdbmanager.utils import d_frame, inspect_table, filter_maker
+from dsdbmanager.exceptions_ import NoSuchColumn, BadArgumentType
+from dsdbmanager.utils import (
+    d_frame,
+    inspect_table,
+    filter_maker,
+    complex_filter_maker,
+    kwarg_filter_maker,
+    columnar_result,
+    select_maker,
+    limit_maker,
+    frame_view
+)
+from dsdbmanager.utils import estimate_row_counts, ROW_COUNT_QUERIES, record_chunks
 
 
 class TesUtil(unittest.TestCase):
@@ -152,6 +167,199 @@ class TesUtil(unittest.TestCase):
         with self.assertRaises(NoSuchColumn):
             filter_maker(self.students_table, 'madeup', 10)
 
+    def test_complex_filter_maker(self):
+        """
+        range, like and not in filters, alone and from keyword arguments
+        :return:
+        """
+        age, last_name = self.students_table.c.age, self.students_table.c.last_name
+        for filter_type, value, expected in (
+                ('bw', (10, 20), age.between(10, 20)),
+                ('lt', 10, age < 10),
+                ('le', 10, age <= 10),
+                ('gt', 10, age > 10),
+                ('ge', 10, age >= 10),
+                ('not_in', (10, 20), age.notin_((10, 20))),
+                ('not_in', 10, age.notin_((10,))),
+        ):
+            with self.subTest(filter_type=filter_type):
+                actual = complex_filter_maker(self.students_table, ('age', value), filter_type)
+                self.assertTrue(actual.compare(expected))
+                self.assertTrue(kwarg_filter_maker(self.students_table, f'age__{filter_type}', value).compare(expected))
+
+        self.assertTrue(
+            complex_filter_maker(self.students_table, ('last_name', 'D%'), 'like').compare(last_name.like('D%'))
+        )
+        self.assertTrue(
+            kwarg_filter_maker(self.students_table, 'last_name__not_like', 'D%').compare(last_name.notlike('D%'))
+        )
+
+        # a plain column name is still equality or membership
+        self.assertTrue(kwarg_filter_maker(self.students_table, 'age', 10).compare(age == 10))
+
+        with self.assertRaises(BadArgumentType):
+            complex_filter_maker(self.students_table, ('age', 10), 'madeup')
+
+        with self.assertRaises(BadArgumentType):
+            complex_filter_maker(self.students_table, ('age', (1, 2, 3)), 'bw')
+
+        with self.assertRaises(NoSuchColumn):
+            kwarg_filter_maker(self.students_table, 'madeup__gt', 10)
+
+        with self.assertRaises(NoSuchColumn):
+            kwarg_filter_maker(self.students_table, 'age__madeup', 10)
+
+    def test_limit_maker(self):
+        """
+        rows and offset are compiled into the sql of each dialect
+        :return:
+        """
+        query, columns = select_maker(self.students_table, ('first_name', 'age'))
+        self.assertIs(limit_maker(query, self.students_table, columns, 'sqlite'), query)
+
+        for name, dialect, expected in (
+                ('oracle', oracle.dialect(), 'ROWNUM'),
+                ('mssql', mssql.dialect(), 'TOP'),
+                ('mysql', mysql.dialect(), 'LIMIT'),
+                ('sqlite', sqlite.dialect(), 'LIMIT'),
+        ):
+            with self.subTest(dialect=name):
+                limited = limit_maker(query, self.students_table, columns, name, rows=10)
+                self.assertIn(expected, str(limited.compile(dialect=dialect)))
+
+                # with an offset rows are ordered by primary key
+                skipped = str(limit_maker(query, self.students_table, columns, name, 10, 5).compile(dialect=dialect))
+                self.assertIn('ORDER BY', skipped)
+                self.assertIn('first_name', skipped.split('ORDER BY')[1])
+
+        # teradata has no offset, rows are numbered instead
+        numbered = str(limit_maker(query, self.students_table, columns, 'teradata', 10, 5))
+        self.assertIn('row_number() OVER (ORDER BY students.first_name, students.last_name)', numbered)
+
+        with self.assertRaises(BadArgumentType):
+            limit_maker(query, self.students_table, columns, 'sqlite', rows=-1)
+
+        with self.assertRaises(BadArgumentType):
+            limit_maker(query, self.students_table, columns, 'sqlite', offset='10')
+
+        # numpy integers, e.g. computed from a dataframe, are integers too
+        self.assertIn('LIMIT', str(limit_maker(query, self.students_table, columns, 'sqlite', rows=np.int64(3))))
+        with self.assertRaises(BadArgumentType):
+            limit_maker(query, self.students_table, columns, 'sqlite', rows=True)
+
+    def test_frame_view(self):
+        """
+        views share the data of the cached dataframe and cannot modify it
+        :return:
+        """
+        df = pd.DataFrame({'a': np.arange(3), 'b': pd.array(['x', None, 'z'], dtype='string')})
+        view = frame_view(df)
+        self.assertTrue(np.shares_memory(view['a'].to_numpy(), df['a'].to_numpy()))
+
+        with self.assertRaises(ValueError):
+            view.loc[0, 'a'] = 10
+
+        with self.assertRaises(ValueError):
+            view.loc[0, 'b'] = 'y'
+
+        view['a'] = view['a'] + 1
+        writable = frame_view(df).copy()
+        writable.loc[0, 'a'] = 10
+        self.assertEqual(df['a'].tolist(), [0, 1, 2])
+        self.assertEqual(df.loc[0, 'b'], 'x')
+
+    def test_columnar_result(self):
+        """
+        each column gets a dtype based on its sqlalchemy type
+        :return:
+        """
+        columns = ('id', 'score', 'amount', 'name', 'flag', 'created', 'weird', 'rank')
+        types = (
+            sa.Integer(), sa.Float(), sa.Numeric(10, 2), sa.String(10), sa.Boolean(), sa.DateTime(),
+            sa.types.NullType(), sa.Integer()
+        )
+        rows = [
+            (1, 1.5, decimal.Decimal('10.25'), 'a', True, datetime.datetime(2020, 1, 1), {'x': 1}, None),
+            (2, None, None, None, False, None, [1, 2], 3),
+        ]
+
+        data = columnar_result(rows, columns, types)
+        df = pd.DataFrame(data, columns=columns)
+        expected = ('int64', 'float64', 'float64', 'string', 'bool', 'datetime64[ns]', 'object', 'Int64')
+        for column, dtype in zip(columns, expected):
+            with self.subTest(column=column):
+                self.assertEqual(str(df[column].dtype), dtype)
+
+        self.assertEqual(df.loc[0, 'amount'], 10.25)
+        self.assertTrue(pd.isna(df.loc[1, 'created']))
+        self.assertEqual(df.loc[1, 'weird'], [1, 2])
+
+        # values that do not fit the type are kept as objects
+        self.assertEqual(columnar_result([('a',), (1,)], ('id',), (sa.Integer(),))['id'].dtype, object)
+
+        # no rows still gives typed empty columns
+        empty = pd.DataFrame(columnar_result([], columns, types), columns=columns)
+        self.assertEqual(empty.shape, (0, len(columns)))
+        self.assertEqual(str(empty['id'].dtype), 'int64')
+
+    def test_record_chunks(self):
+        """
+        1) rows come in chunks of python values with missing values as None
+        2) parameter names can differ from the column names
+        :return:
+        """
+        df = pd.DataFrame({
+            'id': np.arange(5),
+            'score': [1.5, np.nan, 2.5, 3.5, 4.5],
+            'rank': pd.array([1, None, 3, 4, 5], dtype='Int64'),
+            'name': ['a', None, 'c', 'd', 'e'],
+            'created': pd.to_datetime(['2020-01-01', None, '2020-01-03', '2020-01-04', '2020-01-05']),
+            'flag': [True, False, True, False, True],
+        })
+
+        chunks = list(record_chunks(df, 2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            chunks[0][1], {'id': 1, 'score': None, 'rank': None, 'name': None, 'created': None, 'flag': False}
+        )
+        first = chunks[0][0]
+        types = [('id', int), ('score', float), ('rank', int), ('flag', bool), ('created', datetime.datetime)]
+        for column, typ in types:
+            with self.subTest(column=column):
+                self.assertIsInstance(first[column], typ)
+
+        renamed = next(record_chunks(df[['id', 'name']], 10, ['id_updt', 'name_updt']))
+        self.assertEqual(renamed[-1], {'id_updt': 4, 'name_updt': 'e'})
+        self.assertEqual(list(record_chunks(df.iloc[:0])), [])
+
+    def test_row_count(self):
+        """
+        1) the catalog query is run once for many tables, tables without statistics have no estimate
+        2) inspect_table counts, estimates or skips rows
+        :return:
+        """
+        engine = sa.create_engine("sqlite:///")
+        metadata = sa.MetaData(engine)
+        students = self.students_table.to_metadata(metadata)
+        metadata.create_all()
+        engine.execute(students.insert(), [{'first_name': 'a', 'last_name': 'b', 'age': 20}]).close()
+
+        self.assertIsNone(estimate_row_counts(engine, None, ['students']))
+        self.assertEqual(inspect_table(students, 'estimate')['row_count'], 1)
+
+        # sqlite keeps no statistics, stand in for a catalog that knows about students only
+        catalog = "SELECT name, 42 FROM sqlite_master WHERE :schema IS NULL AND name = 'students'"
+        with unittest.mock.patch.dict(ROW_COUNT_QUERIES, {'sqlite': catalog}):
+            self.assertEqual(estimate_row_counts(engine, None, ['students', 'other']), {'students': 42, 'other': None})
+            self.assertEqual(inspect_table(students, 'estimate')['row_count'], 42)
+            self.assertEqual(inspect_table(students, 'exact')['row_count'], 1)
+            self.assertEqual(inspect_table(students, 'skip')['row_count'], 'N/A')
+
+        with self.assertRaises(BadArgumentType):
+            _ = inspect_table(students, 'guess')
+
+        engine.dispose()
+
 
 if __name__ == '__main__':
     unittest.main()